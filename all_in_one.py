@@ -0,0 +1,135 @@
+"""Run the ASR, orchestrator and TTS services in a single process.
+
+For small classroom boxes: one Python process and one torch runtime instead of
+three, and no localhost HTTP between services. The three apps still listen on
+their usual ports so the frontend is unchanged, but the ASR service hands
+transcripts straight to the orchestrator's chat turn, and the orchestrator
+gets speech from the TTS service as in-memory NumPy audio (see
+shared/local_services.py). Each model keeps its own worker pool: ASR decoding
+runs on asr_server.asr_executor, TTS on the synthesis batcher's thread and
+LLM calls on the default executor.
+
+    python all_in_one.py
+    python all_in_one.py --host 0.0.0.0 --asr-port 8000 --orchestrator-port 8001 --tts-port 8002
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib
+import os
+import signal
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SERVICE_DIRS = {
+    "asr": os.path.join(ROOT, "funasr_service"),
+    "orchestrator": os.path.join(ROOT, "chatbot_service"),
+    "tts": os.path.join(ROOT, "openvoice_service"),
+}
+
+sys.path.insert(0, ROOT)
+for service_dir in SERVICE_DIRS.values():
+    # Each service imports its siblings by bare module name; none of the names collide
+    sys.path.insert(0, service_dir)
+
+import uvicorn
+
+from shared import local_services
+
+@contextlib.contextmanager
+def working_directory(path: str):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+def load_services():
+    """Import the three apps, each from its own directory since they use relative paths at import"""
+    # TTS first: it loads checkpoints/ relative to openvoice_service
+    with working_directory(SERVICE_DIRS["tts"]):
+        tts_server = importlib.import_module("tts_server")
+    with working_directory(SERVICE_DIRS["asr"]):
+        asr_server = importlib.import_module("asr_server")
+    # The orchestrator also writes ./logs at runtime, so stay in its directory
+    os.chdir(SERVICE_DIRS["orchestrator"])
+    main_orchestrator = importlib.import_module("main_orchestrator")
+    return asr_server, main_orchestrator, tts_server
+
+def register_local_calls(asr_server, main_orchestrator, tts_server):
+    """Wire cross-service calls to in-process functions instead of localhost HTTP"""
+    async def chat(payload: dict, trace_id: str) -> dict:
+        request = main_orchestrator.ChatRequest(**payload)
+        try:
+            response = await main_orchestrator.chat_turn(request, trace_id)
+        except main_orchestrator.ServerBusy as e:
+            raise asr_server.ChatbotBusy(str(e), e.retry_after)
+        except main_orchestrator.TurnCancelled as e:
+            raise asr_server.TurnCancelled(str(e))
+        return response.dict()
+
+    async def synthesize(payload: dict, accept, trace_id: str) -> dict:
+        return await tts_server.synthesize_to_file(tts_server.TTSRequest(**payload), accept, trace_id)
+
+    async def stream(payload: dict, accept, trace_id: str):
+        return await tts_server.stream_speech(tts_server.TTSRequest(**payload), accept, trace_id)
+
+    async def resume(session_id: str, payload: dict, trace_id: str) -> dict:
+        return await tts_server.resume_to_file(session_id, tts_server.ResumeRequest(**payload), None, trace_id)
+
+    async def chat_partial(payload: dict):
+        await main_orchestrator.partial_transcript(main_orchestrator.PartialTranscript(**payload))
+
+    local_services.register("chat", chat)
+    local_services.register("chat.partial", chat_partial)
+    local_services.register("chat.barge_in", main_orchestrator.barge_in)
+    local_services.register("tts.stop", tts_server.stop_speech)
+    local_services.register("tts.synthesize", synthesize)
+    local_services.register("tts.stream", stream)
+    local_services.register("tts.resume", resume)
+
+class _Server(uvicorn.Server):
+    """uvicorn server that leaves signal handling to the launcher, since several share one loop"""
+
+    def install_signal_handlers(self):  # uvicorn < 0.29
+        pass
+
+    @contextlib.contextmanager
+    def capture_signals(self):  # uvicorn >= 0.29
+        yield
+
+async def serve(host: str, ports: dict, log_level: str = "info"):
+    asr_server, main_orchestrator, tts_server = load_services()
+    register_local_calls(asr_server, main_orchestrator, tts_server)
+
+    apps = {"asr": asr_server.app, "orchestrator": main_orchestrator.app, "tts": tts_server.app}
+    servers = [
+        _Server(uvicorn.Config(apps[name], host=host, port=ports[name], log_level=log_level))
+        for name in ("tts", "asr", "orchestrator")
+    ]
+
+    def shutdown(signum, frame):
+        for server in servers:
+            server.should_exit = True
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    print("All-in-one: " + ", ".join(f"{name} on {host}:{port}" for name, port in ports.items()))
+    await asyncio.gather(*(server.serve() for server in servers))
+
+def main():
+    parser = argparse.ArgumentParser(description="Run all AI Teacher services in one process")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--asr-port", type=int, default=8000)
+    parser.add_argument("--orchestrator-port", type=int, default=8001)
+    parser.add_argument("--tts-port", type=int, default=8002)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    ports = {"asr": args.asr_port, "orchestrator": args.orchestrator_port, "tts": args.tts_port}
+    asyncio.run(serve(args.host, ports, args.log_level))
+
+if __name__ == "__main__":
+    main()
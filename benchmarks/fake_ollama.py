@@ -0,0 +1,168 @@
+"""Stand-in for the Ollama HTTP API with a configurable token rate.
+
+Implements the parts of /api/generate the chatbot service uses (JSONL
+streaming or a single JSON body, empty-prompt model loads) plus /api/tags
+for health checks and /api/ps for the loaded models.
+
+    python benchmarks/fake_ollama.py --port 11434 --tokens-per-sec 40 --tokens 60
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FILLER = (
+    "Great question! Photosynthesis is how plants turn sunlight, water and carbon dioxide "
+    "into glucose and oxygen. It happens inside the chloroplasts of leaf cells. "
+    "First, light energy is captured by chlorophyll. Then that energy is used to build sugar. "
+    "Would you like me to go through each stage in more detail?"
+).split(" ")
+
+class FakeOllamaServer:
+    """Threaded fake Ollama server that can run in-process or standalone"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 11434, tokens_per_sec: float = 40.0,
+                 tokens: int = 60, first_token_ms: float = 150.0, name: str = "fake-ollama"):
+        self.host = host
+        self.port = port
+        self.tokens_per_sec = tokens_per_sec
+        self.tokens = tokens
+        self.first_token_ms = first_token_ms
+        self.name = name
+        self.healthy = True
+        self.loaded_models = set()
+        self.stats = {"requests": 0, "active": 0, "max_active": 0, "tokens": 0, "loads": 0, "keep_alive": None}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if not fake.healthy:
+                    self._send_json(503, {"error": "unavailable"})
+                elif self.path == "/api/tags":
+                    self._send_json(200, {"models": [{"name": "gemma3n:e2b"}]})
+                elif self.path == "/api/ps":
+                    self._send_json(200, {"models": [{"name": name} for name in sorted(fake.loaded_models)]})
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if not fake.healthy:
+                    self._send_json(503, {"error": "unavailable"})
+                    return
+                if self.path != "/api/generate":
+                    self._send_json(404, {"error": "not found"})
+                    return
+                fake._generate(self, request)
+
+        return Handler
+
+    def _generate(self, handler, request):
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["active"] += 1
+            self.stats["max_active"] = max(self.stats["max_active"], self.stats["active"])
+        try:
+            model = request.get("model", "gemma3n:e2b")
+            if model not in self.loaded_models:
+                self.loaded_models.add(model)
+                self.stats["loads"] += 1
+            if "keep_alive" in request:
+                self.stats["keep_alive"] = request["keep_alive"]
+            num_predict = (request.get("options") or {}).get("num_predict")
+            count = self.tokens if not num_predict or num_predict < 0 else min(self.tokens, num_predict)
+            if not request.get("prompt"):
+                # Empty prompt is Ollama's "just load the model" request
+                count = 0
+            interval = 1.0 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+            words = [FILLER[i % len(FILLER)] + " " for i in range(count)]
+
+            time.sleep(self.first_token_ms / 1000.0)
+            if request.get("stream", True):
+                handler.send_response(200)
+                handler.send_header("Content-Type", "application/x-ndjson")
+                handler.send_header("Transfer-Encoding", "chunked")
+                handler.end_headers()
+
+                def write_chunk(payload):
+                    data = (json.dumps(payload) + "\n").encode()
+                    handler.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    handler.wfile.flush()
+
+                for i, word in enumerate(words):
+                    if i:
+                        time.sleep(interval)
+                    write_chunk({"model": model, "response": word, "done": False})
+                write_chunk({"model": model, "response": "", "done": True,
+                             "eval_count": count, "backend": self.name})
+                handler.wfile.write(b"0\r\n\r\n")
+            else:
+                time.sleep(interval * max(0, count - 1))
+                handler._send_json(200, {"model": model, "response": "".join(words), "done": True,
+                                         "eval_count": count, "backend": self.name})
+            with self._lock:
+                self.stats["tokens"] += count
+        except (BrokenPipeError, ConnectionResetError):
+            # Client cancelled the stream
+            pass
+        finally:
+            with self._lock:
+                self.stats["active"] -= 1
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0)
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--first-token-ms", type=float, default=150.0)
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(args.host, args.port, args.tokens_per_sec, args.tokens, args.first_token_ms).start()
+    print(f"Fake Ollama listening on {server.url} ({args.tokens_per_sec} tok/s, {args.tokens} tokens)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""End-to-end load test for the orchestrator, ASR and TTS services.
+
+Starts a fake Ollama server and the three real service apps with stub
+models (see stub_models.py), then drives N simulated students at increasing
+concurrency levels and reports turn latency, time-to-first-audio and where
+throughput stops scaling. Redis must be reachable at REDIS_URL.
+
+    python benchmarks/loadtest.py --scenario chat --levels 1,2,4,8,16 --turns 3
+    python benchmarks/loadtest.py --scenario ws --no-spawn   # services already running
+    python benchmarks/loadtest.py --all-in-one               # one process, in-process service calls
+
+Scenarios:
+    chat  POST /chat?stream_audio=true; first audio byte is time-to-first-audio
+    ws    stream synthetic speech into the ASR WebSocket; turn latency runs from
+          end of speech to the ai_response frame, then /synthesize_stream is
+          fetched the way the frontend does
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_ollama import FakeOllamaServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    return float(np.percentile(values, pct))
+
+def speech_pcm(speech_seconds: float = 1.0, silence_seconds: float = 2.2, sample_rate: int = 16000) -> bytes:
+    """A tone burst the VAD treats as speech, followed by enough silence to end the utterance"""
+    t = np.arange(int(speech_seconds * sample_rate)) / sample_rate
+    tone = 0.3 * np.sin(2 * np.pi * 220 * t)
+    audio = np.concatenate([tone, np.zeros(int(silence_seconds * sample_rate))])
+    return (audio * 32767).astype("<i2").tobytes()
+
+class ServiceProcesses:
+    def __init__(self, env: Dict[str, str], all_in_one: bool = False):
+        self.env = env
+        self.all_in_one = all_in_one
+        self.procs: List[subprocess.Popen] = []
+
+    def start(self, urls: Dict[str, str]):
+        ports = {service: url.rsplit(":", 1)[1] for service, url in urls.items()}
+        if self.all_in_one:
+            self.procs.append(subprocess.Popen(
+                [sys.executable, os.path.join(HERE, "run_service.py"), "all",
+                 "--ports", f"{ports['asr']},{ports['orchestrator']},{ports['tts']}"],
+                env=self.env
+            ))
+        else:
+            for service in ("tts", "asr", "orchestrator"):
+                self.procs.append(subprocess.Popen(
+                    [sys.executable, os.path.join(HERE, "run_service.py"), service, "--port", ports[service]],
+                    env=self.env
+                ))
+        for service, url in urls.items():
+            wait_for_health(url, service)
+
+    def stop(self):
+        for proc in self.procs:
+            proc.terminate()
+        for proc in self.procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+def wait_for_health(url: str, name: str, timeout: float = 120.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{url}/health", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{name} did not become healthy at {url}")
+
+def chat_turn(orchestrator_url: str, session_id: str, message: str) -> Dict[str, float]:
+    start = time.perf_counter()
+    first_audio = None
+    response = requests.post(
+        f"{orchestrator_url}/chat?stream_audio=true",
+        json={"session_id": session_id, "message": message},
+        stream=True, timeout=180
+    )
+    if response.status_code == 429:
+        # Shed by the orchestrator's admission controller
+        return {"shed": True, "latency": time.perf_counter() - start}
+    response.raise_for_status()
+    for chunk in response.iter_content(chunk_size=4096):
+        if chunk and first_audio is None:
+            first_audio = time.perf_counter() - start
+    return {"latency": time.perf_counter() - start, "ttfa": first_audio or float("nan")}
+
+def first_audio_byte(tts_url: str, session_id: str, text: str) -> float:
+    start = time.perf_counter()
+    response = requests.post(
+        f"{tts_url}/synthesize_stream",
+        json={"session_id": session_id, "text": text, "emotion": "default", "format": "wav"},
+        stream=True, timeout=120
+    )
+    response.raise_for_status()
+    first = None
+    for chunk in response.iter_content(chunk_size=4096):
+        if chunk and first is None:
+            first = time.perf_counter() - start
+    return first if first is not None else float("nan")
+
+async def run_chat_session(args, session_id: str, results: List[dict]):
+    for turn in range(args.turns):
+        try:
+            result = await asyncio.to_thread(chat_turn, args.orchestrator_url, session_id, f"Question {turn}: what is photosynthesis?")
+            results.append(result)
+        except Exception as e:
+            results.append({"error": str(e)})
+
+async def run_ws_session(args, session_id: str, results: List[dict]):
+    import websockets
+
+    pcm = speech_pcm()
+    frame_bytes = 4096 * 2
+    url = f"{args.asr_url.replace('http', 'ws', 1)}/ws/{session_id}?token={args.token}"
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            for _ in range(args.turns):
+                try:
+                    for offset in range(0, len(pcm), frame_bytes):
+                        await ws.send(pcm[offset:offset + frame_bytes])
+                    speech_end = time.perf_counter()
+                    while True:
+                        message = json.loads(await asyncio.wait_for(ws.recv(), timeout=180))
+                        if message.get("type") in ("ai_response", "busy"):
+                            break
+                        if message.get("type") == "error":
+                            raise RuntimeError(message.get("message"))
+                    latency = time.perf_counter() - speech_end
+                    if message.get("type") == "busy":
+                        results.append({"shed": True, "latency": latency})
+                        continue
+                    tts_first = await asyncio.to_thread(first_audio_byte, args.tts_url, session_id, message.get("text", ""))
+                    results.append({"latency": latency, "ttfa": latency + tts_first})
+                except Exception as e:
+                    results.append({"error": str(e)})
+    except Exception as e:
+        results.extend({"error": f"connect: {e}"} for _ in range(args.turns))
+
+async def run_level(args, sessions: int) -> dict:
+    results: List[dict] = []
+    runner = run_chat_session if args.scenario == "chat" else run_ws_session
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        runner(args, f"load_{sessions}_{i}_{uuid.uuid4().hex[:6]}", results) for i in range(sessions)
+    ))
+    elapsed = time.perf_counter() - start
+
+    ok = [r for r in results if "error" not in r and not r.get("shed")]
+    latencies = [r["latency"] for r in ok]
+    ttfas = [r["ttfa"] for r in ok if r["ttfa"] == r["ttfa"]]
+    errors = [r["error"] for r in results if "error" in r]
+    return {
+        "sessions": sessions,
+        "turns": len(results),
+        "errors": len(errors),
+        "shed": sum(1 for r in results if r.get("shed")),
+        "error_sample": errors[:3],
+        "throughput": len(ok) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "ttfa_p50": percentile(ttfas, 50),
+        "ttfa_p95": percentile(ttfas, 95),
+    }
+
+def find_saturation(levels: List[dict], min_gain: float, max_error_rate: float) -> Optional[int]:
+    """Last concurrency level before throughput stops growing or errors appear"""
+    previous = None
+    for level in levels:
+        error_rate = level["errors"] / level["turns"] if level["turns"] else 1.0
+        if previous is not None:
+            gain = level["throughput"] / previous["throughput"] - 1 if previous["throughput"] else 0.0
+            if gain < min_gain or error_rate > max_error_rate:
+                return previous["sessions"]
+        elif error_rate > max_error_rate:
+            return None
+        previous = level
+    return None
+
+def print_report(levels: List[dict], saturation: Optional[int]):
+    print(f"\n{'sessions':>8} {'turns':>6} {'err':>4} {'shed':>5} {'turns/s':>8} {'p50 s':>7} {'p95 s':>7} "
+          f"{'p99 s':>7} {'ttfa50':>7} {'ttfa95':>7}")
+    for level in levels:
+        print(f"{level['sessions']:>8} {level['turns']:>6} {level['errors']:>4} {level['shed']:>5} {level['throughput']:>8.2f} "
+              f"{level['p50']:>7.2f} {level['p95']:>7.2f} {level['p99']:>7.2f} "
+              f"{level['ttfa_p50']:>7.2f} {level['ttfa_p95']:>7.2f}")
+        if level["error_sample"]:
+            print(f"{'':>8} e.g. {level['error_sample'][0][:100]}")
+    if saturation is None:
+        print("\nNo saturation point reached within the tested levels")
+    else:
+        print(f"\nSaturation point: ~{saturation} concurrent sessions")
+
+def main():
+    parser = argparse.ArgumentParser(description="AI Teacher end-to-end load test")
+    parser.add_argument("--scenario", choices=("chat", "ws"), default="chat")
+    parser.add_argument("--levels", default="1,2,4,8,16,32")
+    parser.add_argument("--turns", type=int, default=3, help="turns per simulated session")
+    parser.add_argument("--no-spawn", action="store_true", help="use services that are already running")
+    parser.add_argument("--all-in-one", action="store_true", help="spawn all services in one process")
+    parser.add_argument("--asr-url", default="http://127.0.0.1:18000")
+    parser.add_argument("--orchestrator-url", default="http://127.0.0.1:18001")
+    parser.add_argument("--tts-url", default="http://127.0.0.1:18002")
+    parser.add_argument("--token", default="my_secure_token")
+    parser.add_argument("--ollama-port", type=int, default=0, help="0 picks a free port")
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0)
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--asr-ms-per-sec", type=float, default=60.0)
+    parser.add_argument("--tts-batch-ms", type=float, default=80.0)
+    parser.add_argument("--tts-ms-per-sentence", type=float, default=40.0)
+    parser.add_argument("--min-gain", type=float, default=0.1, help="throughput gain below which we call it saturated")
+    parser.add_argument("--max-error-rate", type=float, default=0.05)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    ollama = FakeOllamaServer(port=args.ollama_port, tokens_per_sec=args.tokens_per_sec, tokens=args.tokens).start()
+    print(f"Fake Ollama at {ollama.url}")
+
+    services = None
+    if not args.no_spawn:
+        env = dict(
+            os.environ,
+            OLLAMA_API_URL=ollama.url,
+            FUNASR_SERVICE_URL=args.asr_url,
+            CHATBOT_SERVICE_URL=args.orchestrator_url,
+            OPENVOICE_SERVICE_URL=args.tts_url,
+            FAKE_ASR_MS_PER_AUDIO_SEC=str(args.asr_ms_per_sec),
+            FAKE_TTS_BATCH_MS=str(args.tts_batch_ms),
+            FAKE_TTS_MS_PER_SENTENCE=str(args.tts_ms_per_sentence),
+            # Simulated students repeat the same turns; measure generation, not the caches
+            RESPONSE_CACHE="false",
+            TTS_AUDIO_CACHE="false",
+        )
+        services = ServiceProcesses(env, all_in_one=args.all_in_one)
+        services.start({"asr": args.asr_url, "orchestrator": args.orchestrator_url, "tts": args.tts_url})
+
+    try:
+        levels = []
+        for sessions in [int(level) for level in args.levels.split(",")]:
+            print(f"Running {sessions} concurrent session(s)...")
+            levels.append(asyncio.run(run_level(args, sessions)))
+        saturation = find_saturation(levels, args.min_gain, args.max_error_rate)
+        print_report(levels, saturation)
+        print(f"Fake Ollama: {ollama.stats}")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"scenario": args.scenario, "levels": levels, "saturation": saturation,
+                           "ollama": ollama.stats}, f, indent=2)
+    finally:
+        if services:
+            services.stop()
+        ollama.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Checks the Ollama backend pool against fake Ollama servers.
+
+Starts a few FakeOllamaServer instances in-process and drives GemmaHandler
+through them from many concurrent sessions, then verifies that:
+  - sessions spread evenly and keep their backend between turns
+  - sessionless requests favour a fast backend over a slow one
+  - a backend returning 503s, and one that is down, are ejected and their
+    turns fail over without errors
+  - an ejected backend comes back after a passing health check
+
+    python benchmarks/ollama_pool_check.py --backends 3 --sessions 12 --turns 4
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "chatbot_service"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ollama import FakeOllamaServer
+from gemma_handler import GemmaHandler
+from ollama_pool import OllamaBackend, OllamaPool
+
+failures: List[str] = []
+
+def check(condition: bool, description: str):
+    print(f"  [{'PASS' if condition else 'FAIL'}] {description}")
+    if not condition:
+        failures.append(description)
+
+def run_turns(handler: GemmaHandler, sessions: int, turns: int, prefix: str) -> List[str]:
+    """Each session generates its turns one after another, sessions in parallel; returns the errors"""
+    def session(index: int):
+        errors = []
+        for turn in range(turns):
+            try:
+                tokens = list(handler.stream_response([], f"question {turn}", session_id=f"{prefix}-{index}"))
+                if not tokens:
+                    errors.append(f"{prefix}-{index} turn {turn}: empty reply")
+            except Exception as e:
+                errors.append(f"{prefix}-{index} turn {turn}: {e}")
+        return errors
+
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        return [error for errors in executor.map(session, range(sessions)) for error in errors]
+
+def make_pool(servers: List[FakeOllamaServer], **kwargs) -> OllamaPool:
+    return OllamaPool([OllamaBackend(server.url, "gemma3n:e2b") for server in servers], **kwargs)
+
+def requests_per_backend(pool: OllamaPool) -> List[int]:
+    return [backend["requests"] for backend in pool.snapshot()["backends"]]
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama pool distribution and failover check")
+    parser.add_argument("--backends", type=int, default=3)
+    parser.add_argument("--sessions", type=int, default=12)
+    parser.add_argument("--turns", type=int, default=4)
+    args = parser.parse_args()
+
+    servers = [
+        FakeOllamaServer(port=0, tokens_per_sec=200, tokens=12, first_token_ms=30, name=f"fake-{i}").start()
+        for i in range(args.backends)
+    ]
+    try:
+        print(f"Distribution: {args.sessions} sessions x {args.turns} turns over {args.backends} backends")
+        pool = make_pool(servers)
+        errors = run_turns(GemmaHandler(pool=pool), args.sessions, args.turns, "even")
+        counts = requests_per_backend(pool)
+        mean = sum(counts) / len(counts)
+        print(f"  requests per backend: {counts}, max in flight: {[s.stats['max_active'] for s in servers]}")
+        check(not errors, f"no failed turns ({len(errors)} failed)")
+        check(max(counts) - min(counts) <= max(2, 0.25 * mean), "requests spread evenly")
+        hits = pool.stats["affinity_hits"]
+        follow_ups = args.sessions * (args.turns - 1)
+        print(f"  affinity hits {hits}/{follow_ups} follow-up turns, {pool.stats['affinity_moves']} moves")
+        check(hits >= 0.9 * follow_ups, "sessions keep their backend between turns")
+
+        print("Least outstanding: one backend 4x slower, sessionless requests")
+        servers[0].tokens_per_sec = 50
+        pool = make_pool(servers)
+        handler = GemmaHandler(pool=pool)
+        with ThreadPoolExecutor(max_workers=args.backends * 2) as executor:
+            list(executor.map(lambda i: list(handler.stream_response([], f"q{i}")), range(args.backends * 15)))
+        counts = requests_per_backend(pool)
+        print(f"  requests per backend: {counts}")
+        check(counts[0] < min(counts[1:]), "the slow backend gets the fewest requests")
+        servers[0].tokens_per_sec = 200
+
+        print("Failover: one backend answers 503, another is down")
+        pool = make_pool(servers, eject_failures=2, eject_seconds=60)
+        handler = GemmaHandler(pool=pool)
+        run_turns(handler, args.sessions, 1, "failover")  # Sessions get their backends while all are up
+        servers[1].healthy = False
+        down = servers[-1] if args.backends > 2 else None
+        if down is not None:
+            down.stop()
+        before = requests_per_backend(pool)
+        errors = run_turns(handler, args.sessions, args.turns, "failover")
+        after = requests_per_backend(pool)
+        snapshot = pool.snapshot()
+        print(f"  requests per backend during the outage: {[a - b for a, b in zip(after, before)]}, "
+              f"failovers {snapshot['failovers']}, ejections {snapshot['ejections']}")
+        check(not errors, f"no failed turns ({len(errors)} failed)")
+        check(snapshot["backends"][1]["ejected_for"] > 0, "the 503 backend is ejected")
+        # Only turns already in flight when it was ejected reach it: its own sessions' first
+        # attempts and failovers from the stopped backend, instead of every turn of its sessions
+        per_backend = -(-args.sessions // args.backends)
+        check(after[1] - before[1] <= 2 * per_backend, "the 503 backend stops getting requests once ejected")
+        if down is not None:
+            check(snapshot["backends"][-1]["ejected_for"] > 0, "the stopped backend is ejected")
+
+        print("Recovery: the 503 backend is healthy again")
+        servers[1].healthy = True
+        healthy = pool.check_health(timeout=1.0)
+        check(pool.snapshot()["backends"][1]["ejected_for"] == 0, "a passing health check re-admits it")
+        check(healthy == args.backends - (1 if down is not None else 0), f"{healthy} backends report healthy")
+        before = requests_per_backend(pool)
+        errors = run_turns(handler, args.sessions, args.turns, "recovered")
+        after = requests_per_backend(pool)
+        check(not errors and after[1] > before[1], "new sessions reach the recovered backend")
+    finally:
+        for server in servers:
+            server.stop()
+
+    print(f"\n{'All checks passed' if not failures else f'{len(failures)} checks failed'}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Run one of the real service apps with stub models installed.
+
+    python benchmarks/run_service.py asr --port 8000
+    python benchmarks/run_service.py tts --port 8002
+    python benchmarks/run_service.py orchestrator --port 8001
+    python benchmarks/run_service.py all --ports 8000,8001,8002   # all_in_one.py, one process
+"""
+import argparse
+import importlib
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SERVICES = {
+    "asr": ("funasr_service", "asr_server", 8000),
+    "orchestrator": ("chatbot_service", "main_orchestrator", 8001),
+    "tts": ("openvoice_service", "tts_server", 8002),
+}
+
+def run_all_in_one(host: str, ports: str):
+    import asyncio
+    import stub_models
+    import all_in_one
+
+    stub_models.install("asr")
+    stub_models.install("tts")
+    os.environ.setdefault("TTS_CPU_PROFILE", "quality")
+    asr_port, orchestrator_port, tts_port = (int(port) for port in ports.split(","))
+    asyncio.run(all_in_one.serve(
+        host, {"asr": asr_port, "orchestrator": orchestrator_port, "tts": tts_port}, log_level="warning"
+    ))
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a service against stub models")
+    parser.add_argument("service", choices=sorted(SERVICES) + ["all"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--ports", default="8000,8001,8002", help="asr,orchestrator,tts ports for 'all'")
+    args = parser.parse_args()
+
+    if args.service == "all":
+        run_all_in_one(args.host, args.ports)
+        return
+
+    directory, module_name, default_port = SERVICES[args.service]
+    service_dir = os.path.join(ROOT, directory)
+    # Services import their sibling modules and write relative paths from their own directory
+    os.chdir(service_dir)
+    sys.path.insert(0, service_dir)
+
+    import stub_models
+    stub_models.install(args.service)
+    if args.service == "tts":
+        # Stub models have no quantizable layers
+        os.environ.setdefault("TTS_CPU_PROFILE", "quality")
+
+    module = importlib.import_module(module_name)
+
+    import uvicorn
+    uvicorn.run(module.app, host=args.host, port=args.port or default_port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
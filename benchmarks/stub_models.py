@@ -0,0 +1,159 @@
+"""Lightweight stand-ins for FunASR, Silero VAD and OpenVoice with configurable compute time.
+
+install() must run before the service module is imported. The real FastAPI
+apps, batching, encoding and HTTP plumbing stay untouched; only the model
+forward passes are replaced by sleeps of the configured length.
+
+Environment knobs (milliseconds):
+    FAKE_ASR_MS_PER_AUDIO_SEC  ASR compute per second of input audio (default 60)
+    FAKE_TTS_BATCH_MS          fixed cost of one TTS forward pass (default 80)
+    FAKE_TTS_MS_PER_SENTENCE   extra cost per sentence in the batch (default 40)
+    FAKE_TRANSCRIPT            text every utterance transcribes to
+"""
+import os
+import sys
+import time
+import types
+
+import numpy as np
+
+def _env_ms(name: str, default: float) -> float:
+    return float(os.getenv(name, default)) / 1000.0
+
+class FakeAutoModel:
+    def __init__(self, *args, **kwargs):
+        self.seconds_per_audio_second = _env_ms("FAKE_ASR_MS_PER_AUDIO_SEC", 60)
+        self.transcript = os.getenv("FAKE_TRANSCRIPT", "what is photosynthesis")
+
+    def generate(self, input=None, **kwargs):
+        duration = len(input) / 16000.0 if input is not None else 0.0
+        time.sleep(duration * self.seconds_per_audio_second)
+        return [{"key": "fake", "text": self.transcript}]
+
+def _fake_silero(torch):
+    class FakeSilero:
+        def __call__(self, audio, sample_rate):
+            # Energy gate stands in for the neural VAD
+            rms = float(audio.pow(2).mean().sqrt())
+            return torch.tensor([1.0 if rms > 0.02 else 0.0])
+
+    utils = (None, None, None, None, None)
+    return FakeSilero(), utils
+
+class _HParams(types.SimpleNamespace):
+    pass
+
+class _FakeVits:
+    def __init__(self, torch, hop_length):
+        self.torch = torch
+        self.hop_length = hop_length
+        self.batch_cost = _env_ms("FAKE_TTS_BATCH_MS", 80)
+        self.sentence_cost = _env_ms("FAKE_TTS_MS_PER_SENTENCE", 40)
+
+    def infer(self, x, x_lengths, sid=None, noise_scale=1, length_scale=1, noise_scale_w=1., **kwargs):
+        torch = self.torch
+        time.sleep(self.batch_cost + self.sentence_cost * x.size(0))
+        # Roughly 4 frames per symbol, like a real speaking rate
+        frames = (x_lengths.float() * 4 * length_scale).long().clamp(min=1)
+        max_frames = int(frames.max())
+        y_mask = torch.zeros(x.size(0), 1, max_frames)
+        for i, n in enumerate(frames.tolist()):
+            y_mask[i, :, :n] = 1
+        audio = torch.randn(x.size(0), 1, max_frames * self.hop_length) * 0.05
+        return audio, None, y_mask, None
+
+    def voice_conversion(self, spec, spec_lengths, sid_src=None, sid_tgt=None, tau=0.3):
+        torch = self.torch
+        time.sleep(self.batch_cost / 2)
+        return (torch.randn(spec.size(0), 1, spec.size(-1) * self.hop_length) * 0.05,)
+
+    def parameters(self):
+        return iter(())
+
+def _fake_openvoice(torch):
+    sampling_rate = 22050
+    hop_length = 256
+
+    class FakeBaseSpeakerTTS:
+        language_marks = {"english": "EN", "chinese": "ZH"}
+
+        def __init__(self, config_path, device="cpu"):
+            self.device = device
+            self.hps = _HParams(
+                data=_HParams(sampling_rate=sampling_rate, hop_length=hop_length,
+                              filter_length=1024, win_length=1024),
+                speakers={"default": 0}
+            )
+            self.model = _FakeVits(torch, hop_length)
+
+        def load_ckpt(self, ckpt_path):
+            pass
+
+        @staticmethod
+        def get_text(text, hps, is_symbol):
+            return torch.LongTensor([ord(c) % 100 for c in text])
+
+        @staticmethod
+        def split_sentences_into_pieces(text, language_str):
+            pieces = [p.strip() for p in text.replace("?", ".").replace("!", ".").split(".")]
+            return [p for p in pieces if p] or [text]
+
+        @staticmethod
+        def audio_numpy_concat(segment_data_list, sr, speed=1.):
+            audio_segments = []
+            for segment_data in segment_data_list:
+                audio_segments.append(np.asarray(segment_data, dtype=np.float32).reshape(-1))
+                audio_segments.append(np.zeros(int((sr * 0.05) / speed), dtype=np.float32))
+            return np.concatenate(audio_segments)
+
+        def tts(self, text, output_path, speaker, language='English', speed=1.0):
+            raise NotImplementedError("Benchmarks go through the batched path")
+
+    class FakeToneColorConverter(FakeBaseSpeakerTTS):
+        pass
+
+    def get_se(audio_path, vc_model, target_dir="processed", vad=True):
+        return torch.zeros(1, 256, 1), os.path.basename(audio_path)
+
+    def spectrogram_torch(y, n_fft, sampling_rate, hop_size, win_size, center=False):
+        return torch.zeros(y.size(0), n_fft // 2 + 1, y.size(-1) // hop_size)
+
+    api = types.ModuleType("openvoice.api")
+    api.BaseSpeakerTTS = FakeBaseSpeakerTTS
+    api.ToneColorConverter = FakeToneColorConverter
+    se_extractor = types.ModuleType("openvoice.se_extractor")
+    se_extractor.get_se = get_se
+    mel_processing = types.ModuleType("openvoice.mel_processing")
+    mel_processing.spectrogram_torch = spectrogram_torch
+    package = types.ModuleType("openvoice")
+    package.api = api
+    package.se_extractor = se_extractor
+    package.mel_processing = mel_processing
+    return package
+
+def install(service: str):
+    """Register fake model modules for the given service before it is imported"""
+    import torch
+
+    if service == "asr":
+        funasr = types.ModuleType("funasr")
+        funasr.AutoModel = FakeAutoModel
+        sys.modules["funasr"] = funasr
+        torch.hub.load = lambda *args, **kwargs: _fake_silero(torch)
+
+    elif service == "tts":
+        package = _fake_openvoice(torch)
+        sys.modules["openvoice"] = package
+        sys.modules["openvoice.api"] = package.api
+        sys.modules["openvoice.se_extractor"] = package.se_extractor
+        sys.modules["openvoice.mel_processing"] = package.mel_processing
+
+        # The default source speaker embedding ships with the checkpoints we don't have
+        real_load = torch.load
+
+        def load(path, *args, **kwargs):
+            if isinstance(path, str) and path.endswith("_se.pth") and not os.path.exists(path):
+                return torch.zeros(1, 256, 1)
+            return real_load(path, *args, **kwargs)
+
+        torch.load = load
@@ -0,0 +1,142 @@
+"""Transcript search: SQLite/FTS5 store vs scanning the per-session JSON logs.
+
+Writes synthetic ConversationLogger files spread over the last 30 days, then
+times the question "which sessions discussed <topic> in the last 7 days" both
+ways, plus a full compaction, a no-op re-run and an incremental one after a
+few sessions gained turns. No services need to be running.
+
+    python benchmarks/transcript_search.py --sessions 5000 --turns 20
+    python benchmarks/transcript_search.py --dir ./bench_logs --keep
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.transcript_store import TranscriptStore
+
+TOPICS = ["fractions", "photosynthesis", "gravity", "verbs", "volcanoes", "multiplication",
+          "electricity", "poetry", "geometry", "rainforests", "magnets", "punctuation"]
+FILLER = ("can you explain that again please I think I understand now what happens next "
+          "that is a great question let us try an example together well done keep going").split()
+
+def sentence(rng: random.Random, topic: str) -> str:
+    words = rng.sample(FILLER, 10)
+    words.insert(rng.randrange(len(words)), topic)
+    return " ".join(words).capitalize() + "."
+
+def write_log(path: str, session_id: str, messages: list, when: float):
+    """messages are (role, content, epoch seconds)"""
+    data = {"session_id": session_id, "timestamp": datetime.fromtimestamp(when).isoformat(),
+            "messages": [{"role": role, "content": content, "timestamp": datetime.fromtimestamp(ts).isoformat()}
+                         for role, content, ts in messages]}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.utime(path, (when, when))
+
+def generate(log_dir: str, sessions: int, turns: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    now = time.time()
+    histories = {}
+    for i in range(sessions):
+        session_id = f"bench-{i:06d}"
+        topic = rng.choice(TOPICS)
+        when = now - rng.uniform(0, 30 * 86400)
+        messages = []
+        for _ in range(turns):
+            messages.append(("user", sentence(rng, topic), when))
+            messages.append(("ai", sentence(rng, rng.choice(TOPICS) if rng.random() < 0.1 else topic), when))
+        write_log(os.path.join(log_dir, f"{session_id}.json"), session_id, messages, when)
+        histories[session_id] = (messages, when)
+    return histories
+
+def file_scan(log_dir: str, word: str, since: float) -> set:
+    """The baseline: open and parse every log"""
+    found = set()
+    for path in glob.glob(os.path.join(log_dir, "*.json")):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for message in data["messages"]:
+            if (datetime.fromisoformat(message["timestamp"]).timestamp() >= since
+                    and word in message["content"].lower()):
+                found.add(data["session_id"])
+                break
+    return found
+
+def timed(fn, repeats: int):
+    times, result = [], None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return result, statistics.median(times)
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcript store vs JSON file scan")
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=10, help="student/teacher exchanges per session")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--dir", default=None, help="work directory (default: a temporary one)")
+    parser.add_argument("--keep", action="store_true", help="keep the generated logs and database")
+    args = parser.parse_args()
+
+    work_dir = args.dir or tempfile.mkdtemp(prefix="transcripts-")
+    log_dir = os.path.join(work_dir, "logs")
+    os.makedirs(log_dir, exist_ok=True)
+    db_path = os.path.join(work_dir, "transcripts.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    try:
+        started = time.perf_counter()
+        histories = generate(log_dir, args.sessions, args.turns, args.seed)
+        log_bytes = sum(os.path.getsize(p) for p in glob.glob(os.path.join(log_dir, "*.json")))
+        print(f"Generated {args.sessions} logs ({log_bytes / 1e6:.1f} MB) in {time.perf_counter() - started:.1f}s")
+
+        store = TranscriptStore(db_path)
+        stats, full_ms = timed(lambda: store.ingest_dir(log_dir), 1)
+        print(f"Full ingest:        {full_ms:9.1f} ms  ({stats['messages']} messages)")
+        stats, noop_ms = timed(lambda: store.ingest_dir(log_dir), 1)
+        print(f"Re-run, no changes: {noop_ms:9.1f} ms  ({stats['skipped_files']} files skipped)")
+
+        # A few sessions carry on: append a turn and rewrite their logs the way the logger does
+        rng = random.Random(args.seed + 1)
+        changed = rng.sample(sorted(histories), max(1, args.sessions // 100))
+        for session_id in changed:
+            messages, _ = histories[session_id]
+            now = time.time()
+            messages += [("user", sentence(rng, "fractions"), now), ("ai", sentence(rng, "fractions"), now)]
+            write_log(os.path.join(log_dir, f"{session_id}.json"), session_id, messages, now)
+        stats, incremental_ms = timed(lambda: store.ingest_dir(log_dir), 1)
+        print(f"Incremental ingest: {incremental_ms:9.1f} ms  "
+              f"({stats['ingested_files']} files, {stats['messages']} new messages)")
+        print(f"Database size:      {store.stats()['bytes'] / 1e6:9.1f} MB")
+
+        since = time.time() - 7 * 86400
+        print(f"\nSessions that discussed <topic> in the last 7 days (median of {args.repeats}):")
+        print(f"{'topic':<16}{'sessions':>9}{'file scan ms':>14}{'store ms':>10}{'speedup':>9}")
+        for word in ("fractions", "volcanoes", "magnets"):
+            scanned, scan_ms = timed(lambda: file_scan(log_dir, word, since), args.repeats)
+            indexed, store_ms = timed(
+                lambda: {hit["session_id"] for hit in store.sessions_matching(word, since=since, limit=10 ** 9)},
+                args.repeats
+            )
+            if scanned != indexed:
+                print(f"  mismatch for {word}: {len(scanned ^ indexed)} sessions differ")
+            print(f"{word:<16}{len(indexed):>9}{scan_ms:>14.1f}{store_ms:>10.2f}{scan_ms / max(store_ms, 1e-6):>8.0f}x")
+        store.close()
+    finally:
+        if not args.keep and args.dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
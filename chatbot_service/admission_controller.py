@@ -0,0 +1,172 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+PositionCallback = Callable[[int], Awaitable[None]]
+
+class ServerBusy(Exception):
+    """The turn was shed instead of queued; retry_after is a hint in seconds"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class _Waiter:
+    def __init__(self, session_id: str, on_position: Optional[PositionCallback]):
+        self.session_id = session_id
+        self.on_position = on_position
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.position: Optional[int] = None
+        self.enqueued = time.perf_counter()
+
+class LLMAdmissionController:
+    """Caps concurrent LLM generations and hands free slots to waiting sessions round-robin.
+
+    Past the cap, turns wait in a per-session queue and sessions take turns, so one
+    chatty student can't starve the class. Turns are shed with ServerBusy when the
+    queue is full, when a session already has too many turns waiting, or after
+    waiting queue_timeout seconds. Waiters hear their queue position as it changes.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, max_queued_per_session: int = 2,
+                 queue_timeout: float = 30.0):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.max_queued_per_session = max_queued_per_session
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._queues: Dict[str, Deque[_Waiter]] = {}
+        self._rotation: Deque[str] = deque()
+        self._avg_turn = 5.0  # Seconds, refined as turns complete
+        self.stats = {"admitted": 0, "queued": 0, "shed": 0, "timed_out": 0, "max_wait_ms": 0.0}
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def snapshot(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "sessions_waiting": len(self._rotation),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "avg_turn_s": round(self._avg_turn, 2),
+            **self.stats,
+        }
+
+    def retry_after(self) -> float:
+        """Rough seconds until the current queue drains"""
+        return round(self._avg_turn * (self.waiting / self.max_concurrent + 1), 1)
+
+    @asynccontextmanager
+    async def slot(self, session_id: str, on_position: Optional[PositionCallback] = None):
+        await self.acquire(session_id, on_position)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._avg_turn = 0.8 * self._avg_turn + 0.2 * (time.perf_counter() - started)
+            self.release()
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free and nobody is waiting; for optional work like speculation"""
+        if self.active < self.max_concurrent and not self._rotation:
+            self.active += 1
+            return True
+        return False
+
+    async def acquire(self, session_id: str, on_position: Optional[PositionCallback] = None):
+        if self.active < self.max_concurrent and not self._rotation:
+            self.active += 1
+            self.stats["admitted"] += 1
+            return
+
+        queued_here = len(self._queues.get(session_id, ()))
+        if self.waiting >= self.max_queue or queued_here >= self.max_queued_per_session:
+            self.stats["shed"] += 1
+            raise ServerBusy("The teacher is busy with other students, please try again shortly",
+                             self.retry_after())
+
+        waiter = _Waiter(session_id, on_position)
+        self._queues.setdefault(session_id, deque()).append(waiter)
+        if session_id not in self._rotation:
+            self._rotation.append(session_id)
+        self.stats["queued"] += 1
+        self._notify_positions()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.future.done():
+                self._record_wait(waiter)
+                return  # Granted just as the timeout fired
+            self._remove(waiter)
+            self.stats["timed_out"] += 1
+            self.stats["shed"] += 1
+            raise ServerBusy("Waited too long for the teacher, please try again", self.retry_after())
+        except asyncio.CancelledError:
+            if waiter.future.done():
+                self.release()  # The slot was handed to us; pass it on
+            else:
+                self._remove(waiter)
+            raise
+        self._record_wait(waiter)
+
+    def release(self):
+        self.active -= 1
+        while self._rotation and self.active < self.max_concurrent:
+            session_id = self._rotation.popleft()
+            queue = self._queues[session_id]
+            waiter = queue.popleft()
+            if queue:
+                self._rotation.append(session_id)  # Back of the line for its next turn
+            else:
+                del self._queues[session_id]
+            self.active += 1
+            self.stats["admitted"] += 1
+            waiter.future.set_result(None)
+        self._notify_positions()
+
+    def _record_wait(self, waiter: _Waiter):
+        waited = (time.perf_counter() - waiter.enqueued) * 1000
+        self.stats["max_wait_ms"] = max(self.stats["max_wait_ms"], waited)
+
+    def _remove(self, waiter: _Waiter):
+        queue = self._queues.get(waiter.session_id)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[waiter.session_id]
+                self._rotation.remove(waiter.session_id)
+        self._notify_positions()
+
+    def _dispatch_order(self) -> List[_Waiter]:
+        """Waiters in the order release() will admit them"""
+        order = []
+        rotation = deque(self._rotation)
+        depth = {session_id: 0 for session_id in rotation}
+        while rotation:
+            session_id = rotation.popleft()
+            queue = self._queues[session_id]
+            order.append(queue[depth[session_id]])
+            depth[session_id] += 1
+            if depth[session_id] < len(queue):
+                rotation.append(session_id)
+        return order
+
+    def _notify_positions(self):
+        for position, waiter in enumerate(self._dispatch_order(), start=1):
+            if waiter.position != position:
+                waiter.position = position
+                if waiter.on_position is not None:
+                    asyncio.ensure_future(self._safe_notify(waiter.on_position, position))
+
+    @staticmethod
+    async def _safe_notify(callback: PositionCallback, position: int):
+        try:
+            await callback(position)
+        except Exception as e:
+            print(f"Queue position update failed: {e}")
@@ -0,0 +1,104 @@
+import asyncio
+import time
+from typing import AsyncContextManager, Callable, Dict, Optional
+
+from admission_controller import ServerBusy
+from gemma_handler import GemmaHandler
+from shared.redis_manager import RedisManager
+
+class ConversationSummarizer:
+    """Folds turns that have left the prompt window into a rolling per-session summary.
+
+    The prompt carries the summary plus every message it doesn't cover yet, so
+    nothing drops out between folds. After a reply has gone out, schedule()
+    checks whether at least `min_new` messages older than the last `window` are
+    not yet in the summary and, if so, asks the LLM to fold them in. The summary
+    and the number of messages it covers live in Redis, so any orchestrator
+    worker can build the next prompt. Like speculation, it normally runs only on
+    spare admission capacity and tries again after the next turn otherwise. The
+    prompt caps the unsummarized messages at window + min_new. Once the backlog
+    is past that and the oldest of them are being dropped, the summarizer waits
+    for a queued slot like a turn instead.
+    """
+
+    def __init__(self, gemma_handler: GemmaHandler, redis_manager: RedisManager, window: int = 6,
+                 min_new: int = 4, max_chars: int = 1200,
+                 try_acquire_slot: Optional[Callable[[], Optional[Callable[[], None]]]] = None,
+                 queued_slot: Optional[Callable[[], AsyncContextManager]] = None):
+        self.gemma_handler = gemma_handler
+        self.redis_manager = redis_manager
+        self.window = max(1, window)
+        self.min_new = max(1, min_new)
+        self.max_chars = max_chars
+        self.try_acquire_slot = try_acquire_slot
+        self.queued_slot = queued_slot
+        self._running: Dict[str, asyncio.Task] = {}
+        self.stats = {"runs": 0, "queued_runs": 0, "skipped_busy": 0, "failures": 0, "messages_folded": 0,
+                      "last_ms": 0.0}
+
+    def get_summary(self, session_id: str) -> dict:
+        """{"text", "covered"}: the prompt carries every message after the first `covered` verbatim"""
+        return self.redis_manager.get_conversation_summary(session_id) or {"text": "", "covered": 0}
+
+    def schedule(self, session_id: str):
+        """Summarize in the background if enough history has left the prompt window"""
+        task = self._running.get(session_id)
+        if task is not None and not task.done():
+            return
+        self._running[session_id] = asyncio.ensure_future(self._run(session_id))
+
+    async def _run(self, session_id: str):
+        try:
+            history = self.redis_manager.get_conversation(session_id)
+            current = self.redis_manager.get_conversation_summary(session_id) or {"text": "", "covered": 0}
+            # The next prompt adds the student's message, so leave window - 1 for it to line up with
+            fold_to = len(history) - (self.window - 1)
+            if fold_to - current["covered"] < self.min_new:
+                return
+
+            def summarize():
+                return asyncio.to_thread(
+                    self.gemma_handler.summarize, current["text"], history[current["covered"]:fold_to], self.max_chars
+                )
+
+            started = time.perf_counter()
+            if self.queued_slot is not None and len(history) - current["covered"] > self.window + self.min_new:
+                # The prompt is already dropping unsummarized messages; don't wait for spare capacity
+                try:
+                    async with self.queued_slot():
+                        summary = await summarize()
+                except ServerBusy:
+                    self.stats["skipped_busy"] += 1
+                    return
+                self.stats["queued_runs"] += 1
+            else:
+                release = None
+                if self.try_acquire_slot is not None:
+                    release = self.try_acquire_slot()
+                    if release is None:
+                        self.stats["skipped_busy"] += 1
+                        return
+                try:
+                    summary = await summarize()
+                finally:
+                    if release is not None:
+                        release()
+
+            if summary:
+                self.redis_manager.set_conversation_summary(session_id, summary, fold_to)
+                self.stats["runs"] += 1
+                self.stats["messages_folded"] += fold_to - current["covered"]
+                self.stats["last_ms"] = (time.perf_counter() - started) * 1000
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats["failures"] += 1
+            print(f"Summarizing {session_id} failed: {e}")
+        finally:
+            if self._running.get(session_id) is asyncio.current_task():
+                del self._running[session_id]
+
+    def clear_session(self, session_id: str):
+        task = self._running.pop(session_id, None)
+        if task is not None:
+            task.cancel()
@@ -1,19 +1,51 @@
 import requests
-from typing import List
+import json
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
 from shared.config import Config
+from ollama_pool import OllamaPool, OllamaBackend, is_backend_failure
 import re
 
+ERROR_REPLY = "I apologize, but I encountered an error processing your question. Could you please try again?"
+
+def keep_alive_value():
+    """OLLAMA_KEEP_ALIVE as Ollama expects it: seconds as a number, or a duration string"""
+    try:
+        return int(Config.OLLAMA_KEEP_ALIVE)
+    except ValueError:
+        return Config.OLLAMA_KEEP_ALIVE
+
 class GemmaHandler:
-    def __init__(self):
+    def __init__(self, api_url: Optional[str] = None, pool: Optional[OllamaPool] = None):
+        # api_url takes the same "url" or "model@url" list as OLLAMA_BACKENDS
+        self.pool = pool or OllamaPool.from_spec(
+            api_url or Config.OLLAMA_BACKENDS or Config.OLLAMA_API_URL, Config.OLLAMA_MODEL,
+            eject_failures=Config.OLLAMA_EJECT_FAILURES, eject_seconds=Config.OLLAMA_EJECT_SECONDS,
+            affinity_slack=Config.OLLAMA_AFFINITY_SLACK
+        )
         # Inform user of integration
-        print("Using Ollama Gemma3n:e2b model via Ollama API (http://localhost:11434)")
-        # You may add a configuration check or connection test here if desired
+        print(f"Using Ollama via {', '.join(backend.name for backend in self.pool.backends)}")
 
-    def build_teacher_prompt(self, conversation_history: List[str], user_input: str) -> str:
-        """Build a dynamic teacher prompt based on conversation context"""
+    def build_teacher_prompt(self, conversation_history: List[str], user_input: str,
+                             summary: Optional[dict] = None) -> str:
+        """Build a dynamic teacher prompt based on conversation context.
+
+        summary is the session's rolling summary as {"text", "covered"}; the messages
+        it doesn't cover yet go in verbatim, at most PROMPT_RECENT_MESSAGES + SUMMARY_MIN_NEW
+        of them. Without one, the last PROMPT_RECENT_MESSAGES do.
+        """
 
         context_messages = []
-        for msg in conversation_history[-6:]:  # Last 6 messages for context
+        if summary is not None:
+            # Only past the cap when summarizing falls behind; the oldest are dropped then
+            cap = Config.PROMPT_RECENT_MESSAGES + Config.SUMMARY_MIN_NEW
+            recent = conversation_history[summary["covered"]:][-cap:]
+        else:
+            recent = conversation_history[-Config.PROMPT_RECENT_MESSAGES:]
+        for msg in recent:  # Recent messages verbatim
             if "::" in msg:
                 role, content = msg.split("::", 1)
                 context_messages.append(f"{role.capitalize()}: {content}")
@@ -35,8 +67,11 @@ Guidelines:
 - If interrupted, acknowledge the interruption and address it before continuing
 - Always be patient and supportive
 
-Previous conversation context:
 """
+        if summary and summary["text"]:
+            # Older turns, folded in the background by ConversationSummarizer
+            system_prompt += f"Summary of the lesson so far:\n{summary['text']}\n\n"
+        system_prompt += "Previous conversation context:\n"
         if context_messages:
             system_prompt += "\n".join(context_messages)
         else:
@@ -45,17 +80,43 @@ Previous conversation context:
         full_prompt = f"{system_prompt}\n\nStudent: {user_input}\nAI Teacher:"
         return full_prompt
 
-    def generate_response(self, conversation_history: List[str], user_input: str) -> str:
-        """Generate AI teacher response using Ollama Gemma3n:e2b"""
+    def cache_key(self, conversation_history: List[str], user_input: str, summary: Optional[dict] = None) -> str:
+        """Response cache key: the model and the prompt, with case and punctuation of the messages ignored"""
+        def normalize(text: str) -> str:
+            return re.sub(r"\s+", " ", re.sub(r"[^\w\s']", " ", text.lower())).strip()
+
+        history = []
+        for msg in conversation_history:
+            if "::" in msg:
+                role, content = msg.split("::", 1)
+                history.append(f"{role}::{normalize(content)}")
+        prompt = self.build_teacher_prompt(history, normalize(user_input), summary)
+        return hashlib.sha256(f"{Config.OLLAMA_MODEL}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def generate_response(self, conversation_history: List[str], user_input: str,
+                          cancelled: Optional[threading.Event] = None, summary: Optional[dict] = None,
+                          session_id: Optional[str] = None) -> str:
+        """Generate AI teacher response on the least busy Ollama backend, or the session's own"""
+        if cancelled is not None:
+            # Streamed so a barge-in can close the connection and stop Ollama mid-answer
+            try:
+                tokens = list(self.stream_response(conversation_history, user_input, cancelled, summary, session_id))
+                return self.clean_response("".join(tokens))
+            except Exception as e:
+                print(f"Error generating response with Ollama: {e}")
+                return ERROR_REPLY
         try:
-            prompt = self.build_teacher_prompt(conversation_history, user_input)
+            prompt = self.build_teacher_prompt(conversation_history, user_input, summary)
             # Call Ollama's API with the prompt
-            response = requests.post(
-                "http://localhost:11434/api/generate",
-                json={"model": "gemma3n:e2b", "prompt": prompt},
-                timeout=90
-            )
-            response.raise_for_status()
+            def send(backend: OllamaBackend):
+                response = requests.post(
+                    f"{backend.url}/api/generate",
+                    json={"model": backend.model, "prompt": prompt, "keep_alive": keep_alive_value()},
+                    timeout=90
+                )
+                response.raise_for_status()
+                return response
+            response = self.pool.call(session_id, send)
             # Ollama may return multiple JSON objects (JSONL), so parse line by line
             print("Ollama raw response:")
             print(response.text)
@@ -78,7 +139,134 @@ Previous conversation context:
 
         except Exception as e:
             print(f"Error generating response with Ollama: {e}")
-            return "I apologize, but I encountered an error processing your question. Could you please try again?"
+            return ERROR_REPLY
+
+    def stream_response(self, conversation_history: List[str], user_input: str,
+                        cancelled: Optional[threading.Event] = None, summary: Optional[dict] = None,
+                        session_id: Optional[str] = None) -> Iterator[str]:
+        """Yield response tokens as Ollama produces them; setting cancelled closes the stream early.
+
+        A backend that fails before the first token is skipped for the next one.
+        """
+        prompt = self.build_teacher_prompt(conversation_history, user_input, summary)
+        tried = []
+        while True:
+            backend = self.pool.acquire(session_id, tried)
+            error = None
+            produced = False
+            try:
+                with requests.post(
+                    f"{backend.url}/api/generate",
+                    json={"model": backend.model, "prompt": prompt, "stream": True, "keep_alive": keep_alive_value()},
+                    timeout=90,
+                    stream=True
+                ) as response:
+                    response.raise_for_status()
+                    for line in response.iter_lines():
+                        if cancelled is not None and cancelled.is_set():
+                            # Closing the connection makes Ollama stop generating
+                            break
+                        if not line:
+                            continue
+                        data = json.loads(line)
+                        if data.get("response"):
+                            produced = True
+                            yield data["response"]
+                        if data.get("done"):
+                            break
+                return
+            except Exception as e:
+                error = e
+                if produced or not is_backend_failure(e):
+                    raise
+                tried.append(backend)
+                self.pool.stats["failovers"] += 1
+                print(f"Ollama backend {backend.name} failed, trying another: {e}")
+            finally:
+                self.pool.release(backend, error)
+
+    def summarize(self, previous_summary: str, messages: List[str], max_chars: int = 1200) -> str:
+        """Fold messages into the running lesson summary; raises on Ollama errors"""
+        transcript = []
+        for msg in messages:
+            if "::" in msg:
+                role, content = msg.split("::", 1)
+                transcript.append(f"{role.capitalize()}: {content}")
+        prompt = (
+            "You keep notes on a tutoring session between an AI Teacher and a student. "
+            "Update the notes with the new part of the conversation. Keep the topics covered, "
+            "what the student understood or struggled with, open questions and anything the "
+            f"teacher promised to come back to. Plain prose, at most {max_chars} characters.\n\n"
+            f"Current notes:\n{previous_summary or '(none yet)'}\n\n"
+            "New conversation:\n" + "\n".join(transcript) + "\n\nUpdated notes:"
+        )
+        def send(backend: OllamaBackend):
+            response = requests.post(
+                f"{backend.url}/api/generate",
+                json={"model": backend.model, "prompt": prompt, "stream": False, "keep_alive": keep_alive_value()},
+                timeout=90
+            )
+            response.raise_for_status()
+            return response
+        response = self.pool.call(None, send)
+        summary = re.sub(r'\s+', ' ', response.json().get("response", "")).strip()
+        return summary[:max_chars]
+
+    def warm_up(self) -> Dict[str, dict]:
+        """Load the model on every backend and pin it with keep_alive, then run a short generation.
+
+        The generation uses the real teacher prompt, so the first student turn
+        finds the model loaded and the system prompt already processed. Raises
+        if no backend could be warmed.
+        """
+        prompt = self.build_teacher_prompt([], "Hello!")
+
+        def warm(backend: OllamaBackend) -> dict:
+            try:
+                started = time.perf_counter()
+                # No prompt: Ollama only loads the model
+                requests.post(
+                    f"{backend.url}/api/generate",
+                    json={"model": backend.model, "keep_alive": keep_alive_value()},
+                    timeout=Config.OLLAMA_LOAD_TIMEOUT
+                ).raise_for_status()
+                loaded = time.perf_counter()
+                requests.post(
+                    f"{backend.url}/api/generate",
+                    json={"model": backend.model, "prompt": prompt, "stream": False,
+                          "keep_alive": keep_alive_value(), "options": {"num_predict": 8}},
+                    timeout=Config.OLLAMA_LOAD_TIMEOUT
+                ).raise_for_status()
+                return {"load_s": round(loaded - started, 2), "warmup_s": round(time.perf_counter() - loaded, 2)}
+            except Exception as e:
+                return {"error": str(e) or type(e).__name__}
+
+        with ThreadPoolExecutor(max_workers=len(self.pool.backends)) as executor:
+            results = dict(zip((b.name for b in self.pool.backends), executor.map(warm, self.pool.backends)))
+        if all("error" in result for result in results.values()):
+            raise RuntimeError(f"No Ollama backend could load the model: {results}")
+        return results
+
+    def ensure_loaded(self) -> List[str]:
+        """Reload the model on backends that unloaded it (Ollama restarted or evicted it); returns their names"""
+        reloaded = []
+        for backend in self.pool.backends:
+            try:
+                response = requests.get(f"{backend.url}/api/ps", timeout=Config.HEALTH_CHECK_TIMEOUT)
+                response.raise_for_status()
+                loaded = {model.get("name") for model in response.json().get("models", [])}
+                if backend.model in loaded:
+                    continue
+                requests.post(
+                    f"{backend.url}/api/generate",
+                    json={"model": backend.model, "keep_alive": keep_alive_value()},
+                    timeout=Config.OLLAMA_LOAD_TIMEOUT
+                ).raise_for_status()
+                reloaded.append(backend.name)
+            except Exception as e:
+                # Down backends are the pool's health checks' business
+                print(f"Could not check the model on {backend.name}: {e}")
+        return reloaded
 
     def clean_response(self, response: str) -> str:
         """Clean and format the AI response, but never return empty if model output is non-empty"""
@@ -0,0 +1,163 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+Probe = Callable[[], Awaitable[bool]]
+
+class DependencyUnavailable(Exception):
+    """A dependency's circuit is open; retry_after is when the next trial request is allowed"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable, please try again shortly")
+        self.name = name
+        self.retry_after = retry_after
+
+class _Dependency:
+    def __init__(self, name: str, probe: Probe, history: int):
+        self.name = name
+        self.probe = probe
+        self.status = "unknown"
+        self.circuit = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.last_checked: Optional[float] = None
+        self.last_error = ""
+        self.latencies: Deque[float] = deque(maxlen=history)
+
+class HealthMonitor:
+    """Probes dependencies concurrently in the background and keeps a circuit breaker per dependency.
+
+    /health reads the cached state instead of probing. Callers ask allow() before
+    talking to a dependency and report how it went with record_success() and
+    record_failure(). After failure_threshold failures in a row, from probes or
+    real calls, the circuit opens and allow() says no for reset_timeout seconds.
+    Then a single trial request is let through (half-open), and its outcome
+    closes or re-opens the circuit.
+    """
+
+    def __init__(self, interval: float = 5.0, timeout: float = 2.0, failure_threshold: int = 3,
+                 reset_timeout: float = 15.0, history: int = 20):
+        self.interval = interval
+        self.timeout = timeout
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.history = history
+        self._dependencies: Dict[str, _Dependency] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, probe: Probe):
+        """probe returns True when healthy; raising or timing out counts as unreachable"""
+        self._dependencies[name] = _Dependency(name, probe, self.history)
+
+    def start(self):
+        if self._dependencies and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self.check_all()
+            await asyncio.sleep(self.interval)
+
+    async def check_all(self):
+        await asyncio.gather(*(self._check(dep) for dep in self._dependencies.values()))
+
+    async def _check(self, dep: _Dependency):
+        started = time.perf_counter()
+        try:
+            healthy = await asyncio.wait_for(dep.probe(), self.timeout)
+            error = "" if healthy else "unhealthy response"
+            status = "healthy" if healthy else "unhealthy"
+        except Exception as e:
+            healthy = False
+            error = str(e) or type(e).__name__
+            status = "unreachable"
+        dep.latencies.append((time.perf_counter() - started) * 1000)
+        dep.last_checked = time.time()
+        dep.status = status
+        if healthy:
+            self._succeeded(dep)
+        else:
+            dep.last_error = error
+            self._failed(dep)
+
+    def allow(self, name: str) -> bool:
+        """Whether a request to the dependency should be attempted now"""
+        dep = self._dependencies.get(name)
+        if dep is None or dep.circuit == "closed":
+            return True
+        if dep.circuit == "open" and time.monotonic() - dep.opened_at >= self.reset_timeout:
+            dep.circuit = "half_open"
+        if dep.circuit == "half_open" and not dep.trial_in_flight:
+            dep.trial_in_flight = True
+            return True
+        return False
+
+    def check(self, name: str):
+        """allow() that raises DependencyUnavailable instead of returning False"""
+        if not self.allow(name):
+            raise DependencyUnavailable(name, self.retry_after(name))
+
+    def retry_after(self, name: str) -> float:
+        dep = self._dependencies.get(name)
+        if dep is None or dep.circuit != "open":
+            return 1.0
+        return max(1.0, round(self.reset_timeout - (time.monotonic() - dep.opened_at), 1))
+
+    def record_success(self, name: str):
+        dep = self._dependencies.get(name)
+        if dep is not None:
+            self._succeeded(dep)
+
+    def record_failure(self, name: str, error: str = ""):
+        dep = self._dependencies.get(name)
+        if dep is not None:
+            dep.last_error = error or dep.last_error
+            self._failed(dep)
+
+    def release_trial(self, name: str):
+        """The half-open trial allow() granted never reached the dependency (shed or cancelled); let the next caller try"""
+        dep = self._dependencies.get(name)
+        if dep is not None and dep.circuit == "half_open":
+            dep.trial_in_flight = False
+
+    def _succeeded(self, dep: _Dependency):
+        dep.consecutive_failures = 0
+        dep.trial_in_flight = False
+        dep.circuit = "closed"
+
+    def _failed(self, dep: _Dependency):
+        dep.consecutive_failures += 1
+        dep.trial_in_flight = False
+        if dep.circuit == "half_open" or (dep.circuit == "closed"
+                                          and dep.consecutive_failures >= self.failure_threshold):
+            dep.circuit = "open"
+            dep.opened_at = time.monotonic()
+            print(f"Circuit for {dep.name} opened after {dep.consecutive_failures} failures: {dep.last_error}")
+
+    def status(self, name: str) -> str:
+        dep = self._dependencies.get(name)
+        return dep.status if dep is not None else "unknown"
+
+    def snapshot(self) -> dict:
+        result = {}
+        for name, dep in self._dependencies.items():
+            latencies = sorted(dep.latencies)
+            result[name] = {
+                "status": dep.status,
+                "circuit": dep.circuit,
+                "consecutive_failures": dep.consecutive_failures,
+                "last_checked": dep.last_checked,
+                "last_error": dep.last_error,
+                "latency_ms": round(dep.latencies[-1], 1) if dep.latencies else None,
+                "avg_latency_ms": round(sum(latencies) / len(latencies), 1) if latencies else None,
+                "p95_latency_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 1) if latencies else None,
+                "history_ms": [round(latency, 1) for latency in dep.latencies],
+            }
+        return result
@@ -1,34 +1,38 @@
-import asyncio
-from typing import Optional, Dict, Any
-import requests
-from shared.config import Config
+import time
+from typing import Optional, Dict, Any, Awaitable, Callable
 from shared.redis_manager import RedisManager
 
 class InterruptionManager:
     def __init__(self):
+        # Interruption context lives in Redis so any orchestrator worker can pick up the session
         self.redis_manager = RedisManager()
-        self.active_sessions: Dict[str, Dict[str, Any]] = {}
     
-    async def handle_interruption(self, session_id: str, interruption_text: str) -> Dict[str, Any]:
+    async def interrupt(self, session_id: str, reason: str, stop_speech: Callable[[str], Awaitable[Optional[dict]]],
+                        reply: str = "") -> Optional[dict]:
+        """Stop the session's speech and remember the cut-off answer for a continuation.
+
+        stop_speech is the orchestrator's stop_session_speech, which reaches the TTS
+        service in-process, through the health monitor or with a timeout. reply is
+        the answer still being generated, if any; returns what /stop answered.
+        """
+        # The TTS service keeps what was cut off for a resume
+        tts = await stop_speech(session_id)
+        interrupted = tts.get("interrupted") if tts else None
+        interrupted_text = reply or (interrupted["text"] if interrupted else "")
+        if interrupted_text:
+            self.redis_manager.set_interruption_context(session_id, self.interruption_context(
+                interrupted_text, reason, interrupted
+            ))
+        return tts
+    
+    async def handle_interruption(self, session_id: str, interruption_text: str,
+                                  stop_speech: Callable[[str], Awaitable[Optional[dict]]],
+                                  reply: str = "") -> Dict[str, Any]:
         """Handle user interruption during TTS playback"""
         try:
-            # Stop current TTS
-            stop_response = requests.post(f"{Config.OPENVOICE_SERVICE_URL}/stop/{session_id}")
-            
-            # Get the interrupted state
-            tts_status = requests.get(f"{Config.OPENVOICE_SERVICE_URL}/status/{session_id}")
-            interrupted_text = ""
-            
-            if tts_status.status_code == 200:
-                status_data = tts_status.json()
-                interrupted_text = status_data.get("current_text", "")
-            
-            # Store interruption context
-            self.active_sessions[session_id] = {
-                "interrupted_text": interrupted_text,
-                "interruption_reason": interruption_text,
-                "timestamp": asyncio.get_event_loop().time()
-            }
+            tts = await self.interrupt(session_id, interruption_text, stop_speech, reply)
+            interrupted = tts.get("interrupted") if tts else None
+            interrupted_text = reply or (interrupted["text"] if interrupted else "")
             
             # Add interruption to conversation history
             self.redis_manager.add_message(session_id, "user", f"[INTERRUPTION]: {interruption_text}")
@@ -45,13 +49,29 @@ class InterruptionManager:
                 "error": f"Failed to handle interruption: {str(e)}"
             }
     
+    @staticmethod
+    def interruption_context(interrupted_text: str, reason: str, speech: Optional[dict] = None) -> Dict[str, Any]:
+        """Context stored for an interruption; speech is what the TTS service's /stop kept for a resume"""
+        context = {
+            "interrupted_text": interrupted_text,
+            "interruption_reason": reason,
+            "timestamp": time.time(),
+            "resumable": speech is not None
+        }
+        if speech is not None:
+            # Estimated by the TTS service; the client's reported playback position refines it on resume
+            context["remaining_text"] = speech["remaining_text"]
+            context["remaining_seconds"] = speech["remaining_seconds"]
+        return context
+    
     async def check_continuation_needed(self, session_id: str, ai_response: str) -> Dict[str, Any]:
         """Check if we need to continue from interrupted content"""
-        if session_id not in self.active_sessions:
+        interruption_data = self.redis_manager.get_interruption_context(session_id)
+        if interruption_data is None:
             return {"continue": False}
         
-        interruption_data = self.active_sessions[session_id]
-        interrupted_text = interruption_data.get("interrupted_text", "")
+        # The part the student hasn't heard yet, when the TTS service remembers the answer
+        interrupted_text = interruption_data.get("remaining_text") or interruption_data.get("interrupted_text", "")
         
         # Simple check: if AI response addresses the interruption and it was substantial
         if len(interrupted_text) > 50:  # If there was substantial interrupted content
@@ -59,14 +79,16 @@ class InterruptionManager:
             return {
                 "continue": True,
                 "continuation_text": interrupted_text,
-                "continuation_prompt": continuation_prompt
+                "continuation_prompt": continuation_prompt,
+                # POST /sessions/{id}/continue replays the remembered audio instead of generating it again
+                "resumable": interruption_data.get("resumable", False),
+                "remaining_seconds": interruption_data.get("remaining_seconds")
             }
         
         # Clear the session after handling
-        del self.active_sessions[session_id]
+        self.redis_manager.clear_interruption_context(session_id)
         return {"continue": False}
     
     def clear_session(self, session_id: str):
         """Clear interruption data for a session"""
-        if session_id in self.active_sessions:
-            del self.active_sessions[session_id]
+        self.redis_manager.clear_interruption_context(session_id)
@@ -0,0 +1,53 @@
+"""Standalone LLM worker for JOB_TRANSPORT=redis.
+
+Consumes generation jobs from the "llm" stream and answers them through its
+own Ollama host, so capacity grows by pointing more workers at more Ollama
+instances, without touching the orchestrator.
+
+    python llm_worker.py --ollama-url http://gpu-box-2:11434 --concurrency 4
+    python llm_worker.py --ollama-url http://gpu-box-2:11434,http://gpu-box-3:11434 --concurrency 8
+"""
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import argparse
+import asyncio
+
+from shared.config import Config
+from shared.job_bus import JobBus, JobWorker
+from shared.tracing import Tracer
+from gemma_handler import GemmaHandler
+
+async def run(ollama_url: str, concurrency: int):
+    gemma_handler = GemmaHandler(api_url=ollama_url)
+    gemma_handler.pool.start_health_checks(Config.HEALTH_CHECK_INTERVAL, Config.HEALTH_CHECK_TIMEOUT)
+    try:
+        # Load and warm the model before taking jobs, so no queued turn waits for it
+        print(f"Warmed up Ollama: {await asyncio.to_thread(gemma_handler.warm_up)}")
+    except RuntimeError as e:
+        print(f"Warmup failed, consuming jobs anyway: {e}")
+
+    async def handle(payload: dict) -> dict:
+        text = await asyncio.to_thread(
+            gemma_handler.generate_response, payload["history"], payload["message"], None, payload.get("summary"),
+            payload.get("session_id")
+        )
+        return {"text": text}
+
+    worker = JobWorker(JobBus(), "llm", handle, concurrency=concurrency, tracer=Tracer("llm-worker"))
+    print(f"LLM worker {worker.consumer} consuming jobs:llm with concurrency {concurrency}")
+    await worker.run()
+
+def main():
+    parser = argparse.ArgumentParser(description="AI Teacher LLM job worker")
+    parser.add_argument("--ollama-url", default=Config.OLLAMA_BACKENDS or Config.OLLAMA_API_URL)
+    parser.add_argument("--concurrency", type=int, default=Config.JOB_LLM_CONCURRENCY)
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args.ollama_url, args.concurrency))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
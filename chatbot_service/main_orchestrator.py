@@ -7,15 +7,28 @@ from pydantic import BaseModel
 import asyncio
 import requests
 import json
-from typing import Dict, List, Optional
+import time
+from typing import List, Optional
+from contextlib import AsyncExitStack
 import uuid
 
 from shared.config import Config
 from shared.redis_manager import RedisManager
 from shared.conversation_logger import ConversationLogger
-from gemma_handler import GemmaHandler
+from shared.transcript_store import parse_time
+from shared.tracing import Tracer, TRACE_HEADER, new_trace_id, load_spans, render_waterfall
+from shared import local_services
+from shared.job_bus import JobBus, JobFailed, start_worker
+from gemma_handler import GemmaHandler, ERROR_REPLY
 from sentiment_analyzer import SentimentAnalyzer
 from interruption_manager import InterruptionManager
+from session_hub import SessionHub
+from admission_controller import LLMAdmissionController, ServerBusy
+from speculative_generator import SpeculativeGenerator
+from turn_registry import ActiveTurn, TurnRegistry, TurnCancelled
+from conversation_summarizer import ConversationSummarizer
+from health_monitor import HealthMonitor, DependencyUnavailable
+from readiness import Readiness
 
 app = FastAPI(title="AI Teacher Orchestrator")
 
@@ -26,6 +39,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[TRACE_HEADER],
 )
 
 # Initialize components
@@ -34,13 +48,245 @@ conversation_logger = ConversationLogger()
 gemma_handler = GemmaHandler()
 sentiment_analyzer = SentimentAnalyzer()
 interruption_manager = InterruptionManager()
+tracer = Tracer("orchestrator")
+tracer.install_middleware(app)
 
-# Active WebSocket connections
-active_connections: Dict[str, WebSocket] = {}
+# Keeps concurrent Ollama requests at the backend's sweet spot and queues the rest fairly
+llm_admission = LLMAdmissionController(
+    max_concurrent=Config.LLM_MAX_CONCURRENT,
+    max_queue=Config.LLM_MAX_QUEUE,
+    max_queued_per_session=Config.LLM_MAX_QUEUED_PER_SESSION,
+    queue_timeout=Config.LLM_QUEUE_TIMEOUT
+)
+
+def try_speculation_slot():
+    # Speculation only uses spare capacity; it never queues ahead of real turns
+    return llm_admission.release if llm_admission.try_acquire() else None
+
+# Keeps long lessons in context without growing the prompt; runs after replies, on spare capacity
+summarizer = ConversationSummarizer(
+    gemma_handler, redis_manager,
+    window=Config.PROMPT_RECENT_MESSAGES, min_new=Config.SUMMARY_MIN_NEW,
+    max_chars=Config.SUMMARY_MAX_CHARS, try_acquire_slot=try_speculation_slot,
+    # Summaries that fell behind queue in a lane of their own, taking turns with the students
+    queued_slot=lambda: llm_admission.slot("summarizer")
+) if Config.SUMMARY_ENABLED else None
+
+def get_summary(session_id: str) -> Optional[dict]:
+    return summarizer.get_summary(session_id) if summarizer is not None else None
+
+speculator = SpeculativeGenerator(
+    gemma_handler, redis_manager.get_conversation,
+    stable_ms=Config.SPECULATION_STABLE_MS, try_acquire_slot=try_speculation_slot,
+    get_summary=get_summary
+) if Config.SPECULATIVE_GENERATION else None
+
+# With JOB_TRANSPORT=redis, LLM and TTS work goes through Redis Streams to any number of workers
+job_bus = JobBus() if Config.JOB_TRANSPORT == "redis" else None
+job_workers = []
+
+# Dependency health, probed in the background; calls check it to fail fast on dead services
+health_monitor = HealthMonitor(
+    interval=Config.HEALTH_CHECK_INTERVAL,
+    timeout=Config.HEALTH_CHECK_TIMEOUT,
+    failure_threshold=Config.CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=Config.CIRCUIT_RESET_TIMEOUT
+)
+
+def http_probe(url: str):
+    async def probe() -> bool:
+        response = await asyncio.to_thread(requests.get, url, timeout=Config.HEALTH_CHECK_TIMEOUT)
+        return response.status_code == 200
+    return probe
+
+async def ollama_probe() -> bool:
+    # Probes every backend, ejecting dead ones from the pool; healthy while any is left
+    healthy = await asyncio.to_thread(gemma_handler.pool.check_health, Config.HEALTH_CHECK_TIMEOUT)
+    return healthy > 0
+
+async def redis_probe() -> bool:
+    return await asyncio.to_thread(redis_manager.redis_client.ping)
+
+@app.on_event("startup")
+async def start_health_monitor():
+    if not local_services.enabled():
+        # All-in-one: the ASR and TTS services live in this process and are up if we are
+        health_monitor.register("funasr", http_probe(f"{Config.FUNASR_SERVICE_URL}/health"))
+        health_monitor.register("openvoice", http_probe(f"{Config.OPENVOICE_SERVICE_URL}/health"))
+    if job_bus is None:
+        # With the job bus, LLM workers talk to Ollama and the queue absorbs outages
+        health_monitor.register("ollama", ollama_probe)
+    health_monitor.register("redis", redis_probe)
+    health_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_health_monitor():
+    await health_monitor.stop()
+
+# Startup work that must finish before /ready: no real turn should load a model
+readiness = Readiness()
+keep_warm_task = None
+
+async def load_sentiment_lexicon():
+    await asyncio.to_thread(sentiment_analyzer.load)
+
+async def warm_up_llm() -> dict:
+    return await asyncio.to_thread(gemma_handler.warm_up)
+
+async def keep_model_loaded():
+    """keep_alive pins the model, but Ollama restarts and memory pressure still unload it"""
+    while True:
+        await asyncio.sleep(Config.OLLAMA_KEEP_WARM_INTERVAL)
+        reloaded = await asyncio.to_thread(gemma_handler.ensure_loaded)
+        if reloaded:
+            print(f"Reloaded {Config.OLLAMA_MODEL} on {', '.join(reloaded)}")
+
+@app.on_event("startup")
+async def start_readiness():
+    global keep_warm_task
+    # Without the lexicon (offline, NLTK_AUTO_DOWNLOAD=false) emotions fall back to "default"; still serve
+    readiness.register("sentiment_lexicon", load_sentiment_lexicon, required=False)
+    readiness.register("redis", redis_probe)
+    # With the job bus, LLM workers warm their own Ollama hosts
+    readiness.register("llm_warmup", warm_up_llm, required=job_bus is None)
+    readiness.start()
+    keep_warm_task = asyncio.create_task(keep_model_loaded())
+
+@app.on_event("shutdown")
+async def stop_readiness():
+    await readiness.stop()
+    if keep_warm_task is not None:
+        keep_warm_task.cancel()
+
+# Turns being generated or spoken on this worker, so a barge-in can cancel them
+active_turns = TurnRegistry()
+
+async def handle_session_control(message: dict):
+    """Control messages broadcast to every worker through the session hub"""
+    if message.get("type") == "barge_in":
+        active_turns.cancel(message["session_id"])
+
+# Active WebSocket connections; events for sockets held by other workers go through Redis pub/sub
+session_hub = SessionHub(on_control=handle_session_control)
+
+@app.on_event("startup")
+async def start_session_hub():
+    await session_hub.start()
+
+@app.on_event("shutdown")
+async def stop_session_hub():
+    await session_hub.stop()
+
+async def run_llm_job(payload: dict) -> dict:
+    text = await asyncio.to_thread(
+        gemma_handler.generate_response, payload["history"], payload["message"], None, payload.get("summary"),
+        payload.get("session_id")
+    )
+    return {"text": text}
+
+@app.on_event("startup")
+async def start_job_workers():
+    """The orchestrator doubles as an LLM worker; llm_worker.py adds more without an HTTP front"""
+    if job_bus is not None:
+        job_workers.append(start_worker(job_bus, "llm", run_llm_job, Config.JOB_LLM_CONCURRENCY, tracer))
+
+def queue_position_notifier(session_id: str):
+    """Tell the session's socket, on whichever worker holds it, where its turn is in the LLM queue"""
+    async def notify(position: int):
+        await session_hub.send(session_id, {
+            "type": "queue_position",
+            "position": position,
+            "message": f"You're number {position} in line, the teacher will be right with you",
+            "session_id": session_id
+        })
+    return notify
+
+async def generate_reply(conversation_history: List[str], user_input: str, trace_id: str, session_id: str) -> str:
+    """Generate a reply once the admission controller grants a slot.
+
+    Raises ServerBusy when shed and TurnCancelled when the student barges in.
+    """
+    turn = active_turns.get(session_id)
+    cancelled = turn.cancelled if turn else None
+    summary = get_summary(session_id)
+    if speculator is not None:
+        with tracer.span("llm.speculative", trace_id, session_id=session_id) as span:
+            reply = await speculator.claim(session_id, user_input)
+            span["attributes"]["hit"] = reply is not None
+        if reply is not None:
+            if turn:
+                turn.check()
+            return reply
+
+    cache_key = None
+    if Config.RESPONSE_CACHE:
+        cache_key = gemma_handler.cache_key(conversation_history, user_input, summary)
+        with tracer.span("llm.cache", trace_id, session_id=session_id) as span:
+            reply = redis_manager.get_cached_response(cache_key)
+            span["attributes"]["hit"] = reply is not None
+        if reply is not None:
+            if turn:
+                turn.check()
+            return reply
+
+    # Ollama is called from here only without the job bus; then its outcome drives the circuit
+    unreported = job_bus is None
+    if unreported:
+        health_monitor.check("ollama")
+    try:
+        async with AsyncExitStack() as stack:
+            with tracer.span("llm.queue", trace_id, session_id=session_id):
+                # Held until generation ends; slot() times it for retry_after and avg_turn_s
+                await stack.enter_async_context(llm_admission.slot(session_id, queue_position_notifier(session_id)))
+            if turn:
+                turn.check()  # Barged in while queued; don't spend the slot
+            with tracer.span("llm.generate", trace_id, session_id=session_id, model=Config.OLLAMA_MODEL) as span:
+                if job_bus is not None:
+                    # A queued job can't be stopped remotely; its result is just dropped
+                    result = await job_bus.call("llm", {
+                        "history": conversation_history, "message": user_input, "summary": summary,
+                        "session_id": session_id
+                    }, trace_id)
+                    ai_response = result["text"]
+                else:
+                    try:
+                        ai_response = await asyncio.to_thread(
+                            gemma_handler.generate_response, conversation_history, user_input, cancelled, summary,
+                            session_id
+                        )
+                    except Exception as e:
+                        health_monitor.record_failure("ollama", str(e) or type(e).__name__)
+                        unreported = False
+                        raise
+                    # generate_response turns every Ollama error into ERROR_REPLY
+                    if ai_response == ERROR_REPLY:
+                        health_monitor.record_failure("ollama", "generation failed")
+                    else:
+                        health_monitor.record_success("ollama")
+                    unreported = False
+                span["attributes"]["chars"] = len(ai_response)
+                span["attributes"]["cancelled"] = bool(cancelled and cancelled.is_set())
+            if turn:
+                turn.check()
+            # Only the opening turn's prompt is the same for every student
+            if (cache_key is not None and len(conversation_history) <= 1 and not (summary and summary["text"])
+                    and ai_response and ai_response != ERROR_REPLY):
+                redis_manager.cache_response(cache_key, ai_response)
+            return ai_response
+    finally:
+        if unreported:
+            # Shed, cancelled or barged in before Ollama was asked: a half-open trial proved nothing
+            health_monitor.release_trial("ollama")
 
 class ChatRequest(BaseModel):
     session_id: str
     message: str
+    trace_id: Optional[str] = None
+    audio_format: Optional[str] = None  # Encoding the client can play; remembered for the session
+
+class PartialTranscript(BaseModel):
+    session_id: str
+    text: str
 
 class ChatResponse(BaseModel):
     session_id: str
@@ -52,12 +298,17 @@ class ChatResponse(BaseModel):
     audio_duration: float = 0.0
     tts_success: bool = False
     tts_error: Optional[str] = ""
+    trace_id: Optional[str] = None
+    continuation: Optional[dict] = None  # Offer to resume an interrupted answer (see /sessions/{id}/continue)
+
+class PlaybackPosition(BaseModel):
+    played_seconds: float
 
 @app.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
     """Main WebSocket endpoint for real-time AI teacher interaction"""
     await websocket.accept()
-    active_connections[session_id] = websocket
+    await session_hub.connect(session_id, websocket)
     
     try:
         await websocket.send_text(json.dumps({
@@ -71,18 +322,30 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
             data = await websocket.receive_text()
             message_data = json.loads(data)
             
+            if message_data.get("audio_format"):
+                try:
+                    session_audio_format(session_id, message_data["audio_format"])
+                except HTTPException as e:
+                    await websocket.send_text(json.dumps({"type": "error", "message": e.detail, "session_id": session_id}))
+            
             if message_data.get("type") == "start_listening":
                 await handle_voice_interaction(websocket, session_id)
             elif message_data.get("type") == "interrupt":
                 await handle_interruption(websocket, session_id, message_data.get("text", ""))
             elif message_data.get("type") == "text_input":
                 await handle_text_input(websocket, session_id, message_data.get("text", ""))
+            elif message_data.get("type") == "barge_in":
+                await barge_in(session_id)
+            elif message_data.get("type") == "playback_position":
+                await report_playback(session_id, PlaybackPosition(played_seconds=message_data.get("played_seconds", 0.0)))
+            elif message_data.get("type") == "continue":
+                await handle_continue(websocket, session_id)
                 
     except WebSocketDisconnect:
-        if session_id in active_connections:
-            del active_connections[session_id]
         interruption_manager.clear_session(session_id)
         print(f"Client {session_id} disconnected")
+    finally:
+        await session_hub.disconnect(session_id, websocket)
 
 async def handle_voice_interaction(websocket: WebSocket, session_id: str):
     """Handle voice-based interaction cycle"""
@@ -143,7 +406,10 @@ async def handle_text_input(websocket: WebSocket, session_id: str, text: str):
 
 async def handle_interruption(websocket: WebSocket, session_id: str, interruption_text: str):
     """Handle user interruption during AI speech"""
-    result = await interruption_manager.handle_interruption(session_id, interruption_text)
+    turn = active_turns.get(session_id)
+    result = await interruption_manager.handle_interruption(
+        session_id, interruption_text, stop_session_speech, turn.reply if turn is not None and turn.reply else ""
+    )
     
     await websocket.send_text(json.dumps({
         "type": "interruption_handled",
@@ -156,187 +422,448 @@ async def handle_interruption(websocket: WebSocket, session_id: str, interruptio
         # Process the interruption as new input
         await process_user_input(websocket, session_id, interruption_text)
 
+async def handle_continue(websocket: WebSocket, session_id: str):
+    """Pick the interrupted answer up where the student's playback stopped"""
+    try:
+        result = await continue_interrupted(session_id, new_trace_id())
+    except HTTPException as e:
+        await websocket.send_text(json.dumps({"type": "error", "message": e.detail, "session_id": session_id}))
+        return
+    await websocket.send_text(json.dumps({"type": "continuation", **result}))
+
 async def process_user_input(websocket: WebSocket, session_id: str, user_input: str):
     """Process user input through the AI teacher pipeline"""
-    try:
-        # Add user message to conversation history
-        redis_manager.add_message(session_id, "user", user_input)
-        
-        # Get conversation history for context
-        conversation_history = redis_manager.get_conversation(session_id)
+    trace_id = new_trace_id()
+    with active_turns.track(session_id, trace_id) as turn:
+        try:
+            # Add user message to conversation history
+            redis_manager.add_message(session_id, "user", user_input)
         
-        # Generate AI response using Gemma
-        await websocket.send_text(json.dumps({
-            "type": "status",
-            "message": "Thinking...",
-            "session_id": session_id
-        }))
+            # Get conversation history for context
+            conversation_history = redis_manager.get_conversation(session_id)
         
-        ai_response = await asyncio.to_thread(gemma_handler.generate_response, conversation_history, user_input)
+            # Generate AI response using Gemma
+            await websocket.send_text(json.dumps({
+                "type": "status",
+                "message": "Thinking...",
+                "session_id": session_id
+            }))
         
-        # Clean response (remove asterisks and formatting)
-        clean_response = ai_response.replace("*", "").strip()
+            try:
+                ai_response = await generate_reply(conversation_history, user_input, trace_id, session_id)
+            except ServerBusy as e:
+                await websocket.send_text(json.dumps({
+                    "type": "busy",
+                    "message": str(e),
+                    "retry_after": e.retry_after,
+                    "session_id": session_id
+                }))
+                return
         
-        # Add AI response to conversation history
-        redis_manager.add_message(session_id, "ai", clean_response)
+            # Clean response (remove asterisks and formatting)
+            clean_response = ai_response.replace("*", "").strip()
+            turn.reply = clean_response
         
-        # Analyze sentiment for emotion
-        recent_messages = redis_manager.get_recent_messages(session_id, 3)
-        emotion = sentiment_analyzer.analyze_conversation(recent_messages)
+            # Add AI response to conversation history
+            redis_manager.add_message(session_id, "ai", clean_response)
         
-        # Send AI response to user
-        await websocket.send_text(json.dumps({
-            "type": "ai_response",
-            "text": clean_response,
-            "emotion": emotion,
-            "session_id": session_id
-        }))
+            # Analyze sentiment for emotion
+            recent_messages = redis_manager.get_recent_messages(session_id, 3)
+            emotion = sentiment_analyzer.analyze_conversation(recent_messages)
         
-        # Send to TTS for speech synthesis
-        await websocket.send_text(json.dumps({
-            "type": "status",
-            "message": "Speaking...",
-            "session_id": session_id
-        }))
-        
-        tts_response = requests.post(
-            f"{Config.OPENVOICE_SERVICE_URL}/synthesize",
-            json={
-                "session_id": session_id,
+            # Send AI response to user
+            await websocket.send_text(json.dumps({
+                "type": "ai_response",
                 "text": clean_response,
                 "emotion": emotion,
-                "stream": True
-            },
-            timeout=30
-        )
-        
-        if tts_response.status_code == 200:
-            tts_data = tts_response.json()
-            await websocket.send_text(json.dumps({
-                "type": "tts_complete",
-                "success": tts_data["success"],
-                "duration": tts_data.get("audio_duration", 0.0),
-                "audio_url": tts_data.get("audio_url"),
-                "session_id": session_id
+                "session_id": session_id,
+                "trace_id": trace_id
             }))
-        else:
+        
+            # Send to TTS for speech synthesis
             await websocket.send_text(json.dumps({
-                "type": "tts_error",
-                "message": "Failed to synthesize speech",
+                "type": "status",
+                "message": "Speaking...",
                 "session_id": session_id
             }))
         
-        # Log conversation
-        updated_history = redis_manager.get_conversation(session_id)
-        conversation_logger.log_conversation(session_id, updated_history)
+            tts_data = await request_speech({
+                "session_id": session_id,
+                "text": clean_response,
+                "emotion": emotion,
+                "stream": True,
+                "format": session_audio_format(session_id),
+                "voice": Config.TEACHER_VOICE or None
+            }, trace_id)
+            turn.check()
+        
+            if tts_data is not None:
+                await websocket.send_text(json.dumps({
+                    "type": "tts_complete",
+                    "success": tts_data["success"],
+                    "duration": tts_data.get("audio_duration", 0.0),
+                    "audio_url": tts_data.get("audio_url"),
+                    "session_id": session_id,
+                    "trace_id": trace_id
+                }))
+            else:
+                await websocket.send_text(json.dumps({
+                    "type": "tts_error",
+                    "message": "Failed to synthesize speech",
+                    "session_id": session_id
+                }))
+        
+            # Log conversation
+            updated_history = redis_manager.get_conversation(session_id)
+            conversation_logger.log_conversation(session_id, updated_history)
+            if summarizer is not None:
+                summarizer.schedule(session_id)
+        
+            # Check if we need to continue from interruption
+            continuation = await interruption_manager.check_continuation_needed(session_id, clean_response)
+            if continuation.get("continue", False):
+                await websocket.send_text(json.dumps({
+                    "type": "continuation_available",
+                    "text": continuation.get("continuation_text", ""),
+                    "resumable": continuation.get("resumable", False),
+                    "session_id": session_id
+                }))
         
-        # Check if we need to continue from interruption
-        continuation = await interruption_manager.check_continuation_needed(session_id, clean_response)
-        if continuation.get("continue", False):
+        except TurnCancelled as e:
+            print(e)
+        except Exception as e:
             await websocket.send_text(json.dumps({
-                "type": "continuation_available",
-                "text": continuation.get("continuation_text", ""),
+                "type": "error",
+                "message": f"Failed to process input: {str(e)}",
                 "session_id": session_id
             }))
-        
-    except Exception as e:
-        await websocket.send_text(json.dumps({
-            "type": "error",
-            "message": f"Failed to process input: {str(e)}",
-            "session_id": session_id
-        }))
 
 from fastapi import Request as FastAPIRequest
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest, fastapi_request: FastAPIRequest):
-    """REST API endpoint for chat (alternative to WebSocket)"""
+async def request_speech(payload: dict, trace_id: str) -> Optional[dict]:
+    """Render speech to a file on the TTS service; returns its metadata, or None on failure"""
+    with tracer.span("tts.request", trace_id, session_id=payload["session_id"]):
+        local = local_services.get("tts.synthesize")
+        if local:
+            try:
+                return await local(payload, None, trace_id)
+            except Exception as e:
+                print(f"TTS synthesis failed: {e}")
+                return None
+        if job_bus is not None:
+            try:
+                return await job_bus.call("tts", payload, trace_id)
+            except JobFailed as e:
+                print(f"TTS job failed: {e}")
+                return None
+        if not health_monitor.allow("openvoice"):
+            print("TTS service is down, replying without speech")
+            return None
+        try:
+            tts_response = await asyncio.to_thread(
+                requests.post,
+                f"{Config.OPENVOICE_SERVICE_URL}/synthesize",
+                json=payload,
+                headers={TRACE_HEADER: trace_id},
+                timeout=30
+            )
+        except requests.RequestException as e:
+            health_monitor.record_failure("openvoice", str(e))
+            print(f"TTS synthesis failed: {e}")
+            return None
+        if tts_response.status_code >= 500:
+            health_monitor.record_failure("openvoice", f"HTTP {tts_response.status_code}")
+        else:
+            health_monitor.record_success("openvoice")
+        return tts_response.json() if tts_response.status_code == 200 else None
+
+AUDIO_FORMATS = ("wav", "flac", "ogg", "opus")  # What the TTS service can encode
+
+def session_audio_format(session_id: str, requested: Optional[str] = None) -> str:
+    """The encoding the session's client can play: what it last asked for, else TTS_AUDIO_FORMAT"""
+    if requested:
+        requested = requested.lower().strip()
+        if requested not in AUDIO_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported audio format: {requested}")
+        redis_manager.set_audio_format(session_id, requested)
+        return requested
+    return redis_manager.get_audio_format(session_id) or Config.TTS_AUDIO_FORMAT
+
+async def stop_session_speech(session_id: str) -> Optional[dict]:
+    """Drop the session's queued and streaming speech on the TTS service"""
+    local = local_services.get("tts.stop")
     try:
-        # Add user message
-        redis_manager.add_message(request.session_id, "user", request.message)
-        
-        # Get conversation history
-        conversation_history = redis_manager.get_conversation(request.session_id)
-        
-        # Generate AI response
-        ai_response = await asyncio.to_thread(gemma_handler.generate_response, conversation_history, request.message)
-        clean_response = ai_response.replace("*", "").strip()
-        
-        # Add AI response
-        redis_manager.add_message(request.session_id, "ai", clean_response)
-        
-        # Analyze sentiment
-        recent_messages = redis_manager.get_recent_messages(request.session_id, 3)
-        emotion = sentiment_analyzer.analyze_conversation(recent_messages)
-        
-        # Log conversation
-        updated_history = redis_manager.get_conversation(request.session_id)
-        conversation_logger.log_conversation(request.session_id, updated_history)
+        if local:
+            return await local(session_id)
+        if not health_monitor.allow("openvoice"):
+            return None
+        response = await asyncio.to_thread(
+            requests.post, f"{Config.OPENVOICE_SERVICE_URL}/stop/{session_id}", timeout=5
+        )
+        return response.json() if response.status_code == 200 else None
+    except Exception as e:
+        print(f"Failed to stop speech for {session_id}: {e}")
+        return None
 
-        # Check if audio streaming is requested
-        stream_audio = fastapi_request.query_params.get("stream_audio", "false").lower() == "true"
-        if stream_audio:
-            # Stream audio directly from TTS service
-            tts_response = requests.post(
+async def resume_speech(session_id: str, played_seconds: Optional[float], trace_id: str) -> Optional[dict]:
+    """Have the TTS service replay the rest of the session's interrupted answer; None if it can't"""
+    payload = {"played_seconds": played_seconds, "format": session_audio_format(session_id)}
+    with tracer.span("tts.resume_request", trace_id, session_id=session_id):
+        try:
+            local = local_services.get("tts.resume")
+            if local:
+                return await local(session_id, payload, trace_id)
+            # The answer's sentences are in the memory of the instance that spoke them, so no job bus
+            if not health_monitor.allow("openvoice"):
+                return None
+            response = await asyncio.to_thread(
+                requests.post, f"{Config.OPENVOICE_SERVICE_URL}/resume/{session_id}",
+                json=payload, headers={TRACE_HEADER: trace_id}, timeout=30
+            )
+        except Exception as e:
+            print(f"Failed to resume speech for {session_id}: {e}")
+            return None
+    if response.status_code != 200:
+        print(f"Nothing to resume for {session_id}: {response.text}")
+        return None
+    return response.json()
+
+async def continue_interrupted(session_id: str, trace_id: str) -> dict:
+    """Replay the unheard rest of the interrupted answer from the TTS service, with no LLM or TTS work"""
+    context = redis_manager.get_interruption_context(session_id)
+    if context is None:
+        raise HTTPException(status_code=404, detail="No interrupted answer to continue")
+    position = redis_manager.get_playback_position(session_id)
+    played_seconds = None
+    # The client reports its position as it stops playback, which can land just before the barge-in
+    if position is not None and position["timestamp"] >= context["timestamp"] - 5:
+        played_seconds = position["played_seconds"]
+
+    tts = await resume_speech(session_id, played_seconds, trace_id) if context.get("resumable") else None
+    redis_manager.clear_interruption_context(session_id)
+    if tts is None:
+        # The TTS service no longer has the answer: the client speaks the text again
+        return {
+            "session_id": session_id,
+            "resumed": False,
+            "text": context.get("remaining_text") or context.get("interrupted_text", ""),
+            "trace_id": trace_id
+        }
+    audio_url = tts.get("audio_url")
+    if audio_url and audio_url.startswith("/"):
+        audio_url = f"{Config.OPENVOICE_SERVICE_URL}{audio_url}"
+    return {
+        "session_id": session_id,
+        "resumed": True,
+        "text": tts["text"],
+        "audio_url": audio_url,
+        "audio_duration": tts.get("audio_duration", 0.0),
+        "from_sentence": tts["from_sentence"],
+        "played_seconds": tts["played_seconds"],
+        "sources": tts["sources"],
+        "trace_id": trace_id
+    }
+
+async def stream_speech(payload: dict, accept_header: str, trace_id: str) -> StreamingResponse:
+    """Stream encoded speech from the TTS service to the client"""
+    local = local_services.get("tts.stream")
+    if local:
+        # All-in-one: the TTS response is built straight from the in-memory waveform, no relay
+        with tracer.span("tts.request", trace_id, session_id=payload["session_id"], stream=True):
+            response = await local(payload, accept_header or None, trace_id)
+        response.headers[TRACE_HEADER] = trace_id
+        return response
+
+    health_monitor.check("openvoice")
+    tts_headers = {TRACE_HEADER: trace_id}
+    if accept_header:
+        tts_headers["Accept"] = accept_header
+    with tracer.span("tts.request", trace_id, session_id=payload["session_id"], stream=True):
+        try:
+            tts_response = await asyncio.to_thread(
+                requests.post,
                 f"{Config.OPENVOICE_SERVICE_URL}/synthesize_stream",
-                json={
-                    "session_id": request.session_id,
-                    "text": clean_response,
-                    "emotion": emotion,
-                    "stream": True
-                },
+                json=payload,
+                headers=tts_headers,
                 timeout=60,
                 stream=True
             )
-            if tts_response.status_code == 200:
-                def iter_audio():
-                    for chunk in tts_response.iter_content(chunk_size=4096):
-                        if chunk:
-                            yield chunk
-                return StreamingResponse(iter_audio(), media_type="audio/wav")
-            else:
-                raise HTTPException(status_code=500, detail="Failed to stream TTS audio")
-        else:
-            # Default: return JSON metadata
-            tts_response = requests.post(
-                f"{Config.OPENVOICE_SERVICE_URL}/synthesize",
-                json={
-                    "session_id": request.session_id,
-                    "text": clean_response,
-                    "emotion": emotion,
-                    "stream": True
-                },
-                timeout=30
-            )
-            
-            tts_success = False
-            tts_error = None
-            audio_url = None
-            audio_duration = 0.0
-            
-            if tts_response.status_code == 200:
-                tts_data = tts_response.json()
-                tts_success = tts_data.get("success", False)
-                audio_url = tts_data.get("audio_url")
-                if audio_url:
-                    audio_url = f"{Config.OPENVOICE_SERVICE_URL}{audio_url}"
-                audio_duration = tts_data.get("audio_duration", 0.0)
-            else:
-                tts_error = "Failed to synthesize speech"
-
-            return ChatResponse(
-                session_id=request.session_id,
-                user_message=request.message,
-                ai_response=clean_response,
-                emotion=emotion,
-                processing_time=0.0,
-                audio_url=audio_url,
-                audio_duration=audio_duration,
-                tts_success=tts_success,
-                tts_error=tts_error or ""
-            )
-        
+        except requests.RequestException as e:
+            health_monitor.record_failure("openvoice", str(e))
+            raise
+    if tts_response.status_code >= 500:
+        health_monitor.record_failure("openvoice", f"HTTP {tts_response.status_code}")
+    else:
+        health_monitor.record_success("openvoice")
+    if tts_response.status_code != 200:
+        raise HTTPException(status_code=500, detail="Failed to stream TTS audio")
+
+    def iter_audio():
+        for chunk in tts_response.iter_content(chunk_size=4096):
+            if chunk:
+                yield chunk
+    return StreamingResponse(
+        tracer.traced_iter("tts.relay", trace_id, iter_audio()),
+        media_type=tts_response.headers.get("content-type", "audio/wav"),
+        headers={TRACE_HEADER: trace_id}
+    )
+
+async def chat_turn(request: ChatRequest, trace_id: str, stream_audio: bool = False,
+                    audio_format: Optional[str] = None, accept_header: str = ""):
+    """One text turn: LLM reply, sentiment, logging, then speech as a stream or a stored file"""
+    with active_turns.track(request.session_id, trace_id) as turn:
+        return await run_chat_turn(request, trace_id, turn, stream_audio, audio_format, accept_header)
+
+async def run_chat_turn(request: ChatRequest, trace_id: str, turn: ActiveTurn, stream_audio: bool,
+                        audio_format: Optional[str], accept_header: str):
+    # Checked before any work; also remembered for the session's later replies and resumes
+    requested_format = audio_format or request.audio_format
+    playable_format = session_audio_format(request.session_id, requested_format)
+    
+    # Add user message
+    redis_manager.add_message(request.session_id, "user", request.message)
+    
+    # Get conversation history
+    conversation_history = redis_manager.get_conversation(request.session_id)
+    
+    # Generate AI response
+    ai_response = await generate_reply(conversation_history, request.message, trace_id, request.session_id)
+    clean_response = ai_response.replace("*", "").strip()
+    turn.reply = clean_response
+    
+    # Add AI response
+    redis_manager.add_message(request.session_id, "ai", clean_response)
+    
+    # Analyze sentiment
+    recent_messages = redis_manager.get_recent_messages(request.session_id, 3)
+    emotion = sentiment_analyzer.analyze_conversation(recent_messages)
+    
+    # Log conversation
+    updated_history = redis_manager.get_conversation(request.session_id)
+    conversation_logger.log_conversation(request.session_id, updated_history)
+    if summarizer is not None:
+        summarizer.schedule(request.session_id)
+
+    tts_payload = {
+        "session_id": request.session_id,
+        "text": clean_response,
+        "emotion": emotion,
+        "stream": True,
+        "format": playable_format,
+        "voice": Config.TEACHER_VOICE or None
+    }
+    if stream_audio:
+        # Stream audio directly from TTS service, letting the client pick the encoding
+        # with ?audio_format= or its Accept header so the relayed bytes stay compressed
+        if not requested_format and accept_header.lower().startswith("audio/"):
+            tts_payload.pop("format")
+        return await stream_speech(tts_payload, accept_header, trace_id)
+
+    # Default: return JSON metadata
+    tts_data = await request_speech(tts_payload, trace_id)
+    turn.check()
+    
+    tts_success = False
+    tts_error = None
+    audio_url = None
+    audio_duration = 0.0
+    
+    if tts_data is not None:
+        tts_success = tts_data.get("success", False)
+        audio_url = tts_data.get("audio_url")
+        if audio_url and audio_url.startswith("/"):
+            # Queued jobs come back with the rendering worker's absolute URL
+            audio_url = f"{Config.OPENVOICE_SERVICE_URL}{audio_url}"
+        audio_duration = tts_data.get("audio_duration", 0.0)
+    else:
+        tts_error = "Failed to synthesize speech"
+
+    continuation = await interruption_manager.check_continuation_needed(request.session_id, clean_response)
+
+    return ChatResponse(
+        session_id=request.session_id,
+        user_message=request.message,
+        ai_response=clean_response,
+        emotion=emotion,
+        processing_time=0.0,
+        audio_url=audio_url,
+        audio_duration=audio_duration,
+        tts_success=tts_success,
+        tts_error=tts_error or "",
+        trace_id=trace_id,
+        continuation=continuation if continuation.get("continue") else None
+    )
+
+@app.post("/chat/partial")
+async def partial_transcript(partial: PartialTranscript):
+    """Partial transcript from the ASR service while the student is still speaking"""
+    if speculator is None:
+        return {"accepted": False}
+    speculator.on_partial(partial.session_id, partial.text)
+    return {"accepted": True}
+
+@app.post("/sessions/{session_id}/barge_in")
+async def barge_in(session_id: str):
+    """The student started talking over the teacher: stop the reply being generated and spoken"""
+    active_turns.stats["barge_ins"] += 1
+    turn = active_turns.cancel(session_id)
+    # The turn may be running on another worker
+    await session_hub.broadcast_control({"type": "barge_in", "session_id": session_id})
+    # Lets the next reply offer to pick up where the teacher was cut off, even if the turn already finished
+    tts = await interruption_manager.interrupt(
+        session_id, "barge_in", stop_session_speech, turn.reply if turn is not None and turn.reply else ""
+    )
+    await session_hub.send(session_id, {"type": "barge_in", "session_id": session_id})
+    return {
+        "cancelled_turn": turn.trace_id if turn else None,
+        "tts": tts,
+        "stats": active_turns.stats
+    }
+
+@app.post("/sessions/{session_id}/playback")
+async def report_playback(session_id: str, position: PlaybackPosition):
+    """The client stopped the teacher's audio this many seconds in; a continue resumes from there"""
+    redis_manager.set_playback_position(session_id, max(0.0, position.played_seconds), time.time())
+    return {"success": True}
+
+@app.post("/sessions/{session_id}/continue")
+async def continue_session(session_id: str, fastapi_request: FastAPIRequest):
+    """Resume the interrupted answer from where playback stopped, replaying the remembered audio"""
+    trace_id = fastapi_request.headers.get(TRACE_HEADER) or new_trace_id()
+    session_audio_format(session_id, fastapi_request.query_params.get("audio_format"))
+    return await continue_interrupted(session_id, trace_id)
+
+@app.get("/speculation")
+async def speculation_stats():
+    """Hit rate, head start and wasted tokens of speculative generation"""
+    if speculator is None:
+        return {"enabled": False}
+    return {"enabled": True, **speculator.snapshot()}
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(request: ChatRequest, fastapi_request: FastAPIRequest):
+    """REST API endpoint for chat (alternative to WebSocket)"""
+    # The ASR service starts the trace when the utterance ends; text clients get a fresh one
+    trace_id = fastapi_request.headers.get(TRACE_HEADER) or request.trace_id or new_trace_id()
+    try:
+        # Check if audio streaming is requested
+        stream_audio = fastapi_request.query_params.get("stream_audio", "false").lower() == "true"
+        return await chat_turn(
+            request, trace_id, stream_audio,
+            audio_format=fastapi_request.query_params.get("audio_format"),
+            accept_header=fastapi_request.headers.get("accept", "")
+        )
+    except HTTPException:
+        raise
+    except ServerBusy as e:
+        # Shed load instead of letting every turn slow down and time out together
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(int(e.retry_after + 0.5))})
+    except TurnCancelled as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except DependencyUnavailable as e:
+        # Fail fast while the circuit is open instead of waiting on a dead service
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(int(e.retry_after + 0.5))})
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -344,38 +871,166 @@ async def chat_endpoint(request: ChatRequest, fastapi_request: FastAPIRequest):
 
 @app.get("/health")
 async def health_check():
-    """Health check for all services"""
-    health_status = {"orchestrator": "healthy"}
-    
-    # Check FunASR service
-    try:
-        funasr_response = requests.get(f"{Config.FUNASR_SERVICE_URL}/health", timeout=5)
-        health_status["funasr"] = "healthy" if funasr_response.status_code == 200 else "unhealthy"
-    except:
-        health_status["funasr"] = "unreachable"
-    
-    # Check OpenVoice service
-    try:
-        openvoice_response = requests.get(f"{Config.OPENVOICE_SERVICE_URL}/health", timeout=5)
-        health_status["openvoice"] = "healthy" if openvoice_response.status_code == 200 else "unhealthy"
-    except:
-        health_status["openvoice"] = "unreachable"
-    
+    """Health of this worker and its dependencies, from the background monitor's cache"""
+    health_status = {"orchestrator": "healthy", "worker": session_hub.worker_id}
+    if local_services.enabled():
+        health_status["funasr"] = "healthy"
+        health_status["openvoice"] = "healthy"
+    else:
+        health_status["funasr"] = health_monitor.status("funasr")
+        health_status["openvoice"] = health_monitor.status("openvoice")
+    health_status["dependencies"] = health_monitor.snapshot()
+    health_status["ready"] = readiness.ready
     return health_status
 
+@app.get("/ready")
+async def ready_check():
+    """200 once the lexicon is loaded and the model is loaded and warm, 503 with progress before"""
+    snapshot = readiness.snapshot()
+    if not snapshot["ready"]:
+        return JSONResponse(status_code=503, content=snapshot)
+    return snapshot
+
+@app.post("/traces")
+async def collect_spans(spans: List[dict]):
+    """Trace collector for services exporting spans over HTTP"""
+    spans = [span for span in spans if span.get("trace_id")]
+    if spans:
+        # Stored in Redis so every orchestrator worker sees the whole trace
+        redis_manager.add_trace_spans(spans)
+    return {"accepted": len(spans)}
+
+def get_trace_spans(trace_id: str) -> List[dict]:
+    spans = redis_manager.get_trace_spans(trace_id)
+    seen = {span.get("span_id") for span in spans}
+    spans.extend(span for span in load_spans(trace_id) if span.get("span_id") not in seen)
+    return sorted(spans, key=lambda span: span["start"])
+
+@app.get("/traces")
+async def list_traces(limit: int = 20):
+    """Most recent collected traces with their end-to-end duration"""
+    summaries = []
+    for trace_id in redis_manager.get_recent_trace_ids(limit):
+        spans = redis_manager.get_trace_spans(trace_id)
+        if not spans:
+            continue
+        start = min(span["start"] for span in spans)
+        end = max(span["start"] + span["duration_ms"] / 1000 for span in spans)
+        summaries.append({
+            "trace_id": trace_id,
+            "spans": len(spans),
+            "services": sorted({span["service"] for span in spans}),
+            "duration_ms": (end - start) * 1000,
+        })
+    return {"traces": summaries}
+
+@app.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    spans = get_trace_spans(trace_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return {"trace_id": trace_id, "spans": spans}
+
+@app.get("/traces/{trace_id}/waterfall", response_class=PlainTextResponse)
+async def get_trace_waterfall(trace_id: str, width: int = 60):
+    """Per-turn waterfall showing which hop took the time"""
+    return render_waterfall(get_trace_spans(trace_id), width=width)
+
+@app.get("/jobs")
+async def job_stats():
+    """Queue depth, in-flight jobs, consumers and dead letters per job kind"""
+    if job_bus is None:
+        return {"transport": Config.JOB_TRANSPORT}
+    return {
+        "transport": Config.JOB_TRANSPORT,
+        "kinds": {kind: await job_bus.stats(kind) for kind in ("asr", "llm", "tts")},
+        "local_workers": {worker.kind: worker.stats for worker in job_workers},
+    }
+
+@app.get("/llm/admission")
+async def llm_admission_stats():
+    """Active and waiting LLM turns on this worker, with shed and wait counters"""
+    return llm_admission.snapshot()
+
+@app.get("/llm/backends")
+async def llm_backend_stats():
+    """Ollama backends of this worker's pool: load, failures and ejections"""
+    return gemma_handler.pool.snapshot()
+
 @app.get("/sessions/{session_id}/history")
 async def get_conversation_history(session_id: str):
     """Get conversation history for a session"""
     history = redis_manager.get_conversation(session_id)
     return {"session_id": session_id, "history": history}
 
+@app.get("/sessions/{session_id}/summary")
+async def get_conversation_summary(session_id: str):
+    """Rolling summary of the turns older than the prompt window"""
+    summary = redis_manager.get_conversation_summary(session_id) or {"text": "", "covered": 0}
+    return {
+        "session_id": session_id,
+        "summary": summary["text"],
+        "covered_messages": summary["covered"],
+        "summarizer": summarizer.stats if summarizer is not None else None
+    }
+
+@app.get("/transcripts/search")
+async def search_transcripts(q: str, since: Optional[str] = None, until: Optional[str] = None,
+                             role: Optional[str] = None, session_id: Optional[str] = None, limit: int = 20):
+    """Full-text search over logged turns; since/until take 7d, 12h, ISO dates or epoch seconds"""
+    store = conversation_logger.store
+    if store is None:
+        raise HTTPException(status_code=404, detail="Transcript store is disabled")
+    try:
+        window = parse_time(since), parse_time(until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    hits = await asyncio.to_thread(store.search, q, *window, role, session_id, limit)
+    return {"query": q, "hits": hits}
+
+@app.get("/transcripts/sessions")
+async def search_transcript_sessions(q: str, since: Optional[str] = None, until: Optional[str] = None,
+                                     role: Optional[str] = None, limit: int = 50):
+    """Sessions that discussed q in the time range, with hit counts"""
+    store = conversation_logger.store
+    if store is None:
+        raise HTTPException(status_code=404, detail="Transcript store is disabled")
+    try:
+        window = parse_time(since), parse_time(until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    sessions = await asyncio.to_thread(store.sessions_matching, q, *window, role, limit)
+    return {"query": q, "sessions": sessions}
+
+@app.post("/sessions/{session_id}/events")
+async def push_session_event(session_id: str, event: dict):
+    """Push an event to the session's WebSocket on whichever worker holds it"""
+    event.setdefault("session_id", session_id)
+    delivered = await session_hub.send(session_id, event)
+    return {"session_id": session_id, "delivered": delivered, "worker": await session_hub.owner(session_id)}
+
 @app.delete("/sessions/{session_id}")
 async def clear_session(session_id: str):
     """Clear a conversation session"""
     redis_manager.clear_conversation(session_id)
     interruption_manager.clear_session(session_id)
+    if speculator is not None:
+        speculator.clear_session(session_id)
+    if summarizer is not None:
+        summarizer.clear_session(session_id)
+    await session_hub.send(session_id, {"type": "session_cleared", "session_id": session_id})
     return {"session_id": session_id, "message": "Session cleared"}
 
 if __name__ == "__main__":
+    import argparse
     import uvicorn
-uvicorn.run(app, host="0.0.0.0", port=8001)
+    parser = argparse.ArgumentParser(description="AI Teacher orchestrator")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--workers", type=int, default=Config.ORCHESTRATOR_WORKERS)
+    args = parser.parse_args()
+    if args.workers > 1:
+        # Session state is in Redis, so any worker can serve any request; uvicorn needs an import string
+        uvicorn.run("main_orchestrator:app", host=args.host, port=args.port, workers=args.workers)
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,198 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, TypeVar
+
+import requests
+
+T = TypeVar("T")
+
+class NoBackendAvailable(RuntimeError):
+    """Every Ollama backend has been tried for this request"""
+
+def is_backend_failure(error: BaseException) -> bool:
+    """Errors another backend might not have: connection problems, timeouts and 5xx responses"""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500
+    return False
+
+class OllamaBackend:
+    def __init__(self, url: str, model: str):
+        self.url = url.rstrip("/")
+        self.model = model
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.last_error = ""
+
+    @property
+    def name(self) -> str:
+        return f"{self.model}@{self.url}"
+
+class OllamaPool:
+    """Routes generation requests over several Ollama backends.
+
+    A request goes to the backend with the fewest requests in flight from this
+    process. A session sticks to the backend that served it last, so Ollama can
+    reuse the conversation's KV cache, unless that backend has more than
+    affinity_slack requests above the least loaded one. A backend is ejected for
+    eject_seconds after eject_failures failures in a row or a failed health
+    check. Failed requests move on to the next backend. Once the ejection
+    expires the backend gets traffic again, and a single further failure ejects
+    it again.
+    """
+
+    def __init__(self, backends: Sequence[OllamaBackend], eject_failures: int = 2, eject_seconds: float = 30.0,
+                 affinity_slack: int = 2, max_sessions: int = 10000):
+        if not backends:
+            raise ValueError("OllamaPool needs at least one backend")
+        self.backends = list(backends)
+        self.eject_failures = max(1, eject_failures)
+        self.eject_seconds = eject_seconds
+        self.affinity_slack = affinity_slack
+        self.max_sessions = max_sessions
+        self._affinity: "OrderedDict[str, OllamaBackend]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._health_thread: Optional[threading.Thread] = None
+        self.stats = {"requests": 0, "affinity_hits": 0, "affinity_moves": 0, "failovers": 0, "ejections": 0}
+
+    @classmethod
+    def from_spec(cls, spec: str, default_model: str, **kwargs) -> "OllamaPool":
+        """Comma-separated backends, each "url" or "model@url", e.g. "http://a:11434,gemma3n:e4b@http://b:11434" """
+        backends = []
+        for entry in spec.split(","):
+            entry = entry.strip()
+            if not entry:
+                continue
+            model, _, url = entry.rpartition("@")
+            backends.append(OllamaBackend(url, model or default_model))
+        return cls(backends, **kwargs)
+
+    def acquire(self, session_id: Optional[str] = None, exclude: Sequence[OllamaBackend] = ()) -> OllamaBackend:
+        """Pick a backend and count the request against it; pair with release()"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [backend for backend in self.backends if backend not in exclude]
+            if not candidates:
+                raise NoBackendAvailable(f"All {len(self.backends)} Ollama backends failed")
+            live = [backend for backend in candidates if backend.ejected_until <= now]
+            if not live:
+                # Everything is ejected: try the one due back first rather than failing outright
+                live = [min(candidates, key=lambda backend: backend.ejected_until)]
+
+            least = min(backend.outstanding for backend in live)
+            previous = self._affinity.get(session_id) if session_id else None
+            if previous in live and previous.outstanding <= least + self.affinity_slack:
+                backend = previous
+                self.stats["affinity_hits"] += 1
+            else:
+                # Fewest in flight, then fewest served so idle backends share the load evenly
+                backend = min(live, key=lambda b: (b.outstanding, b.requests))
+                if previous is not None:
+                    self.stats["affinity_moves"] += 1
+
+            if session_id:
+                self._affinity[session_id] = backend
+                self._affinity.move_to_end(session_id)
+                while len(self._affinity) > self.max_sessions:
+                    self._affinity.popitem(last=False)
+            backend.outstanding += 1
+            backend.requests += 1
+            self.stats["requests"] += 1
+            return backend
+
+    def release(self, backend: OllamaBackend, error: Optional[BaseException] = None):
+        with self._lock:
+            backend.outstanding -= 1
+            if error is None:
+                backend.consecutive_failures = 0
+                backend.ejected_until = 0.0
+            elif is_backend_failure(error):
+                self._failed(backend, str(error) or type(error).__name__)
+
+    def _failed(self, backend: OllamaBackend, error: str):
+        backend.failures += 1
+        backend.consecutive_failures += 1
+        backend.last_error = error
+        if backend.consecutive_failures >= self.eject_failures:
+            if backend.ejected_until <= time.monotonic():
+                self.stats["ejections"] += 1
+                print(f"Ejecting Ollama backend {backend.name} for {self.eject_seconds:.0f}s: {error}")
+            backend.ejected_until = time.monotonic() + self.eject_seconds
+
+    def call(self, session_id: Optional[str], send: Callable[[OllamaBackend], T]) -> T:
+        """Run send(backend), failing over to the next backend on backend failures"""
+        tried: List[OllamaBackend] = []
+        while True:
+            backend = self.acquire(session_id, tried)
+            error = None
+            try:
+                return send(backend)
+            except Exception as e:
+                error = e
+                if not is_backend_failure(e):
+                    raise
+                tried.append(backend)
+                self.stats["failovers"] += 1
+                print(f"Ollama backend {backend.name} failed, trying another: {e}")
+            finally:
+                self.release(backend, error)
+
+    # --- Health checks ---
+
+    def probe(self, backend: OllamaBackend, timeout: float) -> bool:
+        try:
+            response = requests.get(f"{backend.url}/api/tags", timeout=timeout)
+            response.raise_for_status()
+        except Exception as e:
+            with self._lock:
+                backend.last_error = str(e) or type(e).__name__
+                backend.consecutive_failures = max(backend.consecutive_failures, self.eject_failures - 1)
+                self._failed(backend, backend.last_error)
+            return False
+        with self._lock:
+            if backend.ejected_until > time.monotonic():
+                print(f"Ollama backend {backend.name} is healthy again")
+            backend.consecutive_failures = 0
+            backend.ejected_until = 0.0
+        return True
+
+    def check_health(self, timeout: float = 2.0) -> int:
+        """Probe every backend concurrently; returns how many are healthy"""
+        with ThreadPoolExecutor(max_workers=len(self.backends)) as executor:
+            return sum(executor.map(lambda backend: self.probe(backend, timeout), self.backends))
+
+    def start_health_checks(self, interval: float = 5.0, timeout: float = 2.0):
+        """Background probes for processes without the orchestrator's HealthMonitor"""
+        if self._health_thread is not None:
+            return
+
+        def run():
+            while True:
+                self.check_health(timeout)
+                time.sleep(interval)
+
+        self._health_thread = threading.Thread(target=run, daemon=True, name="ollama-health")
+        self._health_thread.start()
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "backends": [{
+                    "url": backend.url,
+                    "model": backend.model,
+                    "outstanding": backend.outstanding,
+                    "requests": backend.requests,
+                    "failures": backend.failures,
+                    "ejected_for": round(max(0.0, backend.ejected_until - now), 1),
+                    "last_error": backend.last_error,
+                } for backend in self.backends],
+                "sessions": len(self._affinity),
+                **self.stats,
+            }
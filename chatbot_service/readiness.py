@@ -0,0 +1,98 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+Step = Callable[[], Awaitable[object]]
+
+class _Step:
+    def __init__(self, name: str, run: Step, required: bool):
+        self.name = name
+        self.run = run
+        self.required = required
+        self.status = "pending"
+        self.attempts = 0
+        self.duration: Optional[float] = None
+        self.result: object = None
+        self.error = ""
+
+class Readiness:
+    """Startup steps that have to finish before the worker takes real traffic.
+
+    start() runs the registered steps concurrently in the background, so the
+    server is up (and /health answers) while models load. A failed step is
+    retried with backoff until it succeeds. /ready reports ready once every
+    required step has succeeded. Optional steps are reported but never hold
+    readiness back.
+    """
+
+    def __init__(self, retry_initial: float = 2.0, retry_max: float = 30.0):
+        self.retry_initial = retry_initial
+        self.retry_max = retry_max
+        self._steps: Dict[str, _Step] = {}
+        self._tasks = []
+        self.started_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+
+    def register(self, name: str, run: Step, required: bool = True):
+        self._steps[name] = _Step(name, run, required)
+
+    def start(self):
+        self.started_at = time.time()
+        self._tasks = [asyncio.create_task(self._run(step)) for step in self._steps.values()]
+        self._check_ready()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def _run(self, step: _Step):
+        delay = self.retry_initial
+        while True:
+            step.attempts += 1
+            step.status = "running"
+            started = time.perf_counter()
+            try:
+                step.result = await step.run()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                step.status = "failed"
+                step.error = str(e) or type(e).__name__
+                print(f"Startup step {step.name} failed (attempt {step.attempts}), retrying in {delay:.1f}s: {step.error}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.retry_max)
+                continue
+            step.duration = time.perf_counter() - started
+            step.status = "ok"
+            step.error = ""
+            print(f"Startup step {step.name} finished in {step.duration:.2f}s")
+            self._check_ready()
+            return
+
+    def _check_ready(self):
+        if self.ready_at is None and self.ready:
+            self.ready_at = time.time()
+            if self.started_at is not None:
+                print(f"Ready to serve after {self.ready_at - self.started_at:.2f}s")
+
+    @property
+    def ready(self) -> bool:
+        return all(step.status == "ok" for step in self._steps.values() if step.required)
+
+    def snapshot(self) -> dict:
+        return {
+            "ready": self.ready,
+            "startup_seconds": round(self.ready_at - self.started_at, 2)
+            if self.ready_at is not None and self.started_at is not None else None,
+            "steps": {
+                name: {
+                    "status": step.status,
+                    "required": step.required,
+                    "attempts": step.attempts,
+                    "duration_s": round(step.duration, 2) if step.duration is not None else None,
+                    "result": step.result,
+                    "error": step.error,
+                } for name, step in self._steps.items()
+            },
+        }
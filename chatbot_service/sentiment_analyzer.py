@@ -2,25 +2,69 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from typing import List
-import nltk
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
+import threading
+from typing import List, Optional
 from shared.config import Config
 
-# Download VADER lexicon if not already present
-try:
-    nltk.data.find('vader_lexicon')
-except LookupError:
-    nltk.download('vader_lexicon')
+VADER_RESOURCE = "sentiment/vader_lexicon.zip"
+
+def ensure_vader_lexicon(data_dir: str = Config.NLTK_DATA_DIR, download: bool = Config.NLTK_AUTO_DOWNLOAD) -> str:
+    """Find the VADER lexicon, looking in data_dir first; downloads it there only if allowed and missing"""
+    import nltk
+    if data_dir not in nltk.data.path:
+        nltk.data.path.insert(0, data_dir)
+    try:
+        return nltk.data.find(VADER_RESOURCE).path
+    except LookupError:
+        if not download:
+            raise
+    print(f"Downloading the VADER lexicon to {data_dir}")
+    os.makedirs(data_dir, exist_ok=True)
+    if not nltk.download("vader_lexicon", download_dir=data_dir, quiet=True):
+        raise LookupError(f"Could not download the VADER lexicon to {data_dir}")
+    return nltk.data.find(VADER_RESOURCE).path
 
 class SentimentAnalyzer:
+    """VADER sentiment of recent messages mapped to a TTS emotion.
+
+    NLTK and the lexicon are loaded on first use, or ahead of time by load() at
+    startup, so importing this module stays cheap and never hits the network.
+    """
+
     def __init__(self):
-        self.analyzer = SentimentIntensityAnalyzer()
+        self._analyzer = None
+        self._lock = threading.Lock()
+        self.load_error: Optional[str] = None
+
+    def load(self):
+        """Import NLTK and read the lexicon; raises if the lexicon is unavailable"""
+        with self._lock:
+            if self._analyzer is None:
+                ensure_vader_lexicon()
+                from nltk.sentiment.vader import SentimentIntensityAnalyzer
+                self._analyzer = SentimentIntensityAnalyzer()
+        return self._analyzer
+
+    @property
+    def analyzer(self):
+        return self._analyzer if self._analyzer is not None else self.load()
+
+    @property
+    def loaded(self) -> bool:
+        return self._analyzer is not None
     
     def analyze_conversation(self, messages: List[str]) -> str:
         """Analyze sentiment from recent conversation messages"""
         if not messages:
             return "default"
+        try:
+            analyzer = self.analyzer
+        except LookupError as e:
+            # No lexicon (offline, auto-download disabled): speak in the default voice
+            if self.load_error is None:
+                print(f"Sentiment analysis unavailable: {e}")
+            self.load_error = str(e)
+            return "default"
         
         # Get recent messages for analysis
         recent_messages = messages[-Config.SENTIMENT_WINDOW_SIZE:]
@@ -30,7 +74,7 @@ class SentimentAnalyzer:
         for message in recent_messages:
             if "::" in message:
                 _, content = message.split("::", 1)
-                score = self.analyzer.polarity_scores(content)
+                score = analyzer.polarity_scores(content)
                 scores.append(score['compound'])
         
         if not scores:
@@ -63,3 +107,7 @@ class SentimentAnalyzer:
             "negative": scores['neg'],
             "compound": scores['compound']
         }
+
+if __name__ == "__main__":
+    # Fetch the lexicon ahead of deployment: python sentiment_analyzer.py
+    print(f"VADER lexicon at {ensure_vader_lexicon(download=True)}")
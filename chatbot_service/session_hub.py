@@ -0,0 +1,111 @@
+import asyncio
+import json
+import os
+import socket
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import redis.asyncio as aioredis
+from fastapi import WebSocket
+
+from shared.config import Config
+
+# Broadcast to every worker, for actions on state a worker keeps in process (like running turns)
+CONTROL_CHANNEL = "session_control"
+
+class SessionHub:
+    """Delivers server-push events to a session's WebSocket, whichever orchestrator worker holds it.
+
+    Sockets are process-local, so each worker subscribes to the Redis channel of
+    every session connected to it. send() writes directly when the socket is
+    here and publishes on the session's channel otherwise, so any worker
+    (or another service) can push to any session.
+    """
+
+    def __init__(self, redis_url: Optional[str] = None,
+                 on_control: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None):
+        self.on_control = on_control
+        self.redis = aioredis.Redis.from_url(redis_url or Config.REDIS_URL, decode_responses=True)
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self.local: Dict[str, WebSocket] = {}
+        self.pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def channel(session_id: str) -> str:
+        return f"session_events:{session_id}"
+
+    @staticmethod
+    def owner_key(session_id: str) -> str:
+        return f"session_worker:{session_id}"
+
+    async def start(self):
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        # A channel of our own keeps the subscription alive while no session is connected
+        await self.pubsub.subscribe(f"worker_events:{self.worker_id}", CONTROL_CHANNEL)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+        if self.pubsub:
+            await self.pubsub.close()
+
+    async def connect(self, session_id: str, websocket: WebSocket):
+        self.local[session_id] = websocket
+        await self.redis.set(self.owner_key(session_id), self.worker_id, ex=Config.SESSION_STATE_TTL)
+        await self.pubsub.subscribe(self.channel(session_id))
+
+    async def disconnect(self, session_id: str, websocket: WebSocket):
+        if self.local.get(session_id) is not websocket:
+            return  # The session already reconnected on this worker
+        del self.local[session_id]
+        await self.pubsub.unsubscribe(self.channel(session_id))
+        if await self.redis.get(self.owner_key(session_id)) == self.worker_id:
+            await self.redis.delete(self.owner_key(session_id))
+
+    async def owner(self, session_id: str) -> Optional[str]:
+        """Worker currently holding the session's socket, if any"""
+        return await self.redis.get(self.owner_key(session_id))
+
+    async def send(self, session_id: str, payload: Dict[str, Any]) -> bool:
+        """Push an event to the session; False if no worker holds a socket for it"""
+        if session_id in self.local:
+            return await self._deliver(session_id, payload)
+        receivers = await self.redis.publish(self.channel(session_id), json.dumps(payload))
+        return receivers > 0
+
+    async def broadcast_control(self, payload: Dict[str, Any]):
+        """Run on_control on every worker, this one included"""
+        await self.redis.publish(CONTROL_CHANNEL, json.dumps(payload))
+
+    async def _deliver(self, session_id: str, payload: Dict[str, Any]) -> bool:
+        websocket = self.local.get(session_id)
+        if websocket is None:
+            return False
+        try:
+            await websocket.send_text(json.dumps(payload))
+            return True
+        except Exception as e:
+            print(f"Failed to push event to {session_id}: {e}")
+            return False
+
+    async def _listen(self):
+        prefix = self.channel("")
+        while True:
+            try:
+                async for message in self.pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    if message["channel"] == CONTROL_CHANNEL:
+                        if self.on_control is not None:
+                            await self.on_control(json.loads(message["data"]))
+                        continue
+                    if not message["channel"].startswith(prefix):
+                        continue
+                    session_id = message["channel"][len(prefix):]
+                    await self._deliver(session_id, json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Session event listener error: {e}")
+                await asyncio.sleep(1)
@@ -0,0 +1,152 @@
+import asyncio
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from gemma_handler import GemmaHandler
+
+def normalize_transcript(text: str) -> str:
+    """Compare transcripts the way the student would: ignore case, punctuation and spacing"""
+    text = re.sub(r"[^\w\s']", " ", text.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+class _Speculation:
+    def __init__(self, text: str):
+        self.text = text
+        self.key = normalize_transcript(text)
+        self.tokens: List[str] = []
+        self.cancelled = threading.Event()
+        self.started = time.perf_counter()
+        self.task: Optional[asyncio.Task] = None
+        self.release_slot: Optional[Callable[[], None]] = None
+
+class SpeculativeGenerator:
+    """Starts generating on a partial transcript once it has been stable for stable_ms.
+
+    The ASR service posts partials while the student is still speaking. When the
+    final transcript arrives, claim() hands back the speculative reply if it
+    matches the speculated text. Otherwise the stream is cancelled, its tokens
+    are counted as wasted, and the caller generates normally.
+    """
+
+    def __init__(self, gemma_handler: GemmaHandler, get_history: Callable[[str], List[str]],
+                 stable_ms: float = 300, try_acquire_slot: Optional[Callable[[], Optional[Callable[[], None]]]] = None,
+                 get_summary: Optional[Callable[[str], Optional[dict]]] = None):
+        self.gemma_handler = gemma_handler
+        self.get_history = get_history
+        self.get_summary = get_summary
+        self.stable = stable_ms / 1000.0
+        # Returns a release callback, or None when the backend has no spare capacity to gamble with
+        self.try_acquire_slot = try_acquire_slot
+        self._partials: Dict[str, str] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._speculations: Dict[str, _Speculation] = {}
+        self.stats = {
+            "partials": 0, "started": 0, "skipped_busy": 0, "hits": 0, "misses": 0,
+            "tokens_generated": 0, "tokens_wasted": 0, "head_start_ms": 0.0,
+        }
+
+    def snapshot(self) -> dict:
+        finished = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "active": len(self._speculations),
+            "hit_rate": self.stats["hits"] / finished if finished else 0.0,
+            "avg_head_start_ms": self.stats["head_start_ms"] / self.stats["hits"] if self.stats["hits"] else 0.0,
+        }
+
+    def on_partial(self, session_id: str, text: str):
+        """Record a partial transcript; speculation starts if it is still the same after stable_ms"""
+        self.stats["partials"] += 1
+        key = normalize_transcript(text)
+        if not key or self._partials.get(session_id) == key:
+            return
+        self._partials[session_id] = key
+
+        speculation = self._speculations.get(session_id)
+        if speculation and speculation.key != key:
+            # The student kept talking; what we guessed is no longer the question
+            self._cancel(session_id)
+        timer = self._timers.pop(session_id, None)
+        if timer:
+            timer.cancel()
+        self._timers[session_id] = asyncio.get_running_loop().call_later(
+            self.stable, self._start_if_stable, session_id, text, key
+        )
+
+    def _start_if_stable(self, session_id: str, text: str, key: str):
+        self._timers.pop(session_id, None)
+        if self._partials.get(session_id) != key or session_id in self._speculations:
+            return
+        release = None
+        if self.try_acquire_slot is not None:
+            release = self.try_acquire_slot()
+            if release is None:
+                self.stats["skipped_busy"] += 1
+                return
+
+        speculation = _Speculation(text)
+        speculation.release_slot = release
+        history = self.get_history(session_id) + [f"user::{text}"]
+        summary = self.get_summary(session_id) if self.get_summary is not None else None
+        speculation.task = asyncio.ensure_future(asyncio.to_thread(self._generate, speculation, history, text, summary, session_id))
+        speculation.task.add_done_callback(lambda task: self._finished(speculation, task))
+        self._speculations[session_id] = speculation
+        self.stats["started"] += 1
+
+    def _generate(self, speculation: _Speculation, history: List[str], text: str, summary: Optional[dict],
+                  session_id: str) -> str:
+        for token in self.gemma_handler.stream_response(history, text, speculation.cancelled, summary, session_id):
+            speculation.tokens.append(token)
+        return self.gemma_handler.clean_response("".join(speculation.tokens))
+
+    @staticmethod
+    def _finished(speculation: _Speculation, task: asyncio.Future):
+        if speculation.release_slot is not None:
+            speculation.release_slot()
+            speculation.release_slot = None
+        if not task.cancelled():
+            task.exception()  # Mark retrieved: a cancelled speculation is never claimed
+
+    def _cancel(self, session_id: str):
+        speculation = self._speculations.pop(session_id, None)
+        if speculation is None:
+            return
+        speculation.cancelled.set()
+        self.stats["misses"] += 1
+        self.stats["tokens_generated"] += len(speculation.tokens)
+        self.stats["tokens_wasted"] += len(speculation.tokens)
+
+    async def claim(self, session_id: str, final_text: str) -> Optional[str]:
+        """Speculative reply for the final transcript, or None if there was no matching speculation"""
+        self._partials.pop(session_id, None)
+        timer = self._timers.pop(session_id, None)
+        if timer:
+            timer.cancel()
+        speculation = self._speculations.get(session_id)
+        if speculation is None:
+            return None
+        if speculation.key != normalize_transcript(final_text):
+            self._cancel(session_id)
+            return None
+
+        del self._speculations[session_id]
+        self.stats["head_start_ms"] += (time.perf_counter() - speculation.started) * 1000
+        try:
+            reply = await speculation.task
+        except Exception as e:
+            print(f"Speculative generation failed, generating again: {e}")
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        self.stats["tokens_generated"] += len(speculation.tokens)
+        return reply
+
+    def clear_session(self, session_id: str):
+        timer = self._timers.pop(session_id, None)
+        if timer:
+            timer.cancel()
+        self._partials.pop(session_id, None)
+        if session_id in self._speculations:
+            self._cancel(session_id)
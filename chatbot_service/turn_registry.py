@@ -0,0 +1,59 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+class TurnCancelled(Exception):
+    """The student barged in; the turn's reply is no longer wanted"""
+
+class ActiveTurn:
+    def __init__(self, session_id: str, trace_id: str):
+        self.session_id = session_id
+        self.trace_id = trace_id
+        # Checked by the generation thread between tokens
+        self.cancelled = threading.Event()
+        self.reply: Optional[str] = None
+        self.started = time.time()
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise TurnCancelled(f"Turn {self.trace_id} was cancelled by barge-in")
+
+class TurnRegistry:
+    """In-flight turns by session, so a barge-in can stop the LLM and TTS mid-answer.
+
+    Turns are process-local like the generation threads they control; a barge-in
+    on another worker reaches this one through SessionHub control messages.
+    """
+
+    def __init__(self):
+        self._turns: Dict[str, ActiveTurn] = {}
+        self.stats = {"barge_ins": 0, "turns_cancelled": 0, "cancelled_while_speaking": 0}
+
+    @contextmanager
+    def track(self, session_id: str, trace_id: str):
+        turn = ActiveTurn(session_id, trace_id)
+        self._turns[session_id] = turn
+        try:
+            yield turn
+        except BaseException:
+            # Nobody is waiting for the reply any more (includes the caller being cancelled)
+            turn.cancelled.set()
+            raise
+        finally:
+            if self._turns.get(session_id) is turn:
+                del self._turns[session_id]
+
+    def get(self, session_id: str) -> Optional[ActiveTurn]:
+        return self._turns.get(session_id)
+
+    def cancel(self, session_id: str) -> Optional[ActiveTurn]:
+        """Flag the session's turn as cancelled; returns it, or None if nothing was running here"""
+        turn = self._turns.pop(session_id, None)
+        if turn is None:
+            return None
+        turn.cancelled.set()
+        self.stats["turns_cancelled"] += 1
+        if turn.reply is not None:
+            self.stats["cancelled_while_speaking"] += 1
+        return turn
@@ -0,0 +1,197 @@
+"""Fill the response and audio caches ahead of class.
+
+Reads a curriculum file of student prompts (lesson openings, FAQ questions),
+generates each reply through GemmaHandler into the Redis response cache and
+has the TTS service synthesize it into its sentence cache, the same text,
+emotion and voice a live turn would use. LLM and TTS work overlap, each with
+its own concurrency limit. Finished prompts are appended to a state file, so
+an interrupted run picks up where it stopped; replies already in the cache
+are not generated again either.
+
+    python warm_cache.py curriculum.jsonl --llm-concurrency 4 --tts-concurrency 8
+    python warm_cache.py faq.txt --no-tts
+
+Curriculum formats: .txt with one prompt per line (# for comments), or .json /
+.jsonl with items that are either a prompt string or
+{"prompt": "...", "history": ["user::...", "ai::..."], "emotion": "cheerful"}.
+"""
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+from typing import List, Optional
+
+import requests
+
+from shared.config import Config
+from shared.redis_manager import RedisManager
+from gemma_handler import GemmaHandler, ERROR_REPLY
+from sentiment_analyzer import SentimentAnalyzer
+
+def load_curriculum(path: str) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            raw = json.load(f)
+        elif path.endswith(".jsonl"):
+            raw = [json.loads(line) for line in f if line.strip()]
+        else:
+            raw = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    items = []
+    for entry in raw:
+        item = {"prompt": entry} if isinstance(entry, str) else dict(entry)
+        item.setdefault("history", [])
+        items.append(item)
+    return items
+
+def format_seconds(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}m{seconds:02d}s" if minutes else f"{seconds}s"
+
+class CacheWarmer:
+    def __init__(self, gemma_handler: GemmaHandler, redis_manager: RedisManager, tts_url: Optional[str],
+                 llm_concurrency: int, tts_concurrency: int, voice: Optional[str], state_path: str):
+        self.gemma_handler = gemma_handler
+        self.redis_manager = redis_manager
+        self.sentiment_analyzer = SentimentAnalyzer()
+        self.tts_url = tts_url
+        self.voice = voice
+        self.llm_slots = asyncio.Semaphore(max(1, llm_concurrency))
+        self.tts_slots = asyncio.Semaphore(max(1, tts_concurrency))
+        self.state_path = state_path
+        self.done = set()
+        if os.path.exists(state_path):
+            with open(state_path, encoding="utf-8") as f:
+                self.done = {json.loads(line)["id"] for line in f if line.strip()}
+        self.stats = {"items": 0, "resumed": 0, "failed": 0, "llm_generated": 0, "llm_cached": 0,
+                      "llm_seconds": 0.0, "sentences": 0, "sentences_new": 0, "audio_seconds": 0.0}
+
+    def item_id(self, item: dict, history: List[str]) -> str:
+        key = self.gemma_handler.cache_key(history, item["prompt"])
+        extra = json.dumps([item.get("emotion"), self.voice, self.tts_url is not None])
+        return hashlib.sha256(f"{key}\n{extra}".encode("utf-8")).hexdigest()[:24]
+
+    async def warm(self, item: dict) -> Optional[dict]:
+        prompt = item["prompt"]
+        # The orchestrator adds the student's message to the history before generating
+        history = list(item["history"]) + [f"user::{prompt}"]
+        item_id = self.item_id(item, history)
+        if item_id in self.done:
+            self.stats["resumed"] += 1
+            return None
+
+        cache_key = self.gemma_handler.cache_key(history, prompt)
+        reply = self.redis_manager.get_cached_response(cache_key)
+        if reply is None:
+            async with self.llm_slots:
+                started = time.perf_counter()
+                reply = await asyncio.to_thread(self.gemma_handler.generate_response, history, prompt)
+                self.stats["llm_seconds"] += time.perf_counter() - started
+            if not reply or reply == ERROR_REPLY:
+                raise RuntimeError("LLM generation failed")
+            self.redis_manager.cache_response(cache_key, reply)
+            self.stats["llm_generated"] += 1
+        else:
+            self.stats["llm_cached"] += 1
+
+        result = {"id": item_id, "prompt": prompt, "reply_chars": len(reply)}
+        if self.tts_url is not None:
+            # Same emotion the orchestrator would pick from the last three messages
+            emotion = item.get("emotion") or self.sentiment_analyzer.analyze_conversation(
+                (history + [f"ai::{reply}"])[-3:]
+            )
+            async with self.tts_slots:
+                response = await asyncio.to_thread(
+                    requests.post, f"{self.tts_url}/cache/warm",
+                    json={"session_id": "cache-warm", "text": reply, "emotion": emotion, "voice": self.voice},
+                    timeout=300
+                )
+            response.raise_for_status()
+            tts = response.json()
+            self.stats["sentences"] += tts["sentences"]
+            self.stats["sentences_new"] += tts["sentences"] - tts["already_cached"]
+            self.stats["audio_seconds"] += tts["audio_duration"]
+            result.update(emotion=emotion, sentences=tts["sentences"], audio_duration=tts["audio_duration"])
+
+        with open(self.state_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        return result
+
+    async def run(self, items: List[dict]):
+        started = time.perf_counter()
+        total = len(items)
+        completed = 0
+
+        async def run_one(item: dict):
+            try:
+                return item, await self.warm(item), None
+            except Exception as e:
+                return item, None, e
+
+        for finished in asyncio.as_completed([run_one(item) for item in items]):
+            item, result, error = await finished
+            completed += 1
+            elapsed = time.perf_counter() - started
+            rate = completed / elapsed if elapsed > 0 else 0.0
+            eta = (total - completed) / rate if rate > 0 else 0.0
+            if error is not None:
+                self.stats["failed"] += 1
+                status = f"FAILED: {error}"
+            elif result is None:
+                status = "done in an earlier run"
+            else:
+                self.stats["items"] += 1
+                status = f"{result['reply_chars']} chars"
+                if "sentences" in result:
+                    status += f", {result['sentences']} sentences, {result['audio_duration']:.1f}s audio"
+            print(f"[{completed:>{len(str(total))}}/{total}] {rate:5.2f} items/s  ETA {format_seconds(eta):>6}  "
+                  f"{item['prompt'][:40]!r}: {status}")
+        self.report(time.perf_counter() - started)
+
+    def report(self, elapsed: float):
+        s = self.stats
+        print(f"\nWarmed {s['items']} prompts in {format_seconds(elapsed)} "
+              f"({s['items'] / elapsed if elapsed > 0 else 0:.2f}/s), "
+              f"{s['resumed']} done in an earlier run, {s['failed']} failed")
+        generated = s["llm_generated"]
+        print(f"LLM: {generated} replies generated, {s['llm_cached']} already cached"
+              + (f", {s['llm_seconds'] / generated:.1f}s per reply" if generated else ""))
+        if self.tts_url is not None:
+            print(f"TTS: {s['sentences']} sentences ({s['sentences_new']} new), {s['audio_seconds']:.0f}s of audio, "
+                  f"{s['audio_seconds'] / elapsed if elapsed > 0 else 0:.1f}s audio per second")
+        if s["failed"]:
+            print("Run again to retry the failed prompts")
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm the LLM response and TTS audio caches from a curriculum file")
+    parser.add_argument("curriculum")
+    parser.add_argument("--ollama-url", default=Config.OLLAMA_BACKENDS or Config.OLLAMA_API_URL)
+    parser.add_argument("--tts-url", default=Config.OPENVOICE_SERVICE_URL)
+    parser.add_argument("--no-tts", action="store_true", help="only fill the response cache")
+    parser.add_argument("--llm-concurrency", type=int, default=Config.LLM_MAX_CONCURRENT)
+    parser.add_argument("--tts-concurrency", type=int, default=Config.TTS_MAX_BATCH)
+    parser.add_argument("--voice", default=Config.TEACHER_VOICE or None)
+    parser.add_argument("--state", help="progress file (default: <curriculum>.warm.jsonl)")
+    parser.add_argument("--restart", action="store_true", help="forget earlier progress")
+    args = parser.parse_args()
+
+    state_path = args.state or f"{args.curriculum}.warm.jsonl"
+    if args.restart and os.path.exists(state_path):
+        os.remove(state_path)
+    items = load_curriculum(args.curriculum)
+    warmer = CacheWarmer(
+        GemmaHandler(api_url=args.ollama_url), RedisManager(), None if args.no_tts else args.tts_url,
+        args.llm_concurrency, args.tts_concurrency, args.voice, state_path
+    )
+    print(f"{len(items)} prompts, {len(warmer.done)} done in earlier runs (progress in {state_path})")
+    try:
+        asyncio.run(warmer.run(items))
+    except KeyboardInterrupt:
+        print("\nInterrupted; run the same command again to resume")
+
+if __name__ == "__main__":
+    main()
@@ -11,10 +11,17 @@ class AITeacher {
         this.audioQueue = [];
         this.isPlayingTTS = false;
         this.currentAudio = null;
+        this.audioFormat = this.pickAudioFormat();
+        this.ttsUtterances = {};
+        this.ttsSources = [];
+        this.ttsNextTime = 0;
+        this.ttsScheduled = 0;  // Seconds of socket audio scheduled for the answer being spoken
+        this.streamPlayer = null;
         
         this.initializeElements();
         this.attachEventListeners();
         this.connect();
+        this.connectTTSSocket();
         this.startHealthCheck();
         this.initializeWebAudio();
         
@@ -26,6 +33,33 @@ class AITeacher {
         }
     }
     
+    // Tell the ASR service while the teacher is audible, so it can tell barge-in from echo
+    get isSpeaking() {
+        return this._isSpeaking;
+    }
+    
+    set isSpeaking(speaking) {
+        if (this._isSpeaking === speaking) return;
+        this._isSpeaking = speaking;
+        if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+            this.ws.send(JSON.stringify({ type: 'playback', speaking }));
+        }
+    }
+    
+    // Streamed playback needs an encoding StreamingAudioPlayer can decode as it arrives
+    streamFormat() {
+        if (this.audioContext && !StreamingAudioPlayer.canStream(this.audioFormat)) return 'wav';
+        return this.audioFormat;
+    }
+    
+    // Ask the TTS service for the smallest encoding this browser can play
+    pickAudioFormat() {
+        const probe = document.createElement('audio');
+        if (probe.canPlayType('audio/ogg; codecs="opus"')) return 'opus';
+        if (probe.canPlayType('audio/flac')) return 'flac';
+        return 'wav';
+    }
+    
     generateSessionId() {
         return 'session_' + Math.random().toString(36).substr(2, 9);
     }
@@ -39,6 +73,7 @@ class AITeacher {
             sendTextBtn: document.getElementById('send-text-btn'),
             voiceBtn: document.getElementById('voice-btn'),
             interruptBtn: document.getElementById('interrupt-btn'),
+            continueBtn: document.getElementById('continue-btn'),
             stopBtn: document.getElementById('stop-btn'),
             currentState: document.getElementById('current-state'),
             currentEmotion: document.getElementById('current-emotion'),
@@ -88,6 +123,7 @@ class AITeacher {
         // Voice controls
         this.elements.voiceBtn.addEventListener('click', () => this.toggleVoice());
         this.elements.interruptBtn.addEventListener('click', () => this.interrupt());
+        this.elements.continueBtn.addEventListener('click', () => this.continueAnswer());
         this.elements.stopBtn.addEventListener('click', () => this.stop());
         
         // Session controls
@@ -170,21 +206,25 @@ class AITeacher {
     }
     
     // OpenVoice TTS using fetch (streaming)
-    async speakWithOpenVoice(text, emotion = 'default') {
+    async speakWithOpenVoice(text, emotion = 'default', traceId = null) {
         try {
             this.updateState('Generating speech...');
             console.log(`Requesting OpenVoice TTS for: "${text.substring(0, 50)}..." with emotion: ${emotion}`);
             
+            const headers = { 'Content-Type': 'application/json' };
+            if (traceId) {
+                // Ties the TTS hop to the turn's trace (see /traces/{id}/waterfall on the orchestrator)
+                headers['X-Trace-Id'] = traceId;
+            }
             const response = await fetch('http://localhost:8002/synthesize_stream', {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
+                headers: headers,
                 body: JSON.stringify({
                     session_id: this.sessionId,
                     text: text,
                     emotion: emotion,
-                    stream: true
+                    stream: true,
+                    format: this.streamFormat()
                 })
             });
             
@@ -196,6 +236,12 @@ class AITeacher {
                 throw new Error(`TTS request failed: ${errorText}`);
             }
             
+            if (this.audioContext) {
+                // Start with the first sentence instead of waiting for the whole answer
+                await this.playStreamedSpeech(response);
+                return;
+            }
+            
             // Get audio as blob
             const audioBlob = await response.blob();
             console.log('Audio blob size:', audioBlob.size);
@@ -256,9 +302,256 @@ class AITeacher {
         }
     }
     
+    async playStreamedSpeech(response) {
+        this.stopStreamPlayer();
+        const player = new StreamingAudioPlayer(this.audioContext, {
+            jitterMs: 150,
+            onStart: () => {
+                this.isSpeaking = true;
+                this.elements.interruptBtn.disabled = false;
+                this.updateState('Speaking (OpenVoice)...');
+            },
+            onEnd: () => {
+                if (this.streamPlayer === player) this.streamPlayer = null;
+                this.isSpeaking = false;
+                this.elements.interruptBtn.disabled = true;
+                this.updateState('Ready');
+            }
+        });
+        this.streamPlayer = player;
+        await player.play(response);
+        if (player.underruns > 0) {
+            console.log(`Streamed playback rebuffered ${player.underruns} time(s)`);
+        }
+    }
+    
+    stopStreamPlayer() {
+        if (this.streamPlayer) {
+            this.streamPlayer.stop();
+            this.streamPlayer = null;
+        }
+    }
+    
+    // Low-latency TTS channel: PCM frames are scheduled on the Web Audio clock as they arrive
+    connectTTSSocket() {
+        this.ttsWebSocket = new WebSocket(`ws://localhost:8002/ws/tts/${this.sessionId}`);
+        this.ttsWebSocket.binaryType = 'arraybuffer';
+        
+        this.ttsWebSocket.onmessage = (event) => {
+            if (event.data instanceof ArrayBuffer) {
+                this.handleTTSFrame(event.data);
+            } else {
+                this.handleTTSMessage(JSON.parse(event.data));
+            }
+        };
+        
+        this.ttsWebSocket.onclose = () => {
+            this.ttsWebSocket = null;
+            // HTTP synthesis is used until the socket comes back
+            setTimeout(() => this.connectTTSSocket(), 5000);
+        };
+        
+        this.ttsWebSocket.onerror = (error) => {
+            console.error('TTS WebSocket error:', error);
+        };
+    }
+    
+    speakWithTTSSocket(text, emotion = 'default', traceId = null) {
+        if (!this.ttsWebSocket || this.ttsWebSocket.readyState !== WebSocket.OPEN || !this.audioContext) {
+            return false;
+        }
+        const utteranceId = 'utt_' + Math.random().toString(36).substr(2, 9);
+        this.ttsUtterances[utteranceId] = { text, emotion, ended: false };
+        this.ttsWebSocket.send(JSON.stringify({
+            type: 'synthesize',
+            utterance_id: utteranceId,
+            text: text,
+            emotion: emotion,
+            format: 'pcm',
+            trace_id: traceId
+        }));
+        this.updateState('Generating speech...');
+        return true;
+    }
+    
+    handleTTSMessage(data) {
+        const utterance = this.ttsUtterances[data.utterance_id];
+        
+        switch (data.type) {
+            case 'utterance_start':
+                if (!utterance) break;
+                utterance.index = data.index;
+                utterance.sampleRate = data.sample_rate;
+                this.ttsUtterances[`#${data.index}`] = utterance;
+                this.isSpeaking = true;
+                this.elements.interruptBtn.disabled = false;
+                this.updateState('Speaking (OpenVoice)...');
+                break;
+                
+            case 'utterance_end':
+                if (!utterance) break;
+                utterance.ended = true;
+                this.onTTSSourceEnded();
+                break;
+                
+            case 'cancelled':
+                this.forgetUtterance(data.utterance_id);
+                break;
+                
+            case 'error':
+                console.error('TTS stream error:', data.message);
+                if (utterance) {
+                    this.forgetUtterance(data.utterance_id);
+                    this.addMessage('error', 'OpenVoice TTS failed, falling back to browser TTS');
+                    this.speakWithBrowserTTS(utterance.text, utterance.emotion);
+                }
+                break;
+        }
+    }
+    
+    handleTTSFrame(buffer) {
+        const header = new DataView(buffer, 0, 8);
+        const index = header.getUint32(0, true);
+        const utterance = this.ttsUtterances[`#${index}`];
+        if (!utterance) return; // cancelled or unknown utterance
+        
+        const samples = new Int16Array(buffer, 8);
+        const audioBuffer = this.audioContext.createBuffer(1, samples.length, utterance.sampleRate);
+        const channel = audioBuffer.getChannelData(0);
+        for (let i = 0; i < samples.length; i++) {
+            channel[i] = samples[i] / 32768;
+        }
+        
+        if (this.audioContext.state === 'suspended') {
+            this.audioContext.resume();
+        }
+        const source = this.audioContext.createBufferSource();
+        source.buffer = audioBuffer;
+        source.connect(this.audioContext.destination);
+        // Back-to-back on the audio clock, with a small lead if we've fallen behind
+        const startAt = Math.max(this.ttsNextTime, this.audioContext.currentTime + 0.05);
+        source.start(startAt);
+        this.ttsNextTime = startAt + audioBuffer.duration;
+        this.ttsScheduled += audioBuffer.duration;
+        
+        this.ttsSources.push(source);
+        source.onended = () => {
+            this.ttsSources = this.ttsSources.filter(s => s !== source);
+            this.onTTSSourceEnded();
+        };
+    }
+    
+    onTTSSourceEnded() {
+        if (this.ttsSources.length > 0) return;
+        const pending = Object.keys(this.ttsUtterances).some(key => !key.startsWith('#') && !this.ttsUtterances[key].ended);
+        if (pending) return;
+        this.ttsUtterances = {};
+        this.ttsScheduled = 0;
+        this.isSpeaking = false;
+        this.elements.interruptBtn.disabled = true;
+        this.updateState('Ready');
+    }
+    
+    forgetUtterance(utteranceId) {
+        const utterance = this.ttsUtterances[utteranceId];
+        if (!utterance) return;
+        delete this.ttsUtterances[utteranceId];
+        if (utterance.index !== undefined) {
+            delete this.ttsUtterances[`#${utterance.index}`];
+        }
+    }
+    
+    stopTTSStream() {
+        this.stopStreamPlayer();
+        if (this.ttsWebSocket && this.ttsWebSocket.readyState === WebSocket.OPEN) {
+            this.ttsWebSocket.send(JSON.stringify({ type: 'cancel' }));
+        }
+        this.ttsUtterances = {};
+        this.ttsSources.forEach(source => {
+            source.onended = null;
+            try { source.stop(); } catch (e) { /* already stopped */ }
+        });
+        this.ttsSources = [];
+        this.ttsNextTime = 0;
+        this.ttsScheduled = 0;
+    }
+    
+    // Seconds of the current answer the student has heard, or null when none is playing
+    playbackPosition() {
+        if (this.streamPlayer) {
+            return this.streamPlayer.playedSeconds();
+        }
+        if (this.ttsScheduled > 0 && this.audioContext) {
+            return Math.max(0, this.ttsScheduled - Math.max(0, this.ttsNextTime - this.audioContext.currentTime));
+        }
+        if (this.currentAudio) {
+            return this.currentAudio.currentTime;
+        }
+        if (!this.elements.ttsAudio.paused) {
+            return this.elements.ttsAudio.currentTime;
+        }
+        return null;
+    }
+    
+    // Call before stopping playback: "continue" later resumes the answer from this point
+    reportPlaybackPosition() {
+        const position = this.isSpeaking && !this.useBrowserTTS ? this.playbackPosition() : null;
+        if (position === null) return;
+        fetch(`http://localhost:8001/sessions/${this.sessionId}/playback`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ played_seconds: position })
+        }).catch(error => console.error('Failed to report playback position:', error));
+    }
+    
+    offerContinuation(continuation) {
+        if (!continuation) return;
+        this.addMessage('system', `Would you like me to continue explaining: "${continuation.continuation_text}"?`);
+        this.elements.continueBtn.disabled = false;
+    }
+    
+    // Resume the interrupted answer; the TTS service replays the audio it already made
+    async continueAnswer() {
+        this.elements.continueBtn.disabled = true;
+        // Stop whatever is playing without reporting it, the saved position belongs to the interrupted answer
+        this.stopPlayback(false);
+        try {
+            const response = await fetch(
+                `http://localhost:8001/sessions/${this.sessionId}/continue?audio_format=${this.audioFormat}`,
+                { method: 'POST' }
+            );
+            if (!response.ok) {
+                throw new Error(await response.text());
+            }
+            this.playContinuation(await response.json());
+        } catch (error) {
+            console.error('Continue failed:', error);
+            this.addMessage('error', 'Nothing to continue');
+        }
+    }
+    
+    playContinuation(data) {
+        this.elements.continueBtn.disabled = true;
+        this.addMessage('ai', data.text, 'default');
+        if (data.resumed && data.audio_url && !this.useBrowserTTS) {
+            this.playAudio(data.audio_url);
+        } else {
+            this.speakResponse(data.text, 'default', data.trace_id);
+        }
+    }
+    
+    async speakResponse(text, emotion = 'default', traceId = null) {
+        if (this.useBrowserTTS) {
+            this.speakWithBrowserTTS(text, emotion);
+        } else if (!this.speakWithTTSSocket(text, emotion, traceId)) {
+            await this.speakWithOpenVoice(text, emotion, traceId);
+        }
+    }
+    
     connect() {
         const token = "my_secure_token";
-        const wsUrl = `ws://localhost:8000/ws/${this.sessionId}?token=${token}`;
+        // The teacher's replies are encoded in a format this browser can play
+        const wsUrl = `ws://localhost:8000/ws/${this.sessionId}?token=${token}&audio_format=${this.audioFormat}`;
         this.ws = new WebSocket(wsUrl);
         
         this.ws.onopen = () => {
@@ -300,6 +593,11 @@ class AITeacher {
                 break;
                 
             case 'transcription':
+                if (data.final === false) {
+                    // Partial transcript while the student is still speaking
+                    this.updateState(`Hearing: "${data.text}"`);
+                    break;
+                }
                 this.addMessage('user', `"${data.text}" (confidence: ${(data.confidence * 100).toFixed(1)}%)`);
                 break;
                 
@@ -308,11 +606,8 @@ class AITeacher {
                 this.updateEmotion(data.emotion);
                 
                 // Use appropriate TTS
-                if (this.useBrowserTTS) {
-                    this.speakWithBrowserTTS(data.text, data.emotion);
-                } else {
-                    this.speakWithOpenVoice(data.text, data.emotion);
-                }
+                this.speakResponse(data.text, data.emotion, data.trace_id);
+                this.offerContinuation(data.continuation);
                 break;
                 
             case 'tts_complete':
@@ -336,7 +631,26 @@ class AITeacher {
                 break;
                 
             case 'continuation_available':
-                this.addMessage('system', `Would you like me to continue explaining: "${data.text}"?`);
+                this.offerContinuation({ continuation_text: data.text, resumable: data.resumable });
+                break;
+                
+            case 'continuation':
+                this.playContinuation(data);
+                break;
+                
+            case 'queue_position':
+                this.updateState(`Waiting for the teacher (#${data.position} in line)...`);
+                break;
+                
+            case 'busy':
+                this.addMessage('system', `${data.message} (try again in about ${Math.ceil(data.retry_after || 5)}s)`);
+                this.updateState('Teacher busy');
+                break;
+                
+            case 'barge_in':
+                // The student started talking over the teacher; the server already stopped the reply
+                this.stopPlayback();
+                this.updateState('Listening...');
                 break;
                 
             case 'error':
@@ -369,13 +683,24 @@ class AITeacher {
                 },
                 body: JSON.stringify({
                     session_id: this.sessionId,
-                    message: text
+                    message: text,
+                    audio_format: this.audioFormat
                 }),
                 signal: controller.signal
             });
             
             clearTimeout(timeoutId);
             
+            if (response.status === 429) {
+                const busy = await response.json();
+                this.handleWebSocketMessage({
+                    type: 'busy',
+                    message: busy.detail,
+                    retry_after: parseFloat(response.headers.get('Retry-After')) || 5
+                });
+                return;
+            }
+            
             if (!response.ok) {
                 const errorText = await response.text();
                 console.error('Response error:', errorText);
@@ -390,11 +715,8 @@ class AITeacher {
             this.updateEmotion(data.emotion || 'default');
             
             // Use appropriate TTS
-            if (this.useBrowserTTS) {
-                this.speakWithBrowserTTS(data.ai_response, data.emotion || 'default');
-            } else {
-                await this.speakWithOpenVoice(data.ai_response, data.emotion || 'default');
-            }
+            this.offerContinuation(data.continuation);
+            await this.speakResponse(data.ai_response, data.emotion || 'default', data.trace_id);
             
         } catch (error) {
             console.error('Error sending message:', error);
@@ -454,40 +776,37 @@ class AITeacher {
     // --- Microphone streaming using Web Audio API for raw PCM ---
     mediaStream = null;
     voiceAudioContext = null;
-    scriptNode = null;
+    captureNode = null;
 
     startVoiceInput() {
         this.isListening = true;
         this.elements.voiceBtn.textContent = '🎤 Listening...';
         this.elements.voiceBtn.style.backgroundColor = '#e74c3c';
         
-        navigator.mediaDevices.getUserMedia({ audio: true })
-            .then(stream => {
+        // Echo cancellation keeps the teacher's voice out of the mic so the student can barge in
+        navigator.mediaDevices.getUserMedia({
+            audio: { echoCancellation: true, noiseSuppression: true, autoGainControl: true }
+        })
+            .then(async stream => {
                 this.mediaStream = stream;
                 this.voiceAudioContext = new (window.AudioContext || window.webkitAudioContext)({ sampleRate: 16000 });
                 const source = this.voiceAudioContext.createMediaStreamSource(stream);
 
-                // ScriptProcessorNode is deprecated but still widely supported
-                this.scriptNode = this.voiceAudioContext.createScriptProcessor(4096, 1, 1);
-
-                this.scriptNode.onaudioprocess = (audioProcessingEvent) => {
-                    if (!this.isConnected || !this.isListening) return;
-                    const inputBuffer = audioProcessingEvent.inputBuffer;
-                    const inputData = inputBuffer.getChannelData(0); // mono
-
-                    // Convert Float32Array [-1,1] to 16-bit PCM Little Endian
-                    const pcmBuffer = new ArrayBuffer(inputData.length * 2);
-                    const pcmView = new DataView(pcmBuffer);
-                    for (let i = 0; i < inputData.length; i++) {
-                        let s = Math.max(-1, Math.min(1, inputData[i]));
-                        pcmView.setInt16(i * 2, s < 0 ? s * 0x8000 : s * 0x7FFF, true);
+                this.captureNode = null;
+                if (this.voiceAudioContext.audioWorklet) {
+                    try {
+                        this.captureNode = await this.createWorkletCapture();
+                    } catch (err) {
+                        // e.g. the page was opened from file://, where worklet modules can't load
+                        console.warn('AudioWorklet capture unavailable, using ScriptProcessor:', err);
                     }
-                    // Send PCM buffer as binary
-                    this.ws.send(pcmBuffer);
-                };
+                }
+                if (!this.captureNode) {
+                    this.captureNode = this.createScriptProcessorCapture();
+                }
 
-                source.connect(this.scriptNode);
-                this.scriptNode.connect(this.voiceAudioContext.destination);
+                source.connect(this.captureNode);
+                this.captureNode.connect(this.voiceAudioContext.destination);
                 
                 this.updateState('Listening...');
             })
@@ -502,14 +821,55 @@ class AITeacher {
         }));
     }
 
+    // Int16 conversion and framing run on the audio thread; each message is one 512-sample
+    // (32 ms) frame, the server's VAD chunk, handed over as a transferable buffer
+    async createWorkletCapture() {
+        await this.voiceAudioContext.audioWorklet.addModule('pcm-capture-worklet.js');
+        const node = new AudioWorkletNode(this.voiceAudioContext, 'pcm-capture', {
+            numberOfInputs: 1,
+            numberOfOutputs: 1,
+            channelCount: 1,
+            processorOptions: { frameSize: 512, targetSampleRate: 16000 }
+        });
+        node.port.onmessage = (event) => {
+            if (!this.isConnected || !this.isListening) return;
+            this.ws.send(event.data);
+        };
+        return node;
+    }
+    
+    // Fallback for browsers without AudioWorklet: 4096-sample blocks converted on the main thread
+    createScriptProcessorCapture() {
+        const node = this.voiceAudioContext.createScriptProcessor(4096, 1, 1);
+        node.onaudioprocess = (audioProcessingEvent) => {
+            if (!this.isConnected || !this.isListening) return;
+            const inputBuffer = audioProcessingEvent.inputBuffer;
+            const inputData = inputBuffer.getChannelData(0); // mono
+
+            // Convert Float32Array [-1,1] to 16-bit PCM Little Endian
+            const pcmBuffer = new ArrayBuffer(inputData.length * 2);
+            const pcmView = new DataView(pcmBuffer);
+            for (let i = 0; i < inputData.length; i++) {
+                let s = Math.max(-1, Math.min(1, inputData[i]));
+                pcmView.setInt16(i * 2, s < 0 ? s * 0x8000 : s * 0x7FFF, true);
+            }
+            // Send PCM buffer as binary
+            this.ws.send(pcmBuffer);
+        };
+        return node;
+    }
+
     stopVoiceInput() {
         this.isListening = false;
         this.elements.voiceBtn.textContent = '🎤 Start Voice';
         this.elements.voiceBtn.style.backgroundColor = '#27ae60';
 
-        if (this.scriptNode) {
-            this.scriptNode.disconnect();
-            this.scriptNode = null;
+        if (this.captureNode) {
+            if (this.captureNode.port) {
+                this.captureNode.port.onmessage = null;
+            }
+            this.captureNode.disconnect();
+            this.captureNode = null;
         }
         if (this.voiceAudioContext) {
             this.voiceAudioContext.close();
@@ -523,15 +883,40 @@ class AITeacher {
         this.updateState('Idle');
     }
     
+    stopPlayback(report = true) {
+        if (report) {
+            this.reportPlaybackPosition();
+        }
+        if ('speechSynthesis' in window) {
+            window.speechSynthesis.cancel();
+        }
+        this.stopTTSStream();
+        if (this.currentAudio) {
+            this.currentAudio.pause();
+            this.currentAudio.currentTime = 0;
+            this.currentAudio = null;
+        }
+        this.elements.ttsAudio.pause();
+        this.elements.ttsAudio.currentTime = 0;
+        this.isSpeaking = false;
+        this.elements.interruptBtn.disabled = true;
+    }
+    
     interrupt() {
         if (!this.isSpeaking || !this.isConnected) return;
         
+        // Remember where the answer was cut off; the barge-in keeps it on the server for "continue"
+        this.reportPlaybackPosition();
+        fetch(`http://localhost:8001/sessions/${this.sessionId}/barge_in`, { method: 'POST' })
+            .catch(error => console.error('Barge-in failed:', error));
+        
         // Stop browser TTS if active
         if (this.useBrowserTTS && 'speechSynthesis' in window) {
             window.speechSynthesis.cancel();
         }
         
         // Stop OpenVoice audio if playing
+        this.stopTTSStream();
         if (this.currentAudio) {
             this.currentAudio.pause();
             this.currentAudio.currentTime = 0;
@@ -570,7 +955,8 @@ class AITeacher {
                 },
                 body: JSON.stringify({
                     session_id: this.sessionId,
-                    message: text
+                    message: text,
+                    audio_format: this.audioFormat
                 })
             });
             
@@ -588,11 +974,8 @@ class AITeacher {
             this.updateEmotion(data.emotion || 'default');
             
             // Use appropriate TTS
-            if (this.useBrowserTTS) {
-                this.speakWithBrowserTTS(data.ai_response, data.emotion || 'default');
-            } else {
-                await this.speakWithOpenVoice(data.ai_response, data.emotion || 'default');
-            }
+            this.offerContinuation(data.continuation);
+            await this.speakResponse(data.ai_response, data.emotion || 'default', data.trace_id);
             
         } catch (error) {
             console.error('Error sending message:', error);
@@ -609,6 +992,8 @@ class AITeacher {
             }
             
             // Stop OpenVoice audio if playing
+            this.reportPlaybackPosition();
+            this.stopTTSStream();
             if (this.currentAudio) {
                 this.currentAudio.pause();
                 this.currentAudio.currentTime = 0;
@@ -724,26 +1109,31 @@ class AITeacher {
         }, 10000); // Check every 10 seconds
     }
     
+    // The orchestrator keeps the health of every service cached, so one request covers all of them
     checkHealth() {
-        Promise.all([
-            fetch('http://localhost:8000/health').then(r => r.ok ? 'healthy' : 'unhealthy').catch(() => 'unreachable'),
-            fetch('http://localhost:8001/health').then(r => r.ok ? 'healthy' : 'unhealthy').catch(() => 'unreachable'),
-            fetch('http://localhost:8002/health').then(r => r.ok ? 'healthy' : 'unhealthy').catch(() => 'unreachable')
-        ]).then(results => {
-            const services = {
-                'ASR Service': results[0],
-                'Orchestrator': results[1],
-                'TTS Service': results[2]
-            };
-            
-            let statusHtml = '';
-            for (const [service, status] of Object.entries(services)) {
-                const className = status === 'healthy' ? 'service-healthy' : 
-                                status === 'unhealthy' ? 'service-unhealthy' : 'service-unreachable';
-                statusHtml += `<div class="${className}">${service}: ${status}</div>`;
-            }
-            this.elements.serviceStatus.innerHTML = statusHtml;
-        });
+        fetch('http://localhost:8001/health')
+            .then(r => r.ok ? r.json() : Promise.reject(new Error(`HTTP ${r.status}`)))
+            .catch(() => ({ orchestrator: 'unreachable' }))
+            .then(health => {
+                const services = {
+                    'ASR Service': health.funasr || 'unknown',
+                    // Up but still loading the model; the first turn would be slow
+                    'Orchestrator': health.ready === false ? 'warming up' : health.orchestrator,
+                    'TTS Service': health.openvoice || 'unknown'
+                };
+                const llm = health.dependencies && health.dependencies.ollama;
+                if (llm) {
+                    services['LLM'] = llm.circuit === 'open' ? 'unreachable' : llm.status;
+                }
+                
+                let statusHtml = '';
+                for (const [service, status] of Object.entries(services)) {
+                    const className = status === 'healthy' ? 'service-healthy' : 
+                                    status === 'unhealthy' ? 'service-unhealthy' : 'service-unreachable';
+                    statusHtml += `<div class="${className}">${service}: ${status}</div>`;
+                }
+                this.elements.serviceStatus.innerHTML = statusHtml;
+            });
     }
 }
 
@@ -0,0 +1,54 @@
+// Microphone capture on the audio thread: resamples to 16 kHz if the context runs at
+// another rate, converts to 16-bit PCM and posts fixed-size frames to the main thread.
+// Frames default to 512 samples (32 ms), the chunk size of the server's Silero VAD.
+class PCMCaptureProcessor extends AudioWorkletProcessor {
+    constructor(options) {
+        super();
+        const opts = (options && options.processorOptions) || {};
+        this.frameSize = opts.frameSize || 512;
+        this.targetRate = opts.targetSampleRate || 16000;
+        // sampleRate is the context rate, a global in AudioWorkletGlobalScope
+        this.step = sampleRate / this.targetRate;
+        this.position = 0;  // Read position into the next input block, in input samples
+        this.last = 0;      // Last input sample of the previous block, for interpolation
+        this.frame = new Int16Array(this.frameSize);
+        this.filled = 0;
+    }
+
+    push(sample) {
+        const s = Math.max(-1, Math.min(1, sample));
+        this.frame[this.filled++] = s < 0 ? s * 0x8000 : s * 0x7FFF;
+        if (this.filled === this.frameSize) {
+            // Hand the buffer over without copying and start a new one
+            this.port.postMessage(this.frame.buffer, [this.frame.buffer]);
+            this.frame = new Int16Array(this.frameSize);
+            this.filled = 0;
+        }
+    }
+
+    process(inputs) {
+        const input = inputs[0];
+        if (!input || input.length === 0) return true;
+        const samples = input[0];  // mono
+
+        if (this.step === 1) {
+            for (let i = 0; i < samples.length; i++) this.push(samples[i]);
+            return true;
+        }
+
+        // Linear interpolation. A position past the last sample waits for the next block,
+        // where it lands in -1..0, between the previous block's last sample and this one's first
+        while (this.position < samples.length - 1) {
+            const index = Math.floor(this.position);
+            const frac = this.position - index;
+            const a = index < 0 ? this.last : samples[index];
+            this.push(a + (samples[index + 1] - a) * frac);
+            this.position += this.step;
+        }
+        this.position -= samples.length;
+        this.last = samples[samples.length - 1];
+        return true;
+    }
+}
+
+registerProcessor('pcm-capture', PCMCaptureProcessor);
@@ -0,0 +1,323 @@
+// Plays a streamed TTS response while it downloads. Chunks are decoded as they arrive and
+// scheduled back-to-back on the Web Audio clock behind a small jitter buffer:
+//   - WAV (streamed 16-bit PCM, unknown length) is parsed incrementally
+//   - Ogg Opus is demuxed here and decoded with WebCodecs' AudioDecoder
+//   - anything else is decoded once the whole body is in, through the same scheduler
+class StreamingAudioPlayer {
+    constructor(audioContext, options = {}) {
+        this.audioContext = audioContext;
+        this.jitterSeconds = (options.jitterMs || 150) / 1000;
+        this.onStart = options.onStart || (() => {});
+        this.onEnd = options.onEnd || (() => {});
+        this.sources = [];
+        this.pending = [];  // Decoded buffers held until the jitter buffer is full
+        this.pendingDuration = 0;
+        this.nextTime = 0;
+        this.scheduledSeconds = 0;
+        this.started = false;
+        this.finished = false;
+        this.stopped = false;
+        this.ended = false;
+        this.underruns = 0;
+        this.reader = null;
+        this.decoder = null;
+    }
+
+    // Formats that can start playing before the download completes
+    static canStream(format) {
+        return format === 'wav' || (format === 'opus' && 'AudioDecoder' in window);
+    }
+
+    async play(response) {
+        const type = (response.headers.get('content-type') || '').toLowerCase();
+        this.reader = response.body.getReader();
+        try {
+            if (type.includes('wav')) {
+                await this.readWav();
+            } else if (type.includes('opus') && 'AudioDecoder' in window) {
+                await this.readOggOpus();
+            } else {
+                await this.readWhole();
+            }
+        } finally {
+            this.reader = null;
+        }
+        if (this.stopped) return;
+        this.finished = true;
+        this.flush();  // Short answers can end before the jitter buffer fills
+        this.checkEnded();
+    }
+
+    stop() {
+        this.stopped = true;
+        if (this.reader) {
+            this.reader.cancel().catch(() => { /* already closed */ });
+        }
+        if (this.decoder && this.decoder.state !== 'closed') {
+            this.decoder.close();
+        }
+        this.pending = [];
+        this.sources.forEach(source => {
+            source.onended = null;
+            try { source.stop(); } catch (e) { /* already stopped */ }
+        });
+        this.sources = [];
+    }
+
+    // Seconds of the stream heard so far: everything scheduled minus what is still ahead
+    playedSeconds() {
+        const ahead = Math.max(0, this.nextTime - this.audioContext.currentTime);
+        return Math.max(0, this.scheduledSeconds - ahead);
+    }
+
+    async *chunks() {
+        while (!this.stopped) {
+            const { done, value } = await this.reader.read();
+            if (done) return;
+            yield value;
+        }
+    }
+
+    // --- Scheduling ---
+
+    enqueue(audioBuffer) {
+        if (this.stopped || audioBuffer.length === 0) return;
+        if (this.started) {
+            this.schedule(audioBuffer);
+            return;
+        }
+        this.pending.push(audioBuffer);
+        this.pendingDuration += audioBuffer.duration;
+        if (this.pendingDuration >= this.jitterSeconds) {
+            this.flush();
+        }
+    }
+
+    flush() {
+        if (this.pending.length === 0) return;
+        if (!this.started) {
+            this.started = true;
+            this.onStart();
+        }
+        const pending = this.pending;
+        this.pending = [];
+        this.pendingDuration = 0;
+        pending.forEach(audioBuffer => this.schedule(audioBuffer));
+    }
+
+    schedule(audioBuffer) {
+        const ctx = this.audioContext;
+        if (ctx.state === 'suspended') {
+            ctx.resume();
+        }
+        let startAt = this.nextTime;
+        if (startAt < ctx.currentTime) {
+            // First chunk, or the network fell behind playback: rebuild the lead
+            if (this.nextTime > 0) this.underruns++;
+            startAt = ctx.currentTime + (this.nextTime > 0 ? this.jitterSeconds : 0.05);
+        }
+        const source = ctx.createBufferSource();
+        source.buffer = audioBuffer;
+        source.connect(ctx.destination);
+        source.start(startAt);
+        this.nextTime = startAt + audioBuffer.duration;
+        this.scheduledSeconds += audioBuffer.duration;
+
+        this.sources.push(source);
+        source.onended = () => {
+            this.sources = this.sources.filter(s => s !== source);
+            this.checkEnded();
+        };
+    }
+
+    checkEnded() {
+        if (this.ended || this.stopped || !this.finished) return;
+        if (this.sources.length > 0 || this.pending.length > 0) return;
+        this.ended = true;
+        this.onEnd();
+    }
+
+    // --- WAV ---
+
+    async readWav() {
+        let header = new Uint8Array(0);
+        let format = null;
+        let leftover = null;  // Partial sample frame carried to the next chunk
+        for await (const chunk of this.chunks()) {
+            let data = chunk;
+            if (!format) {
+                header = StreamingAudioPlayer.concat([header, chunk]);
+                format = StreamingAudioPlayer.parseWavHeader(header);
+                if (!format) continue;
+                data = header.subarray(format.dataOffset);
+            }
+            if (leftover) {
+                data = StreamingAudioPlayer.concat([leftover, data]);
+                leftover = null;
+            }
+            const usable = data.length - (data.length % format.blockAlign);
+            if (usable < data.length) {
+                leftover = data.slice(usable);
+            }
+            if (usable > 0) {
+                this.enqueue(this.pcmToBuffer(data.subarray(0, usable), format));
+            }
+        }
+    }
+
+    // Returns null until the bytes up to the start of the data chunk have arrived
+    static parseWavHeader(bytes) {
+        if (bytes.length < 12) return null;
+        const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.length);
+        const tag = (offset) => String.fromCharCode(...bytes.subarray(offset, offset + 4));
+        if (tag(0) !== 'RIFF' || tag(8) !== 'WAVE') {
+            throw new Error('Not a WAV stream');
+        }
+        let format = null;
+        let offset = 12;
+        while (offset + 8 <= bytes.length) {
+            const id = tag(offset);
+            const size = view.getUint32(offset + 4, true);
+            if (id === 'data') {
+                if (!format) throw new Error('WAV data before fmt chunk');
+                format.dataOffset = offset + 8;
+                return format;
+            }
+            if (offset + 8 + size > bytes.length) return null;
+            if (id === 'fmt ') {
+                const channels = view.getUint16(offset + 10, true);
+                const bits = view.getUint16(offset + 22, true);
+                if (view.getUint16(offset + 8, true) !== 1 || bits !== 16) {
+                    throw new Error('Only 16-bit PCM WAV can be streamed');
+                }
+                format = {
+                    channels,
+                    sampleRate: view.getUint32(offset + 12, true),
+                    blockAlign: channels * 2
+                };
+            }
+            offset += 8 + size + (size % 2);
+        }
+        return null;
+    }
+
+    pcmToBuffer(bytes, format) {
+        const frames = bytes.length / format.blockAlign;
+        const audioBuffer = this.audioContext.createBuffer(format.channels, frames, format.sampleRate);
+        const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.length);
+        for (let ch = 0; ch < format.channels; ch++) {
+            const channel = audioBuffer.getChannelData(ch);
+            for (let i = 0; i < frames; i++) {
+                channel[i] = view.getInt16((i * format.channels + ch) * 2, true) / 32768;
+            }
+        }
+        return audioBuffer;
+    }
+
+    // --- Ogg Opus ---
+
+    async readOggOpus() {
+        let buffer = new Uint8Array(0);
+        let packet = [];  // Pieces of a packet that continues on the next page
+        this.opusPackets = 0;
+        this.opusTimestamp = 0;
+        for await (const chunk of this.chunks()) {
+            buffer = StreamingAudioPlayer.concat([buffer, chunk]);
+            let offset = 0;
+            // Ogg page: 27-byte header, segment table, then the segments
+            while (buffer.length - offset >= 27) {
+                if (String.fromCharCode(...buffer.subarray(offset, offset + 4)) !== 'OggS') {
+                    throw new Error('Lost Ogg page sync');
+                }
+                const segments = buffer[offset + 26];
+                const headerLength = 27 + segments;
+                if (buffer.length - offset < headerLength) break;
+                let bodyLength = 0;
+                for (let i = 0; i < segments; i++) bodyLength += buffer[offset + 27 + i];
+                if (buffer.length - offset < headerLength + bodyLength) break;
+
+                let position = offset + headerLength;
+                for (let i = 0; i < segments; i++) {
+                    const lacing = buffer[offset + 27 + i];
+                    packet.push(buffer.slice(position, position + lacing));
+                    position += lacing;
+                    if (lacing < 255) {
+                        this.onOpusPacket(StreamingAudioPlayer.concat(packet));
+                        packet = [];
+                    }
+                }
+                offset += headerLength + bodyLength;
+            }
+            buffer = buffer.slice(offset);
+        }
+        if (this.decoder && this.decoder.state === 'configured') {
+            await this.decoder.flush();
+        }
+    }
+
+    onOpusPacket(packet) {
+        if (this.stopped) return;
+        const index = this.opusPackets++;
+        if (index === 0) {
+            // OpusHead: configure the decoder for the stream's channel count
+            this.decoder = new AudioDecoder({
+                output: (audioData) => this.onAudioData(audioData),
+                error: (error) => console.error('Opus decode error:', error)
+            });
+            this.decoder.configure({
+                codec: 'opus',
+                sampleRate: 48000,
+                numberOfChannels: packet[9],
+                description: packet
+            });
+            return;
+        }
+        if (index === 1) return;  // OpusTags
+        this.decoder.decode(new EncodedAudioChunk({
+            type: 'key',
+            timestamp: this.opusTimestamp,
+            data: packet
+        }));
+        this.opusTimestamp += 20000;  // Microseconds; only used for ordering
+    }
+
+    onAudioData(audioData) {
+        if (this.stopped) {
+            audioData.close();
+            return;
+        }
+        const audioBuffer = this.audioContext.createBuffer(
+            audioData.numberOfChannels, audioData.numberOfFrames, audioData.sampleRate
+        );
+        for (let ch = 0; ch < audioData.numberOfChannels; ch++) {
+            const plane = new Float32Array(audioData.numberOfFrames);
+            audioData.copyTo(plane, { planeIndex: ch, format: 'f32-planar' });
+            audioBuffer.copyToChannel(plane, ch);
+        }
+        audioData.close();
+        this.enqueue(audioBuffer);
+    }
+
+    // --- Other formats ---
+
+    async readWhole() {
+        const parts = [];
+        for await (const chunk of this.chunks()) {
+            parts.push(chunk);
+        }
+        if (this.stopped || parts.length === 0) return;
+        const bytes = StreamingAudioPlayer.concat(parts);
+        this.enqueue(await this.audioContext.decodeAudioData(bytes.buffer));
+    }
+
+    static concat(parts) {
+        const total = parts.reduce((sum, part) => sum + part.length, 0);
+        const out = new Uint8Array(total);
+        let offset = 0;
+        for (const part of parts) {
+            out.set(part, offset);
+            offset += part.length;
+        }
+        return out;
+    }
+}
@@ -1,11 +1,26 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
 from fastapi import FastAPI, WebSocket
 from fastapi.responses import HTMLResponse
 import numpy as np
 import sounddevice as sd
 import queue, threading, asyncio
+from concurrent.futures import ThreadPoolExecutor
 from funasr import AutoModel
 from pathlib import Path
 import time
+import uuid
+import json
+from typing import Optional
+
+from shared.config import Config
+from shared.tracing import Tracer, TRACE_HEADER, new_trace_id
+from shared import local_services
+from shared.job_bus import JobBus, start_worker
+from shared.model_registry import ModelRegistry, parse_model_spec
+import base64
 
 # Silero VAD imports
 import torch
@@ -26,33 +41,276 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ✅ Load FunASR without VAD - let Silero handle VAD entirely
-model = AutoModel(
-    model="damo/speech_UniASR_asr_2pass-en-16k-common-vocab1080-tensorflow1-online",
-    model_revision="v2.0.4",
-    # Removed vad_model parameter - using only Silero VAD
-    disable_update=True
-)
+tracer = Tracer("asr")
+tracer.install_middleware(app)
+
+# One FunASR model per language, loaded when a session first asks for it
+ASR_MODELS = parse_model_spec(Config.ASR_MODELS)
+DEFAULT_LANGUAGE = next(iter(ASR_MODELS))
+asr_models = ModelRegistry("asr", Config.MODEL_RAM_BUDGET_MB)
+
+def load_asr_model(model_id: str):
+    model_name, _, revision = model_id.partition("@")
+    # ✅ Load FunASR without VAD - let Silero handle VAD entirely
+    return AutoModel(
+        model=model_name,
+        model_revision=revision or None,
+        # Removed vad_model parameter - using only Silero VAD
+        disable_update=True
+    )
+
+# The default language always loads at startup, so the first turn doesn't wait for a model
+preload = {language.strip() for language in Config.ASR_PRELOAD.split(",") if language.strip()}
+preload.add(DEFAULT_LANGUAGE)
+for language in sorted(preload - set(ASR_MODELS)):
+    print(f"Skipping ASR preload {language}: not in ASR_MODELS ({', '.join(ASR_MODELS)})")
+preload &= set(ASR_MODELS)
+for language, model_id in ASR_MODELS.items():
+    asr_models.register(language, lambda model_id=model_id: load_asr_model(model_id), pinned=language in preload)
+for language in preload:
+    asr_models.get(language)
+
+# ASR decoding gets its own worker so it never stalls the event loop (or, in the
+# all-in-one process, the orchestrator and TTS sharing that loop)
+asr_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="asr")
+# Final decodes queued or running on asr_executor; partials give way to them
+finals_pending = 0
+partial_stats = {"decoded": 0, "skipped": 0}
+
+def transcribe(speech_array, cache, language: str = DEFAULT_LANGUAGE):
+    # The first utterance in a language that isn't loaded yet waits for its model here
+    with asr_models.use(language) as model:
+        return model.generate(
+            input=speech_array,
+            cache=cache,
+            is_final=True,
+            encoder_chunk_look_back=4,
+            decoder_chunk_look_back=1,
+            segmentation="intelligent"  # Enable intelligent segmentation
+        )
+
+def transcribe_partial(speech_array, language: str = DEFAULT_LANGUAGE):
+    # Checked again on the ASR thread: a final queued behind this partial goes first
+    if finals_pending:
+        partial_stats["skipped"] += 1
+        return None
+    partial_stats["decoded"] += 1
+    return transcribe(speech_array, {}, language)
+
+async def decode(speech_array, cache, language: str = DEFAULT_LANGUAGE, partial: bool = False):
+    """Run one decode on asr_executor; speculative partials are dropped while a final is waiting"""
+    global finals_pending
+    loop = asyncio.get_running_loop()
+    if partial:
+        if finals_pending:
+            partial_stats["skipped"] += 1
+            return None
+        return await loop.run_in_executor(asr_executor, transcribe_partial, speech_array, language)
+    finals_pending += 1
+    try:
+        return await loop.run_in_executor(asr_executor, transcribe, speech_array, cache, language)
+    finally:
+        finals_pending -= 1
+
+# With JOB_TRANSPORT=redis the socket holder only runs VAD; decoding goes to any ASR worker
+job_bus = JobBus() if Config.JOB_TRANSPORT == "redis" else None
+job_worker = None
+
+async def run_asr_job(payload: dict) -> dict:
+    pcm = np.frombuffer(base64.b64decode(payload["audio"]), dtype=np.int16)
+    speech_array = pcm.astype(np.float32) / 32768.0
+    result = await decode(speech_array, {}, payload.get("language", DEFAULT_LANGUAGE), payload.get("partial", False))
+    text = result[0].get('text', '') if result else ''
+    return {"text": text}
+
+@app.on_event("startup")
+async def start_job_worker():
+    global job_worker
+    if job_bus is not None:
+        job_worker = start_worker(job_bus, "asr", run_asr_job, 1, tracer)
+
+async def run_transcription(speech_array, cache, session_id: str, trace_id: str, language: str = DEFAULT_LANGUAGE,
+                            partial: bool = False):
+    if job_bus is not None:
+        pcm = (np.clip(speech_array, -1.0, 1.0) * 32767).astype(np.int16)
+        result = await job_bus.call("asr", {
+            "session_id": session_id,
+            "audio": base64.b64encode(pcm.tobytes()).decode("ascii"),
+            "language": language,
+            "partial": partial
+        }, trace_id)
+        return [{"text": result["text"]}]
+    return await decode(speech_array, cache, language, partial)
+
+async def forward_partial(session_id: str, text: str):
+    """Share a partial transcript so the orchestrator can start a speculative reply"""
+    payload = {"session_id": session_id, "text": text}
+    local = local_services.get("chat.partial")
+    if local:
+        await local(payload)
+        return
+    import requests
+    await asyncio.to_thread(
+        requests.post, f"{Config.CHATBOT_SERVICE_URL}/chat/partial", json=payload, timeout=5
+    )
+
+async def send_partial(ws: WebSocket, session_id: str, speech_array, language: str = DEFAULT_LANGUAGE):
+    """Transcribe the speech so far and send it to the client and the orchestrator"""
+    try:
+        result = await run_transcription(speech_array, {}, session_id, None, language, partial=True)
+        text = result[0].get('text', '').strip() if result else ''
+        if not text:
+            return
+        await ws.send_json({
+            "type": "transcription",
+            "text": text,
+            "confidence": 1.0,
+            "final": False
+        })
+        await forward_partial(session_id, text)
+    except Exception as e:
+        print(f"❌ Partial transcription error: {e}")
+
+class ChatbotBusy(RuntimeError):
+    """The orchestrator shed this turn (HTTP 429)"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TurnCancelled(RuntimeError):
+    """The orchestrator dropped this turn because the student barged in (HTTP 409)"""
 
-def detect_speech_in_chunk(audio_data):
+async def forward_to_chat(session_id: str, text: str, trace_id: str, audio_format: Optional[str] = None) -> dict:
+    """Send the transcript to the orchestrator's /chat; raises RuntimeError on a non-200 reply"""
+    payload = {
+        "session_id": session_id,
+        "message": text,
+        "audio_format": audio_format  # The reply's speech is encoded so the client can play it
+    }
+    local = local_services.get("chat")
+    if local:
+        return await local(payload, trace_id)
+
+    import requests
+    chatbot_url = f"{Config.CHATBOT_SERVICE_URL}/chat"
+    # In a thread so the socket keeps receiving audio (and can barge in) while the teacher replies
+    resp = await asyncio.to_thread(
+        requests.post, chatbot_url, json=payload, headers={TRACE_HEADER: trace_id}, timeout=50
+    )
+    if resp.status_code == 429:
+        raise ChatbotBusy(resp.json().get("detail", "The teacher is busy"), float(resp.headers.get("Retry-After", 5)))
+    if resp.status_code == 409:
+        raise TurnCancelled(resp.json().get("detail", "Turn cancelled"))
+    if resp.status_code != 200:
+        raise RuntimeError(f"Chatbot service error: {resp.text}")
+    return resp.json()
+
+def speech_probability(audio_data) -> float:
     """
-    Use Silero VAD to detect speech in a chunk
+    Silero VAD speech probability for one chunk
     """
     try:
         # Ensure we have exactly 512 samples for 16kHz
         if len(audio_data) != 512:
-            return False
+            return 0.0
             
         audio_tensor = torch.from_numpy(audio_data).unsqueeze(0)
         
         # Get speech probability for the chunk
-        speech_probs = silero_vad_model(audio_tensor, 16000)
-        
-        # Return whether speech is detected (probability > threshold)
-        return speech_probs.item() > 0.5
+        return silero_vad_model(audio_tensor, 16000).item()
     except Exception as e:
         print(f"❌ Silero VAD error: {e}")
-        return False
+        return 0.0
+
+def detect_speech_in_chunk(audio_data, threshold: float = 0.5):
+    """
+    Use Silero VAD to detect speech in a chunk
+    """
+    # Return whether speech is detected (probability > threshold)
+    return speech_probability(audio_data) > threshold
+
+async def request_barge_in(session_id: str):
+    """Ask the orchestrator to cancel the reply being generated and spoken for this session"""
+    try:
+        local = local_services.get("chat.barge_in")
+        if local:
+            await local(session_id)
+            return
+        import requests
+        await asyncio.to_thread(
+            requests.post, f"{Config.CHATBOT_SERVICE_URL}/sessions/{session_id}/barge_in", timeout=5
+        )
+    except Exception as e:
+        print(f"❌ Barge-in request failed: {e}")
+
+async def handle_utterance(ws: WebSocket, session_id: str, speech_array, trace_id: str,
+                           language: str = DEFAULT_LANGUAGE, audio_format: Optional[str] = None):
+    """Transcribe a finished utterance, send it to the orchestrator and relay the reply"""
+    try:
+        print(f"[DEBUG] Processing {len(speech_array)/16000:.2f}s of audio")
+        
+        with tracer.span("asr.transcribe", trace_id, audio_s=len(speech_array) / 16000):
+            result = await run_transcription(speech_array, {}, session_id, trace_id, language)
+        
+        print(f"[DEBUG] ASR result: {result}")
+        
+        if result and isinstance(result, list) and len(result) > 0:
+            res = result[0]
+            text = res.get('text', '').strip()
+            if text:
+                print(f"🎯 Transcription: '{text}'")
+                await ws.send_json({
+                    "type": "transcription",
+                    "text": text,
+                    "confidence": 1.0,
+                    "final": True,
+                    "trace_id": trace_id
+                })
+                # Forward transcript to chatbot_service for inference
+                try:
+                    with tracer.span("asr.chat_forward", trace_id, session_id=session_id):
+                        ai_data = await forward_to_chat(session_id, text, trace_id, audio_format)
+                    await ws.send_json({
+                        "type": "ai_response",
+                        "text": ai_data.get("ai_response", ""),
+                        "emotion": ai_data.get("emotion", "default"),
+                        "continuation": ai_data.get("continuation"),
+                        "session_id": session_id,
+                        "trace_id": trace_id
+                    })
+                except ChatbotBusy as e:
+                    await ws.send_json({
+                        "type": "busy",
+                        "message": str(e),
+                        "retry_after": e.retry_after,
+                        "session_id": session_id
+                    })
+                except TurnCancelled:
+                    print(f"[DEBUG] Turn {trace_id} cancelled by barge-in")
+                except RuntimeError as e:
+                    await ws.send_json({
+                        "type": "error",
+                        "message": str(e),
+                        "session_id": session_id
+                    })
+                except Exception as e:
+                    await ws.send_json({
+                        "type": "error",
+                        "message": f"Failed to contact chatbot service: {str(e)}",
+                        "session_id": session_id
+                    })
+            else:
+                print("[DEBUG] Empty transcription")
+        
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"❌ ASR error: {e}")
+        await ws.send_json({
+            "type": "error",
+            "message": f"ASR error: {str(e)}"
+        })
 
 @app.get("/")
 async def get():
@@ -61,7 +319,13 @@ async def get():
 
 @app.get("/health")
 async def health_check():
-    return {"asr": "healthy", "vad": "silero"}
+    return {"asr": "healthy", "vad": "silero", "jobs": job_worker.stats if job_worker else None,
+            "languages": asr_models.keys(), "partials": partial_stats}
+
+@app.get("/models")
+async def model_stats():
+    """ASR models by language: residency, sizes and load times"""
+    return {"default_language": DEFAULT_LANGUAGE, **asr_models.snapshot()}
 
 @app.websocket("/ws/{session_id}")
 async def ws_endpoint(ws: WebSocket, session_id: str):
@@ -73,9 +337,15 @@ async def ws_endpoint(ws: WebSocket, session_id: str):
         return
 
     await ws.accept()
-    print(f"🔌 WebSocket connected for session: {session_id}")
-
-    cache = {}
+    # ?language= picks the ASR model for the session
+    language = ws.query_params.get("language", DEFAULT_LANGUAGE)
+    if language not in asr_models:
+        await ws.send_json({"type": "error", "message": f"Unsupported language: {language}"})
+        await ws.close()
+        return
+    # ?audio_format= is the encoding the browser can play, passed on for the teacher's replies
+    audio_format = ws.query_params.get("audio_format")
+    print(f"🔌 WebSocket connected for session: {session_id} ({language})")
 
     # Buffer for accumulating audio
     audio_buffer = []
@@ -85,12 +355,19 @@ async def ws_endpoint(ws: WebSocket, session_id: str):
     is_speaking = False
     silence_duration = 0
     speech_start_time = None
+    partial_task = None
+    partial_samples = 0
+    turn_task = None  # Transcription and reply for the last utterance, run off the receive loop
+    teacher_speaking = False  # Reported by the client while it plays the teacher's audio
+    interrupting = False  # Current speech would cut off the teacher but isn't confirmed yet
+    voiced_duration = 0
     
     # Configuration
     CHUNK_SIZE = 512  # Exactly 512 samples for 16kHz as required by Silero
     SILENCE_THRESHOLD = 2.0  # 1 second of silence to end speech
     MIN_SPEECH_DURATION = 0.0  # Allow any speech duration, even single words
     VAD_THRESHOLD = 0.5  # Speech probability threshold
+    PARTIAL_SAMPLES = int(Config.ASR_PARTIAL_INTERVAL * 16000)  # New audio between partial transcripts
     
     print("🎤 Waiting for audio from frontend...")
 
@@ -117,22 +394,38 @@ async def ws_endpoint(ws: WebSocket, session_id: str):
                         chunk = np.array(audio_buffer[:CHUNK_SIZE], dtype=np.float32)
                         audio_buffer = audio_buffer[CHUNK_SIZE:]
                         
-                        # Check for speech in this chunk
-                        has_speech = detect_speech_in_chunk(chunk)
+                        # Check for speech in this chunk. While the teacher is audible the
+                        # student has to be clearly louder than any echo left after the
+                        # browser's echo cancellation
+                        threshold = Config.BARGE_IN_VAD_THRESHOLD if teacher_speaking else VAD_THRESHOLD
+                        has_speech = detect_speech_in_chunk(chunk, threshold)
                         
                         if has_speech:
                             # Add to speech buffer
                             speech_buffer.extend(chunk)
+                            voiced_duration += len(chunk) / 16000.0
                             
                             if not is_speaking:
                                 is_speaking = True
                                 speech_start_time = time.time()
                                 silence_duration = 0
-                                print(f"🗣️ Speech started! (prob > {VAD_THRESHOLD})")
+                                voiced_duration = len(chunk) / 16000.0
+                                turn_running = turn_task is not None and not turn_task.done()
+                                interrupting = Config.FULL_DUPLEX and (teacher_speaking or turn_running)
+                                print(f"🗣️ Speech started! (prob > {threshold})")
                                 try:
                                     await ws.send_json({"type": "status", "message": "Speech detected"})
                                 except:
                                     break
+                            
+                            if interrupting and voiced_duration * 1000 >= Config.BARGE_IN_MIN_SPEECH_MS:
+                                # Sustained speech: the student is talking over the teacher
+                                interrupting = False
+                                print("✋ Barge-in: cancelling the current reply")
+                                if turn_task is not None and not turn_task.done():
+                                    turn_task.cancel()
+                                await ws.send_json({"type": "barge_in", "session_id": session_id})
+                                asyncio.create_task(request_barge_in(session_id))
                         else:
                             # No speech in this chunk
                             if is_speaking:
@@ -143,90 +436,66 @@ async def ws_endpoint(ws: WebSocket, session_id: str):
                                 # Check if we've had enough silence to end speech
                                 if silence_duration >= SILENCE_THRESHOLD:
                                     speech_duration = time.time() - speech_start_time
+                                    if partial_task is not None and not partial_task.done():
+                                        partial_task.cancel()
                                     
+                                    if interrupting:
+                                        # Too short to be a barge-in: most likely the teacher's
+                                        # own voice coming back through the microphone
+                                        print(f"🔇 Ignored {voiced_duration:.2f}s of speech during playback (echo)")
                                     # Only process if speech was long enough
-                                    if speech_duration >= MIN_SPEECH_DURATION:
+                                    elif speech_duration >= MIN_SPEECH_DURATION:
                                         print(f"🛑 Speech ended after {speech_duration:.2f}s, processing...")
+                                        # The turn's trace starts at the utterance endpoint
+                                        trace_id = new_trace_id()
+                                        tracer.record({
+                                            "trace_id": trace_id,
+                                            "span_id": uuid.uuid4().hex[:16],
+                                            "service": tracer.service,
+                                            "name": "asr.utterance",
+                                            "start": speech_start_time,
+                                            "duration_ms": speech_duration * 1000,
+                                            "attributes": {"session_id": session_id, "silence_s": SILENCE_THRESHOLD},
+                                        })
                                         
                                         # Process the accumulated speech
-                                        try:
-                                            speech_array = np.array(speech_buffer, dtype=np.float32)
-                                            print(f"[DEBUG] Processing {len(speech_array)/16000:.2f}s of audio")
-                                            
-                                            result = model.generate(
-                                                input=speech_array,
-                                                cache=cache,
-                                                is_final=True,
-                                                encoder_chunk_look_back=4,
-                                                decoder_chunk_look_back=1,
-                                                segmentation="intelligent"  # Enable intelligent segmentation
+                                        speech_array = np.array(speech_buffer, dtype=np.float32)
+                                        if Config.FULL_DUPLEX:
+                                            # Keep listening while the teacher thinks and talks
+                                            turn_task = asyncio.create_task(
+                                                handle_utterance(ws, session_id, speech_array, trace_id, language, audio_format)
                                             )
-                                            
-                                            print(f"[DEBUG] ASR result: {result}")
-                                            
-                                            if result and isinstance(result, list) and len(result) > 0:
-                                                res = result[0]
-                                                text = res.get('text', '').strip()
-                                                if text:
-                                                    print(f"🎯 Transcription: '{text}'")
-                                                    await ws.send_json({
-                                                        "type": "transcription",
-                                                        "text": text,
-                                                        "confidence": 1.0,
-                                                        "final": True
-                                                    })
-                                                    # Forward transcript to chatbot_service for inference
-                                                    try:
-                                                        import requests
-                                                        chatbot_url = "http://localhost:8001/chat"
-                                                        payload = {
-                                                            "session_id": session_id,
-                                                            "message": text
-                                                        }
-                                                        resp = requests.post(chatbot_url, json=payload, timeout=50)
-                                                        if resp.status_code == 200:
-                                                            ai_data = resp.json()
-                                                            await ws.send_json({
-                                                                "type": "ai_response",
-                                                                "text": ai_data.get("ai_response", ""),
-                                                                "emotion": ai_data.get("emotion", "default"),
-                                                                "session_id": session_id
-                                                            })
-                                                        else:
-                                                            await ws.send_json({
-                                                                "type": "error",
-                                                                "message": f"Chatbot service error: {resp.text}",
-                                                                "session_id": session_id
-                                                            })
-                                                    except Exception as e:
-                                                        await ws.send_json({
-                                                            "type": "error",
-                                                            "message": f"Failed to contact chatbot service: {str(e)}",
-                                                            "session_id": session_id
-                                                        })
-                                                else:
-                                                    print("[DEBUG] Empty transcription")
-                                            
-                                            # Clear cache for next utterance
-                                            cache = {}
-                                            
-                                        except Exception as e:
-                                            print(f"❌ ASR error: {e}")
-                                            await ws.send_json({
-                                                "type": "error",
-                                                "message": f"ASR error: {str(e)}"
-                                            })
+                                        else:
+                                            await handle_utterance(ws, session_id, speech_array, trace_id, language, audio_format)
                                     else:
                                         print(f"[DEBUG] Speech too short: {speech_duration:.2f}s")
                                     
                                     # Reset state
                                     is_speaking = False
+                                    interrupting = False
                                     speech_buffer = []
                                     silence_duration = 0
+                                    voiced_duration = 0
+                                    partial_samples = 0
+                        
+                        # Speculative generation: share the transcript so far while the student speaks,
+                        # including the trailing silence, when it stops changing
+                        if (Config.SPECULATIVE_GENERATION and is_speaking and not interrupting
+                                and len(speech_buffer) - partial_samples >= PARTIAL_SAMPLES
+                                and (partial_task is None or partial_task.done())):
+                            partial_samples = len(speech_buffer)
+                            partial_task = asyncio.create_task(
+                                send_partial(ws, session_id, np.array(speech_buffer, dtype=np.float32), language)
+                            )
                 
                 elif "text" in msg:
-                    # Handle text messages if needed
-                    pass
+                    # Control messages from the client
+                    try:
+                        control = json.loads(msg["text"])
+                    except ValueError:
+                        control = {}
+                    if control.get("type") == "playback":
+                        teacher_speaking = bool(control.get("speaking"))
 
             await asyncio.sleep(0.001)  # Small delay to prevent CPU spinning
 
@@ -237,6 +506,9 @@ async def ws_endpoint(ws: WebSocket, session_id: str):
         except:
             pass
     finally:
+        for task in (turn_task, partial_task):
+            if task is not None and not task.done():
+                task.cancel()
         try:
             await ws.close()
         except:
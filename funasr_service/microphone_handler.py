@@ -1,61 +1,156 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
 import sounddevice as sd
 import numpy as np
-from typing import Optional
+from typing import Callable, Optional
 import threading
-import queue
 import time
 
+from shared.ring_buffer import AudioRingBuffer
+
+def energy_vad(frame: np.ndarray, threshold: float = 0.01) -> bool:
+    """Cheap fallback VAD: RMS energy above a fixed threshold"""
+    return float(np.sqrt(np.mean(np.square(frame)))) > threshold
+
 class MicrophoneHandler:
-    def __init__(self, sample_rate: int = 16000, channels: int = 1):
+    def __init__(self, sample_rate: int = 16000, channels: int = 1, buffer_seconds: float = 30.0,
+                 frame_size: int = 512, vad: Optional[Callable[[np.ndarray], bool]] = None):
         self.sample_rate = sample_rate
         self.channels = channels
+        self.frame_size = frame_size  # 512 samples at 16 kHz is what Silero VAD expects
+        self.vad = vad or energy_vad
         self.is_recording = False
-        self.audio_queue = queue.Queue()
-        
+        # Filled straight from the callback; the only copy is into preallocated storage
+        self.ring = AudioRingBuffer(int(buffer_seconds * sample_rate), channels)
+        self._data_ready = threading.Condition()
+
     def start_continuous_recording(self):
         """Start continuous microphone recording"""
         def audio_callback(indata, frames, time, status):
             if status:
                 print(f"Audio callback status: {status}")
             if self.is_recording:
-                self.audio_queue.put(indata.copy())
-        
+                self.ring.write(indata, overwrite=True)
+                with self._data_ready:
+                    self._data_ready.notify_all()
+
+        self.ring.clear()
         self.is_recording = True
         self.stream = sd.InputStream(
             callback=audio_callback,
             channels=self.channels,
             samplerate=self.sample_rate,
-            blocksize=1024
+            dtype='float32',
+            blocksize=self.frame_size
         )
         self.stream.start()
-    
+
     def stop_recording(self):
         """Stop continuous recording"""
         self.is_recording = False
+        with self._data_ready:
+            self._data_ready.notify_all()
         if hasattr(self, 'stream'):
             self.stream.stop()
             self.stream.close()
-    
+
+    def _wait_for(self, position: int, deadline: float) -> bool:
+        """Block until the ring buffer has been written up to position"""
+        while self.ring.write_position < position:
+            remaining = deadline - time.time()
+            if remaining <= 0 or not self.is_recording:
+                return False
+            with self._data_ready:
+                self._data_ready.wait(timeout=min(remaining, 0.1))
+        return True
+
     def get_audio_chunk(self, duration: float = 3.0) -> Optional[np.ndarray]:
-        """Get audio chunk of specified duration"""
+        """Get audio chunk of specified duration, picking up where the previous chunk ended"""
         if not self.is_recording:
             return None
-            
-        audio_data = []
+
         samples_needed = int(duration * self.sample_rate)
-        samples_collected = 0
-        
-        start_time = time.time()
         timeout = duration + 2.0  # 2 second timeout buffer
-        
-        while samples_collected < samples_needed and (time.time() - start_time) < timeout:
+
+        # The read position only moves past unread audio when the ring overruns
+        self._wait_for(self.ring.read_position + samples_needed, time.time() + timeout)
+        chunk = np.empty((min(samples_needed, self.ring.available), self.channels), dtype=np.float32)
+        count = self.ring.read_into(chunk)
+        if count > 0:
+            return chunk[:count]
+        return None
+
+    def _frame(self, position: int) -> np.ndarray:
+        first, second = self.ring.views(position, self.frame_size)
+        if len(second) == 0:
+            return first[:, 0]  # zero-copy view into the ring buffer
+        return np.concatenate([first, second])[:, 0]
+
+    def get_utterance(self, timeout: float = 10.0, silence_duration: float = 0.8,
+                      min_speech_duration: float = 0.2, pre_roll: float = 0.3,
+                      max_duration: float = 20.0) -> Optional[np.ndarray]:
+        """Wait for speech and return the utterance as soon as trailing silence ends it.
+
+        Returns None if nobody starts speaking within timeout.
+        """
+        if not self.is_recording:
+            return None
+
+        silence_frames_needed = max(1, int(silence_duration * self.sample_rate / self.frame_size))
+        min_speech_frames = max(1, int(min_speech_duration * self.sample_rate / self.frame_size))
+        max_frames = int(max_duration * self.sample_rate / self.frame_size)
+        pre_roll_samples = int(pre_roll * self.sample_rate)
+
+        cursor = self.ring.write_position
+        speech_start = None
+        speech_frames = 0
+        silent_frames = 0
+        wait_deadline = time.time() + timeout
+
+        while self.is_recording:
+            if not self._wait_for(cursor + self.frame_size, wait_deadline if speech_start is None else time.time() + 1.0):
+                if speech_start is None:
+                    return None
+                break
+
             try:
-                chunk = self.audio_queue.get(timeout=0.1)
-                audio_data.append(chunk)
-                samples_collected += len(chunk)
-            except queue.Empty:
+                has_speech = self.vad(self._frame(cursor))
+            except IndexError:
+                # Fell more than a buffer behind; resync to live audio
+                cursor = self.ring.write_position
+                speech_start = None
                 continue
-        
-        if audio_data:
-            return np.concatenate(audio_data, axis=0)[:samples_needed]
-        return None
+            cursor += self.frame_size
+
+            if speech_start is None:
+                if has_speech:
+                    speech_start = max(cursor - self.frame_size - pre_roll_samples,
+                                       self.ring.write_position - self.ring.capacity)
+                    speech_frames = 1
+                    silent_frames = 0
+                continue
+
+            if has_speech:
+                speech_frames += 1
+                silent_frames = 0
+            else:
+                silent_frames += 1
+
+            frames_so_far = (cursor - speech_start) // self.frame_size
+            if silent_frames >= silence_frames_needed or frames_so_far >= max_frames:
+                if speech_frames < min_speech_frames:
+                    # Too short to be speech (a click or cough); keep listening
+                    speech_start = None
+                    continue
+                break
+
+        if speech_start is None:
+            return None
+        # Trim most of the trailing silence but keep a short tail
+        end = cursor - max(0, silent_frames - 2) * self.frame_size
+        utterance = self.ring.copy_range(speech_start, end - speech_start)[:, 0]
+        # Chunk reads continue after the utterance instead of returning it again
+        self.ring.discard(cursor - self.ring.read_position)
+        return utterance
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+
+class SentenceAudioCache:
+    """Synthesized sentence waveforms on disk, keyed by text, speed and voice.
+
+    Sentences are cached before encoding, so every output format and both the
+    file and streaming paths share an entry. When the directory grows past
+    max_bytes the least recently used files are deleted.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(entry.stat().st_size for entry in os.scandir(cache_dir) if entry.name.endswith(".npy"))
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+
+    @staticmethod
+    def key(text: str, speed: float, voice_digest: Optional[str] = None, language: str = "English") -> str:
+        """voice_digest identifies the reference clip, so re-registering a voice id misses the old audio"""
+        payload = json.dumps([text, round(speed, 2), voice_digest or "", language])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        path = self._path(key)
+        try:
+            audio = np.load(path)
+            os.utime(path)  # Recently used, for eviction
+        except (OSError, ValueError):
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return audio
+
+    def contains(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def put(self, key: str, audio: np.ndarray):
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(audio, dtype=np.float32))
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._size += size
+            self.stats["stored"] += 1
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = sorted(
+            (entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".npy")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        # Down to 90% so a full cache doesn't rescan on every write
+        target = self.max_bytes * 0.9
+        self._size = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self._size <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            self._size -= size
+            self.stats["evicted"] += 1
+
+    def snapshot(self) -> dict:
+        return {"dir": self.cache_dir, "bytes": self._size, "max_bytes": self.max_bytes, **self.stats}
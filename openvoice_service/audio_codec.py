@@ -0,0 +1,172 @@
+import io
+import struct
+from math import gcd
+from typing import Iterator, Optional
+
+import numpy as np
+import soundfile as sf
+from scipy.signal import resample_poly
+
+# Output formats the TTS service can negotiate.
+# key -> (libsndfile format, subtype, media type, file extension, forced sample rate)
+AUDIO_FORMATS = {
+    "wav": ("WAV", "PCM_16", "audio/wav", "wav", None),
+    "flac": ("FLAC", "PCM_16", "audio/flac", "flac", None),
+    "ogg": ("OGG", "VORBIS", "audio/ogg", "ogg", None),
+    # Opus only supports 8/12/16/24/48 kHz, OpenVoice outputs 22.05 kHz
+    "opus": ("OGG", "OPUS", "audio/ogg; codecs=opus", "ogg", 24000),
+}
+
+DEFAULT_FORMAT = "wav"
+
+# Accept header media types -> format key
+_MEDIA_TYPE_FORMATS = {
+    "audio/wav": "wav",
+    "audio/wave": "wav",
+    "audio/x-wav": "wav",
+    "audio/flac": "flac",
+    "audio/x-flac": "flac",
+    "audio/ogg": "ogg",
+    "audio/opus": "opus",
+}
+
+def negotiate_format(requested: Optional[str] = None, accept_header: Optional[str] = None) -> str:
+    """Pick an output format from an explicit request field or an Accept header"""
+    if requested:
+        key = requested.lower().strip()
+        if key not in AUDIO_FORMATS:
+            raise ValueError(f"Unsupported audio format: {requested}")
+        return key
+
+    if not accept_header:
+        return DEFAULT_FORMAT
+
+    candidates = []
+    for position, part in enumerate(accept_header.split(",")):
+        params = [p.strip() for p in part.split(";")]
+        media_type = params[0].lower()
+        quality = 1.0
+        codecs = ""
+        for param in params[1:]:
+            name, _, value = param.partition("=")
+            name = name.strip().lower()
+            value = value.strip().strip('"').lower()
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+            elif name == "codecs":
+                codecs = value
+
+        key = _MEDIA_TYPE_FORMATS.get(media_type)
+        if media_type == "audio/ogg" and codecs == "opus":
+            key = "opus"
+        if key and quality > 0:
+            # Highest quality first, header order breaks ties
+            candidates.append((-quality, position, key))
+
+    if not candidates:
+        return DEFAULT_FORMAT
+    return sorted(candidates)[0][2]
+
+def media_type_for(fmt: str) -> str:
+    return AUDIO_FORMATS[fmt][2]
+
+def extension_for(fmt: str) -> str:
+    return AUDIO_FORMATS[fmt][3]
+
+def resample(audio: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    if src_rate == dst_rate:
+        return audio
+    factor = gcd(src_rate, dst_rate)
+    return resample_poly(audio, dst_rate // factor, src_rate // factor).astype(np.float32)
+
+def _wav_stream_header(sample_rate: int, channels: int = 1, bits: int = 16) -> bytes:
+    """RIFF header with unknown (max) sizes so a WAV can be streamed before its length is known"""
+    byte_rate = sample_rate * channels * bits // 8
+    block_align = channels * bits // 8
+    return (
+        b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate, block_align, bits)
+        + b"data" + struct.pack("<I", 0xFFFFFFFF)
+    )
+
+def _to_pcm16(audio: np.ndarray) -> bytes:
+    return (np.clip(audio, -1.0, 1.0) * 32767.0).astype("<i2").tobytes()
+
+class StreamingEncoder:
+    """Incremental encoder: feed float32 blocks, get encoded bytes back as soon as they exist"""
+
+    def __init__(self, fmt: str, sample_rate: int):
+        sf_format, subtype, _, _, forced_rate = AUDIO_FORMATS[fmt]
+        self.fmt = fmt
+        self.input_rate = sample_rate
+        self.sample_rate = forced_rate or sample_rate
+        self._header_sent = False
+        self._buffer = None
+        self._file = None
+        self._sent = 0
+
+        if fmt != "wav":
+            self._buffer = io.BytesIO()
+            self._file = sf.SoundFile(
+                self._buffer, mode="w", samplerate=self.sample_rate,
+                channels=1, format=sf_format, subtype=subtype
+            )
+
+    def _drain(self) -> bytes:
+        # Only hand out bytes past what was already sent; encoders that seek back to
+        # patch their header on close leave the streamed (length-less) header valid
+        data = self._buffer.getvalue()
+        if len(data) <= self._sent:
+            return b""
+        chunk = data[self._sent:]
+        self._sent = len(data)
+        return chunk
+
+    def encode(self, audio: np.ndarray) -> bytes:
+        audio = resample(np.asarray(audio, dtype=np.float32), self.input_rate, self.sample_rate)
+        if self._file is None:
+            out = b""
+            if not self._header_sent:
+                out = _wav_stream_header(self.sample_rate)
+                self._header_sent = True
+            return out + _to_pcm16(audio)
+
+        self._file.write(audio)
+        self._file.flush()
+        return self._drain()
+
+    def finish(self) -> bytes:
+        if self._file is None:
+            if not self._header_sent:
+                self._header_sent = True
+                return _wav_stream_header(self.sample_rate)
+            return b""
+        self._file.close()
+        return self._drain()
+
+def iter_encoded(audio: np.ndarray, sample_rate: int, fmt: str, block_seconds: float = 0.5) -> Iterator[bytes]:
+    """Encode a waveform block by block, yielding bytes as the encoder produces them"""
+    # Resample once up front so block edges don't pick up filter artifacts
+    target_rate = AUDIO_FORMATS[fmt][4] or sample_rate
+    audio = resample(np.asarray(audio, dtype=np.float32), sample_rate, target_rate)
+    encoder = StreamingEncoder(fmt, target_rate)
+    block = max(1, int(target_rate * block_seconds))
+    for start in range(0, len(audio), block):
+        chunk = encoder.encode(audio[start:start + block])
+        if chunk:
+            yield chunk
+    tail = encoder.finish()
+    if tail:
+        yield tail
+
+def encode_audio(audio: np.ndarray, sample_rate: int, fmt: str) -> bytes:
+    """Encode a complete waveform to a self-contained file in the given format"""
+    sf_format, subtype, _, _, forced_rate = AUDIO_FORMATS[fmt]
+    target_rate = forced_rate or sample_rate
+    audio = resample(np.asarray(audio, dtype=np.float32), sample_rate, target_rate)
+    buffer = io.BytesIO()
+    sf.write(buffer, audio, target_rate, format=sf_format, subtype=subtype)
+    return buffer.getvalue()
@@ -1,65 +1,171 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
 import sounddevice as sd
 import numpy as np
 import threading
-import queue
-from typing import Optional, Iterator
 import time
+from typing import Optional
+
+from shared.ring_buffer import AudioRingBuffer
 
 class AudioStreamer:
-    def __init__(self, sample_rate: int = 22050):
+    """Gapless local playback: one persistent callback output stream fed from a ring buffer"""
+
+    def __init__(self, sample_rate: int = 22050, buffer_seconds: float = 30.0,
+                 blocksize: int = 256, fade_ms: float = 3.0):
         self.sample_rate = sample_rate
-        self.audio_queue = queue.Queue()
+        self.blocksize = blocksize
+        self.ring = AudioRingBuffer(int(sample_rate * buffer_seconds))
         self.is_playing = False
         self.current_session = None
-        self._stop_event = threading.Event()
-        
+        self.stream: Optional[sd.OutputStream] = None
+
+        self._fade = np.linspace(1.0, 0.0, max(1, int(sample_rate * fade_ms / 1000)), dtype=np.float32)
+        self._state_lock = threading.Lock()
+        self._space_available = threading.Condition()
+        self._stop_at: Optional[int] = None  # session frame at which output is cut
+        self._input_finished = False
+
+        # Position bookkeeping, all in frames of the current session
+        self._frames_played = 0
+        self._block_start_frames = 0
+        self._block_frames = 0
+        self._block_dac_time = 0.0
+
+        # Underrun accounting
+        self.underruns = 0  # callbacks that ran dry while more audio was expected
+        self.underrun_frames = 0  # silence inserted because of those
+        self.device_underflows = 0  # underflows reported by PortAudio itself
+
+    def _ensure_stream(self):
+        if self.stream is None:
+            self.stream = sd.OutputStream(
+                samplerate=self.sample_rate,
+                channels=1,
+                dtype='float32',
+                blocksize=self.blocksize,
+                latency='low',
+                callback=self._callback
+            )
+            self.stream.start()
+
     def start_streaming(self, session_id: str):
         """Start audio streaming for a session"""
-        self.current_session = session_id
-        self.is_playing = True
-        self._stop_event.clear()
-        
-        # Start playback thread
-        playback_thread = threading.Thread(
-            target=self._playback_worker,
-            args=(session_id,),
-            daemon=True
-        )
-        playback_thread.start()
-        
-    def add_audio_chunk(self, audio_chunk: np.ndarray):
-        """Add audio chunk to playback queue"""
-        if self.is_playing:
-            self.audio_queue.put(audio_chunk)
-    
-    def stop_streaming(self):
-        """Stop current audio streaming"""
-        self.is_playing = False
-        self._stop_event.set()
-        # Clear remaining audio chunks
-        while not self.audio_queue.empty():
-            try:
-                self.audio_queue.get_nowait()
-            except queue.Empty:
-                break
-    
+        with self._state_lock:
+            self.ring.clear()
+            self.current_session = session_id
+            self._stop_at = None
+            self._input_finished = False
+            self._frames_played = 0
+            self._block_start_frames = 0
+            self._block_frames = 0
+            self.is_playing = True
+        self._ensure_stream()
+
+    def add_audio_chunk(self, audio_chunk: np.ndarray, timeout: Optional[float] = None) -> bool:
+        """Queue audio for playback, waiting for buffer space; False if playback stopped first"""
+        if audio_chunk is None:
+            return False
+        audio_chunk = np.asarray(audio_chunk, dtype=np.float32).reshape(-1)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        offset = 0
+        while offset < len(audio_chunk):
+            if not self.is_playing:
+                return False
+            offset += self.ring.write(audio_chunk[offset:])
+            if offset < len(audio_chunk):
+                # Buffer full: the callback notifies as it drains
+                with self._space_available:
+                    self._space_available.wait(timeout=0.05)
+                if deadline is not None and time.monotonic() > deadline:
+                    return False
+        return True
+
+    def finish_input(self):
+        """Mark the end of the current utterance so the drained buffer isn't counted as an underrun"""
+        self._input_finished = True
+
+    def stop_streaming(self, at_seconds: Optional[float] = None):
+        """Stop playback now, or at an exact position of the current session (e.g. a word boundary)"""
+        with self._state_lock:
+            if at_seconds is None:
+                # Cut at the next sample the device asks for
+                self._stop_at = self._frames_played
+                self.is_playing = False
+                self.ring.clear()
+            else:
+                self._stop_at = max(self._frames_played, int(at_seconds * self.sample_rate))
+        with self._space_available:
+            self._space_available.notify_all()
+
     def is_currently_speaking(self) -> bool:
         """Check if currently playing audio"""
-        return self.is_playing and not self.audio_queue.empty()
-    
-    def _playback_worker(self, session_id: str):
-        """Worker thread for audio playback"""
-        while self.is_playing and not self._stop_event.is_set():
-            try:
-                audio_chunk = self.audio_queue.get(timeout=0.1)
-                if audio_chunk is not None:
-                    # Play audio chunk
-                    sd.play(audio_chunk, samplerate=self.sample_rate)
-                    sd.wait()  # Wait for playback to complete
-            except queue.Empty:
-                continue
-            except Exception as e:
-                print(f"Playback error: {e}")
-                break
-        
-        self.is_playing = False
+        return self.is_playing and self.ring.available > 0
+
+    def get_playback_position(self) -> float:
+        """Seconds of the current session that have actually reached the speaker"""
+        with self._state_lock:
+            start, frames, dac_time = self._block_start_frames, self._block_frames, self._block_dac_time
+        position = start
+        if self.stream is not None and frames:
+            # Interpolate inside the block currently being played by the DAC
+            elapsed = int((self.stream.time - dac_time) * self.sample_rate)
+            position += min(max(elapsed, 0), frames)
+        return position / self.sample_rate
+
+    def get_stats(self) -> dict:
+        return {
+            "session_id": self.current_session,
+            "is_playing": self.is_playing,
+            "buffered_seconds": self.ring.available / self.sample_rate,
+            "position_seconds": self.get_playback_position(),
+            "underruns": self.underruns,
+            "underrun_seconds": self.underrun_frames / self.sample_rate,
+            "device_underflows": self.device_underflows
+        }
+
+    def close(self):
+        self.stop_streaming()
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+
+    def _callback(self, outdata, frames, time_info, status):
+        if status.output_underflow:
+            self.device_underflows += 1
+
+        with self._state_lock:
+            limit = frames
+            if self._stop_at is not None:
+                limit = min(frames, max(0, self._stop_at - self._frames_played))
+
+            filled = self.ring.read_into(outdata[:limit]) if self.is_playing else 0
+            outdata[filled:] = 0
+
+            if self._stop_at is not None and self._frames_played + filled >= self._stop_at:
+                # Stop lands inside this block: fade the last few samples to avoid a click
+                fade_len = min(len(self._fade), filled)
+                if fade_len:
+                    outdata[filled - fade_len:filled, 0] *= self._fade[len(self._fade) - fade_len:]
+                self.is_playing = False
+                self.ring.clear()
+            elif filled < frames and self.is_playing:
+                if self._input_finished:
+                    # Utterance fully played out
+                    if self.ring.available == 0:
+                        self.is_playing = False
+                elif self._frames_played + filled > 0:
+                    # Ran dry mid-utterance (waiting for the first chunk doesn't count)
+                    self.underruns += 1
+                    self.underrun_frames += frames - filled
+
+            self._block_start_frames = self._frames_played
+            self._block_frames = filled
+            self._block_dac_time = time_info.outputBufferDacTime
+            self._frames_played += filled
+
+        with self._space_available:
+            self._space_available.notify_all()
@@ -0,0 +1,74 @@
+"""Compare real-time factor of the TTS CPU inference profiles.
+
+Each profile runs in its own process because quantization and thread settings
+are applied when tts_server loads its models.
+
+    python benchmark_rtf.py --runs 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+DEFAULT_TEXT = (
+    "Photosynthesis is the process plants use to turn light into chemical energy. "
+    "It takes place in the chloroplasts. Let's look at each step together."
+)
+
+def run_profile(text: str, runs: int):
+    # Imported here so the profile env var is read by Config before models load
+    import tts_server
+    from inference_profile import measure_rtf
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(tts_server.warmup_models())
+
+    def synthesize(sample_text):
+        return loop.run_until_complete(tts_server.synthesize_audio(sample_text, "default", use_cache=False))
+
+    result = measure_rtf(synthesize, tts_server.get_sample_rate(), text, runs=runs)
+    result["device"] = tts_server.device
+    result["cpu_profile"] = tts_server.cpu_profile
+    print("RESULT " + json.dumps(result))
+
+def main():
+    parser = argparse.ArgumentParser(description="TTS CPU profile RTF benchmark")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--text", default=DEFAULT_TEXT)
+    parser.add_argument("--profiles", default="quality,speed")
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--run-profile", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_profile:
+        run_profile(args.text, args.runs)
+        return
+
+    results = {}
+    for profile in args.profiles.split(","):
+        env = dict(os.environ, TTS_CPU_PROFILE=profile, TTS_NUM_THREADS=str(args.threads))
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run-profile", profile,
+             "--runs", str(args.runs), "--text", args.text],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+            capture_output=True, text=True
+        )
+        lines = [line for line in proc.stdout.splitlines() if line.startswith("RESULT ")]
+        if proc.returncode != 0 or not lines:
+            print(f"Profile '{profile}' failed:\n{proc.stderr[-2000:]}")
+            continue
+        results[profile] = json.loads(lines[-1][len("RESULT "):])
+
+    print(f"\n{'profile':<10} {'device':<6} {'threads':>7} {'synth s':>9} {'audio s':>9} {'RTF':>7}")
+    for profile, result in results.items():
+        threads = (result.get("cpu_profile") or {}).get("threads", "-")
+        print(f"{profile:<10} {result['device']:<6} {threads:>7} {result['mean_seconds']:>9.3f} "
+              f"{result['audio_seconds']:>9.2f} {result['rtf']:>7.3f}")
+    if "quality" in results and "speed" in results:
+        print(f"\nSpeed profile RTF gain: {results['quality']['rtf'] / results['speed']['rtf']:.2f}x")
+
+if __name__ == "__main__":
+    main()
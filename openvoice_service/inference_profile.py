@@ -0,0 +1,74 @@
+import os
+import time
+
+import torch
+
+PROFILES = ("quality", "speed")
+
+def configure_cpu_threads(num_threads: int = 0) -> int:
+    """Pin torch intra-op threads for this worker; 0 means one thread per available core"""
+    if num_threads <= 0:
+        num_threads = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    torch.set_num_threads(num_threads)
+    try:
+        # Inter-op parallelism only adds contention for a single inference thread
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Can only be set before any parallel work has run
+        pass
+    return num_threads
+
+def _remove_weight_norm(model) -> bool:
+    """Fold weight norm into the decoder weights so it isn't recomputed on every forward"""
+    decoder = getattr(model, "dec", None)
+    if decoder is None or not hasattr(decoder, "remove_weight_norm"):
+        return False
+    try:
+        decoder.remove_weight_norm()
+        return True
+    except ValueError:
+        # Already removed
+        return False
+
+def quantize_model(model):
+    """Dynamic int8 quantization of the layer types PyTorch supports without calibration.
+
+    VITS is mostly Conv1d, which dynamic quantization leaves in float32, so this only
+    touches the Linear and GRU layers (e.g. the converter's reference encoder).
+    """
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear, torch.nn.GRU}, dtype=torch.qint8)
+
+def apply_cpu_profile(profile: str, tts_model, converter=None, num_threads: int = 0) -> dict:
+    """Tune the loaded OpenVoice models for CPU inference and report what was applied"""
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown TTS CPU profile: {profile} (expected one of {PROFILES})")
+
+    applied = {"profile": profile, "threads": configure_cpu_threads(num_threads), "quantized": [], "weight_norm_removed": []}
+    if profile != "speed":
+        return applied
+
+    for name, wrapper in (("base_speaker", tts_model), ("tone_converter", converter)):
+        if wrapper is None:
+            continue
+        if _remove_weight_norm(wrapper.model):
+            applied["weight_norm_removed"].append(name)
+        wrapper.model = quantize_model(wrapper.model)
+        applied["quantized"].append(name)
+    return applied
+
+def measure_rtf(synthesize, sample_rate: int, text: str, runs: int = 3) -> dict:
+    """Real-time factor of a synchronous synthesize(text) -> waveform callable"""
+    timings = []
+    audio_seconds = 0.0
+    for _ in range(runs):
+        start = time.perf_counter()
+        audio = synthesize(text)
+        timings.append(time.perf_counter() - start)
+        audio_seconds = len(audio) / sample_rate
+    mean_time = sum(timings) / len(timings)
+    return {
+        "runs": runs,
+        "mean_seconds": mean_time,
+        "audio_seconds": audio_seconds,
+        "rtf": mean_time / audio_seconds if audio_seconds else float("inf")
+    }
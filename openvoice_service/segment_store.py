@@ -0,0 +1,197 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+class Utterance:
+    """The sentences of one answer as it was split for synthesis, with their audio once ready"""
+
+    def __init__(self, session_id: str, texts: List[str], speed: float, voice: Optional[str], sample_rate: int,
+                 language: str = "EN"):
+        self.session_id = session_id
+        self.texts = texts
+        self.speed = speed
+        self.voice = voice
+        self.language = language
+        self.sample_rate = sample_rate
+        self.audio: List[Optional[np.ndarray]] = [None] * len(texts)
+        # Seconds each sentence takes to play, including the pause after it; kept after eviction
+        self.durations: List[Optional[float]] = [None] * len(texts)
+        self.created_at = time.time()
+        self.first_audio_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self.last_used = time.monotonic()
+
+    @property
+    def gap_seconds(self) -> float:
+        # Same inter-sentence pause BaseSpeakerTTS.audio_numpy_concat inserts
+        return 0.05 / self.speed
+
+    @property
+    def nbytes(self) -> int:
+        return sum(audio.nbytes for audio in self.audio if audio is not None)
+
+    def estimated_position(self) -> float:
+        """Where playback probably was when the utterance was stopped, if the client never says"""
+        if self.first_audio_at is None:
+            return 0.0
+        return max(0.0, (self.stopped_at or time.time()) - self.first_audio_at)
+
+    def resume_index(self, played_seconds: float) -> int:
+        """First sentence that wasn't heard to the end; playback restarts at its beginning"""
+        elapsed = 0.0
+        for index, duration in enumerate(self.durations):
+            # A sentence that was never synthesized can't have been played
+            if duration is None:
+                return index
+            elapsed += duration
+            if elapsed > played_seconds:
+                return index
+        return len(self.texts)
+
+    def describe(self, played_seconds: Optional[float] = None) -> dict:
+        if played_seconds is None:
+            played_seconds = self.estimated_position()
+        start = self.resume_index(played_seconds)
+        known = [d for d in self.durations[start:] if d is not None]
+        return {
+            "sentences": len(self.texts),
+            "from_sentence": start,
+            "played_seconds": round(played_seconds, 2),
+            "remaining_seconds": round(sum(known), 2),
+            "text": " ".join(self.texts),
+            "remaining_text": " ".join(self.texts[start:]),
+            "in_memory": sum(audio is not None for audio in self.audio[start:]),
+        }
+
+class SegmentStore:
+    """Sentence audio of each session's latest answer, so an interrupted one can be resumed.
+
+    Every answer synthesized for a session is remembered sentence by sentence as
+    the batcher finishes it. /stop moves the answer that may still be playing to
+    the session's interrupted slot, where the reply to the interruption can't
+    replace it. Resuming replays the sentences after the playback offset from
+    here instead of running the model. Past max_bytes the audio of the least
+    recently used answers is dropped. The sentence texts and durations stay, so
+    a resume can still be served from the sentence audio cache.
+    """
+
+    def __init__(self, max_bytes: int, max_sessions: int = 1000, grace_seconds: float = 3.0):
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+        # Playback of a fully synthesized answer counts as finished this long after its audio runs out
+        self.grace_seconds = grace_seconds
+        self._current: "OrderedDict[str, Utterance]" = OrderedDict()
+        self._interrupted: "OrderedDict[str, Utterance]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.stats = {"utterances": 0, "interrupted": 0, "resumed": 0, "evicted": 0}
+
+    def begin(self, session_id: str, texts: List[str], speed: float, voice: Optional[str],
+              sample_rate: int, segments: List[asyncio.Future], language: str = "EN") -> Utterance:
+        """Remember a new answer for the session; each future's audio is kept as it completes"""
+        utterance = Utterance(session_id, texts, speed, voice, sample_rate, language)
+        with self._lock:
+            self._replace(self._current, session_id, utterance)
+            self.stats["utterances"] += 1
+        for index, segment in enumerate(segments):
+            segment.add_done_callback(lambda future, index=index: self._segment_done(utterance, index, future))
+        return utterance
+
+    def _segment_done(self, utterance: Utterance, index: int, future: asyncio.Future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.add(utterance, index, future.result())
+
+    def add(self, utterance: Utterance, index: int, audio: np.ndarray):
+        audio = np.asarray(audio, dtype=np.float32)
+        with self._lock:
+            if utterance.first_audio_at is None:
+                utterance.first_audio_at = time.time()
+            utterance.durations[index] = len(audio) / utterance.sample_rate + utterance.gap_seconds
+            if self._is_stored(utterance):
+                if utterance.audio[index] is not None:
+                    self._bytes -= utterance.audio[index].nbytes
+                utterance.audio[index] = audio
+                self._bytes += audio.nbytes
+                self._evict()
+            else:
+                utterance.audio[index] = audio
+
+    def _is_stored(self, utterance: Utterance) -> bool:
+        return (self._current.get(utterance.session_id) is utterance
+                or self._interrupted.get(utterance.session_id) is utterance)
+
+    def _replace(self, slots: "OrderedDict[str, Utterance]", session_id: str, utterance: Optional[Utterance]):
+        previous = slots.pop(session_id, None)
+        if previous is not None and not self._is_stored(previous):
+            self._bytes -= previous.nbytes
+        if utterance is not None:
+            slots[session_id] = utterance
+            self._bytes += utterance.nbytes
+            while len(slots) > self.max_sessions:
+                _, dropped = slots.popitem(last=False)
+                if not self._is_stored(dropped):
+                    self._bytes -= dropped.nbytes
+            self._evict()
+
+    def _evict(self):
+        if self._bytes <= self.max_bytes:
+            return
+        stored = {id(u): u for u in list(self._current.values()) + list(self._interrupted.values())}
+        for utterance in sorted(stored.values(), key=lambda u: u.last_used):
+            if self._bytes <= self.max_bytes:
+                break
+            if utterance.nbytes:
+                self._bytes -= utterance.nbytes
+                utterance.audio = [None] * len(utterance.texts)
+                self.stats["evicted"] += 1
+
+    def interrupt(self, session_id: str) -> Optional[dict]:
+        """Playback of the session's answer was cut off; keep it for a resume if it may still have been playing"""
+        with self._lock:
+            now = time.time()
+            utterance = self._current.get(session_id)
+            if utterance is None:
+                # Stopped twice for the same cut (the client and the orchestrator both call /stop)
+                recent = self._interrupted.get(session_id)
+                if recent is not None and recent.stopped_at and now - recent.stopped_at < self.grace_seconds:
+                    return recent.describe()
+                return None
+            synthesized = all(duration is not None for duration in utterance.durations)
+            if synthesized and utterance.first_audio_at is not None:
+                if now > utterance.first_audio_at + sum(utterance.durations) + self.grace_seconds:
+                    return None  # Finished playing a while ago
+            utterance.stopped_at = now
+            utterance.last_used = time.monotonic()
+            self._current.pop(session_id)
+            self._bytes -= utterance.nbytes  # Counted again in its new slot
+            self._replace(self._interrupted, session_id, utterance)
+            self.stats["interrupted"] += 1
+            return utterance.describe()
+
+    def interrupted(self, session_id: str) -> Optional[Utterance]:
+        with self._lock:
+            return self._interrupted.get(session_id)
+
+    def take_interrupted(self, session_id: str) -> Optional[Utterance]:
+        """Hand over the interrupted answer for a resume"""
+        with self._lock:
+            utterance = self._interrupted.get(session_id)
+            if utterance is not None:
+                self._replace(self._interrupted, session_id, None)
+                self.stats["resumed"] += 1
+            return utterance
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._current),
+                "interrupted_sessions": len(self._interrupted),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                **self.stats,
+            }
@@ -0,0 +1,189 @@
+import asyncio
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+try:
+    from mel_processing import spectrogram_torch
+except ImportError:
+    try:
+        from openvoice.mel_processing import spectrogram_torch
+    except ImportError:
+        spectrogram_torch = None
+
+def infer_batch(tts_model, texts: List[str], speed: float, language: str = "English", speaker: str = "default") -> List[np.ndarray]:
+    """Run several sentences through the base speaker VITS model as one padded batch"""
+    mark = tts_model.language_marks.get(language.lower(), None)
+    speaker_id = tts_model.hps.speakers[speaker]
+    device = tts_model.device
+
+    # Same text preparation BaseSpeakerTTS.tts applies per sentence
+    sequences = []
+    for text in texts:
+        text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)
+        text = f'[{mark}]{text}[{mark}]'
+        sequences.append(tts_model.get_text(text, tts_model.hps, False))
+
+    lengths = torch.LongTensor([seq.size(0) for seq in sequences])
+    x = torch.zeros(len(sequences), int(lengths.max()), dtype=torch.long)
+    for i, seq in enumerate(sequences):
+        x[i, :seq.size(0)] = seq
+    sid = torch.LongTensor([speaker_id] * len(sequences))
+
+    with torch.no_grad():
+        audio, _, y_mask, _ = tts_model.model.infer(
+            x.to(device), lengths.to(device), sid=sid.to(device),
+            noise_scale=0.667, noise_scale_w=0.6, length_scale=1.0 / speed
+        )
+
+    # y_mask marks the valid frames of each item; everything past it is padding
+    hop_length = tts_model.hps.data.hop_length
+    frame_counts = y_mask.sum(dim=(1, 2)).long().tolist()
+    audio = audio[:, 0].data.cpu().float().numpy()
+    return [audio[i, :int(frames) * hop_length] for i, frames in enumerate(frame_counts)]
+
+def convert_batch(converter, audios: List[np.ndarray], src_se: torch.Tensor, tgt_ses: List[torch.Tensor],
+                  tau: float = 0.3) -> List[np.ndarray]:
+    """In-memory, batched equivalent of ToneColorConverter.convert for already-synthesized waveforms"""
+    hps = converter.hps
+    device = converter.device
+    hop_length = hps.data.hop_length
+
+    lengths = [len(audio) for audio in audios]
+    y = torch.zeros(len(audios), max(lengths))
+    for i, audio in enumerate(audios):
+        y[i, :len(audio)] = torch.from_numpy(np.asarray(audio, dtype=np.float32))
+
+    with torch.no_grad():
+        spec = spectrogram_torch(
+            y.to(device), hps.data.filter_length, hps.data.sampling_rate,
+            hop_length, hps.data.win_length, center=False
+        )
+        spec_lengths = torch.LongTensor([min(n // hop_length, spec.size(-1)) for n in lengths]).to(device)
+        sid_src = src_se.to(device).expand(len(audios), -1, -1)
+        sid_tgt = torch.cat([se.to(device) for se in tgt_ses], dim=0)
+        converted = converter.model.voice_conversion(
+            spec, spec_lengths, sid_src=sid_src, sid_tgt=sid_tgt, tau=tau
+        )[0]
+
+    converted = converted[:, 0].data.cpu().float().numpy()
+    return [converted[i, :int(frames) * hop_length] for i, frames in enumerate(spec_lengths.tolist())]
+
+class SynthesisCancelled(Exception):
+    """The session's pending sentences were dropped before synthesis, e.g. on barge-in"""
+
+class _Job:
+    __slots__ = ("text", "speed", "session_id", "voice", "language", "future", "enqueued_at")
+
+    def __init__(self, text: str, speed: float, session_id: Optional[str], voice: Optional[str],
+                 language: str, future: asyncio.Future):
+        self.text = text
+        self.speed = speed
+        self.session_id = session_id
+        self.voice = voice
+        self.language = language
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+class SynthesisBatcher:
+    """Groups pending sentence jobs with the same language and speed across sessions into one forward pass"""
+
+    def __init__(self, run_batch: Callable[[List[str], float, List[Optional[str]], str], List[np.ndarray]],
+                 max_batch: int = 8, max_wait_ms: float = 10.0):
+        self.run_batch = run_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._pending: Dict[Tuple[str, float], Deque[_Job]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        # One model, one inference thread; torch intra-op threads do the parallel work
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-batch")
+        self.stats = {"batches": 0, "jobs": 0, "largest_batch": 0}
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def synthesize(self, text: str, speed: float = 1.0, session_id: Optional[str] = None,
+                         voice: Optional[str] = None, language: str = "EN") -> np.ndarray:
+        """Queue one sentence and wait for its waveform, tone-converted to voice if given"""
+        self._ensure_worker()
+        speed = round(speed, 2)
+        job = _Job(text, speed, session_id, voice, language, asyncio.get_running_loop().create_future())
+        self._pending.setdefault((language, speed), deque()).append(job)
+        self._wakeup.set()
+        return await job.future
+
+    def cancel_session(self, session_id: str) -> int:
+        """Fail every queued sentence of a session; batches already running finish as usual"""
+        cancelled = 0
+        for jobs in self._pending.values():
+            for job in jobs:
+                if job.session_id == session_id and not job.future.done():
+                    job.future.set_exception(SynthesisCancelled(f"Speech for {session_id} was stopped"))
+                    cancelled += 1
+        return cancelled
+
+    def pending_count(self) -> int:
+        return sum(len(jobs) for jobs in self._pending.values())
+
+    def _oldest_group(self) -> Optional[Tuple[str, float]]:
+        oldest = None
+        for group, jobs in self._pending.items():
+            if jobs and (oldest is None or jobs[0].enqueued_at < self._pending[oldest][0].enqueued_at):
+                oldest = group
+        return oldest
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            group = self._oldest_group()
+            if group is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            language, speed = group
+            jobs = self._pending[group]
+            # Give other sessions until max_wait (counted from the oldest job) to join the batch
+            deadline = jobs[0].enqueued_at + self.max_wait
+            while len(jobs) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            batch = [jobs.popleft() for _ in range(min(len(jobs), self.max_batch))]
+            if not jobs:
+                del self._pending[group]
+            batch = [job for job in batch if not job.future.done()]
+            if not batch:
+                continue
+
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self.run_batch,
+                    [job.text for job in batch], speed, [job.voice for job in batch], language
+                )
+            except Exception as e:
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                continue
+
+            self.stats["batches"] += 1
+            self.stats["jobs"] += len(batch)
+            self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+            for job, audio in zip(batch, results):
+                if not job.future.done():
+                    job.future.set_result(audio)
@@ -13,22 +13,39 @@ openvoice_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'OpenV
 if os.path.exists(openvoice_path):
     sys.path.insert(0, openvoice_path)
 
+# Shared config lives one level up
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
 # Verify correct environment
 print(f"Using Python from: {sys.executable}")
 print(f"Virtual env path: {venv_path}")
 
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Response
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Request
 from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import torch
 import numpy as np
 import re
+import asyncio
+import time
 import tempfile
 import io
 import wave
-import soundfile as sf
 from scipy.io.wavfile import write
+from typing import Optional, Dict
+
+from shared.config import Config
+from shared.tracing import Tracer, TRACE_HEADER
+from shared.job_bus import JobBus, JobFailed, start_worker
+from shared.model_registry import ModelRegistry, parse_model_spec
+from audio_codec import negotiate_format, media_type_for, extension_for, encode_audio, StreamingEncoder
+from synthesis_batcher import SynthesisBatcher, SynthesisCancelled, infer_batch, convert_batch
+from voice_cache import SpeakerEmbeddingCache
+from audio_cache import SentenceAudioCache
+from segment_store import SegmentStore, Utterance
+from inference_profile import apply_cpu_profile
+from tts_stream import TTSStreamSession
 
 # Import OpenVoice components
 try:
@@ -59,20 +76,90 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+tracer = Tracer("tts")
+tracer.install_middleware(app)
+
 # Initialize components
 device = "cuda" if torch.cuda.is_available() else "cpu"
 print(f"Using device: {device}")
 
 # Initialize OpenVoice TTS
-ckpt_base = 'checkpoints/base_speakers/EN'
 ckpt_converter = 'checkpoints/converter'
+# Base speaker checkpoints by language; the first is the default and backs the globals below
+BASE_SPEAKERS = parse_model_spec(Config.TTS_BASE_SPEAKERS)
+DEFAULT_LANGUAGE = next(iter(BASE_SPEAKERS))
+LANGUAGE_NAMES = {"EN": "English", "ZH": "Chinese"}  # OpenVoice's language marks
+ckpt_base = BASE_SPEAKERS[DEFAULT_LANGUAGE]
 base_speaker_tts = None
 tone_color_converter = None
 source_se = None
+cpu_profile = None
+models_ready = False
+tts_models = ModelRegistry("tts", Config.MODEL_RAM_BUDGET_MB)
+
+class BaseSpeaker:
+    """One language's base speaker model and the embedding tone conversion starts from"""
+
+    def __init__(self, language: str, tts, source_se):
+        self.language = language
+        self.language_name = LANGUAGE_NAMES[language]
+        self.tts = tts
+        self.source_se = source_se
 
 # Create temp directory
 os.makedirs("temp", exist_ok=True)
 os.makedirs("processed", exist_ok=True)
+AUDIO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "processed"))
+os.makedirs(AUDIO_DIR, exist_ok=True)
+
+def tune_for_cpu(name: str, tts_model=None, converter=None):
+    """Apply TTS_CPU_PROFILE to a model as it loads; cpu_profile collects what was done"""
+    global cpu_profile
+    if device != "cpu":
+        return
+    applied = apply_cpu_profile(Config.TTS_CPU_PROFILE, tts_model, converter, num_threads=Config.TTS_NUM_THREADS)
+    if cpu_profile is None:
+        cpu_profile = {"profile": applied["profile"], "threads": applied["threads"],
+                       "quantized": [], "weight_norm_removed": []}
+    for field in ("quantized", "weight_norm_removed"):
+        if applied[field] and name not in cpu_profile[field]:
+            cpu_profile[field].append(name)
+    print(f"CPU inference profile applied to {name}: {applied}")
+
+def load_base_speaker(language: str) -> BaseSpeaker:
+    ckpt = BASE_SPEAKERS[language]
+    print(f"Loading base speaker model from {ckpt}")
+    tts = BaseSpeakerTTS(f'{ckpt}/config.json', device=device)
+    tts.load_ckpt(f'{ckpt}/checkpoint.pth')
+    # Sentences of every language are concatenated and encoded at one rate
+    if base_speaker_tts is not None and tts.hps.data.sampling_rate != get_sample_rate():
+        raise ValueError(f"Base speaker {language} runs at {tts.hps.data.sampling_rate} Hz, not {get_sample_rate()} Hz")
+    print("Loading source speaker embedding")
+    speaker_se = torch.load(f'{ckpt}/{language.lower()}_default_se.pth', map_location=device)
+    tune_for_cpu(language, tts_model=tts)
+    return BaseSpeaker(language, tts, speaker_se)
+
+def load_tone_converter():
+    print(f"Loading tone converter from {ckpt_converter}")
+    converter = ToneColorConverter(f'{ckpt_converter}/config.json', device=device)
+    converter.load_ckpt(f'{ckpt_converter}/checkpoint.pth')
+    tune_for_cpu("converter", converter=converter)
+    return converter
+
+def register_models():
+    """Every base speaker loads on first use; the preloaded ones and the converter stay resident"""
+    preload = {language.strip() for language in Config.TTS_PRELOAD.split(",") if language.strip()}
+    preload.add(DEFAULT_LANGUAGE)
+    for language in BASE_SPEAKERS:
+        if language not in LANGUAGE_NAMES:
+            print(f"Skipping base speaker {language}: OpenVoice only has {', '.join(LANGUAGE_NAMES)}")
+            continue
+        if language not in tts_models:
+            tts_models.register(language, lambda language=language: load_base_speaker(language),
+                                pinned=language in preload)
+    if "converter" not in tts_models:
+        tts_models.register("converter", load_tone_converter, pinned=True)
+    return preload
 
 def initialize_models():
     global base_speaker_tts, tone_color_converter, source_se
@@ -82,20 +169,17 @@ def initialize_models():
         return False
     
     try:
-        print(f"Loading base speaker model from {ckpt_base}")
-        base_speaker_tts = BaseSpeakerTTS(f'{ckpt_base}/config.json', device=device)
-        base_speaker_tts.load_ckpt(f'{ckpt_base}/checkpoint.pth')
+        preload = register_models()
+        speaker = tts_models.get(DEFAULT_LANGUAGE)
+        base_speaker_tts = speaker.tts
+        source_se = speaker.source_se
         print("Base speaker model loaded successfully")
         
-        print(f"Loading tone converter from {ckpt_converter}")
-        tone_color_converter = ToneColorConverter(f'{ckpt_converter}/config.json', device=device)
-        tone_color_converter.load_ckpt(f'{ckpt_converter}/checkpoint.pth')
+        tone_color_converter = tts_models.get("converter")
         print("Tone converter loaded successfully")
         
-        print("Loading source speaker embedding")
-        source_se = torch.load(f'{ckpt_base}/en_default_se.pth', map_location=device)
-        print("Source speaker embedding loaded successfully")
-        
+        for language in preload - {DEFAULT_LANGUAGE}:
+            tts_models.get(language)
         return True
     except Exception as e:
         print(f"Failed to load OpenVoice models: {e}")
@@ -106,11 +190,81 @@ def initialize_models():
 # Initialize models on startup
 models_loaded = initialize_models()
 
+voice_cache = SpeakerEmbeddingCache(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), Config.TTS_VOICE_CACHE_DIR),
+    device=device
+)
+
+def extract_speaker_embedding(clip_path: str) -> torch.Tensor:
+    """Expensive se_extractor pass, only run once per distinct reference clip"""
+    target_se, _ = se_extractor.get_se(
+        clip_path, tone_color_converter,
+        target_dir=os.path.join(voice_cache.cache_dir, "processed"), vad=True
+    )
+    return target_se
+
+def run_tts_batch(texts, speed, voices, language=DEFAULT_LANGUAGE):
+    # A language that isn't resident loads here, on the batch thread
+    with tts_models.use(language) as speaker:
+        audios = infer_batch(speaker.tts, texts, speed, language=speaker.language_name, speaker='default')
+
+        # Tone-convert the cloned-voice items of the batch in a single converter pass
+        cloned = [i for i, voice in enumerate(voices) if voice]
+        if cloned and tone_color_converter is not None and speaker.source_se is not None:
+            converted = convert_batch(
+                tone_color_converter,
+                [audios[i] for i in cloned],
+                speaker.source_se,
+                voice_cache.get_many([voices[i] for i in cloned]),
+                tau=Config.TTS_TONE_TAU
+            )
+            for i, audio in zip(cloned, converted):
+                audios[i] = audio
+    return audios
+
+tts_batcher = SynthesisBatcher(
+    run_tts_batch,
+    max_batch=Config.TTS_MAX_BATCH,
+    max_wait_ms=Config.TTS_MAX_WAIT_MS
+)
+
+# Lesson openings and FAQ answers repeat; their sentences are synthesized once
+audio_cache = SentenceAudioCache(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), Config.TTS_AUDIO_CACHE_DIR),
+    max_bytes=int(Config.TTS_AUDIO_CACHE_MAX_MB * 1024 * 1024)
+) if Config.TTS_AUDIO_CACHE else None
+
+def sentence_cache_key(text: str, speed: float, voice: Optional[str], language: str) -> str:
+    return audio_cache.key(text, speed, voice_cache.digest(voice) if voice else None, LANGUAGE_NAMES[language])
+
+async def synthesize_sentence(text: str, speed: float, session_id: Optional[str] = None,
+                              voice: Optional[str] = None, use_cache: bool = True,
+                              language: str = DEFAULT_LANGUAGE) -> np.ndarray:
+    """One sentence from the audio cache, or through the batcher and into the cache"""
+    if audio_cache is None or not use_cache:
+        return await tts_batcher.synthesize(text, speed, session_id, voice, language)
+    key = sentence_cache_key(text, speed, voice, language)
+    audio = await asyncio.to_thread(audio_cache.get, key)
+    if audio is None:
+        audio = await tts_batcher.synthesize(text, speed, session_id, voice, language)
+        await asyncio.to_thread(audio_cache.put, key, audio)
+    return audio
+
+# The latest answer of each session, sentence by sentence, so an interrupted one can be resumed
+segment_store = SegmentStore(max_bytes=int(Config.TTS_RESUME_MAX_MB * 1024 * 1024))
+
 class TTSRequest(BaseModel):
     session_id: str
     text: str
     emotion: str = "default"
     stream: bool = True
+    format: Optional[str] = None  # wav, flac, ogg or opus; falls back to the Accept header
+    voice: Optional[str] = None  # registered voice id for tone-color conversion
+    language: Optional[str] = None  # base speaker, one of TTS_BASE_SPEAKERS (default: the first)
+
+class ResumeRequest(BaseModel):
+    played_seconds: Optional[float] = None  # where the client's playback stopped; estimated when missing
+    format: Optional[str] = None
 
 def clean_text(text: str) -> str:
     """Remove markdown formatting and clean text for TTS"""
@@ -138,129 +292,347 @@ def get_emotion_settings(emotion: str) -> dict:
     }
     return emotion_map.get(emotion.lower(), emotion_map["default"])
 
-@app.post("/synthesize_stream")
-async def synthesize_speech_stream(request: TTSRequest):
-    """Synthesize speech and stream directly"""
+def start_segments(text: str, emotion: str, session_id: Optional[str] = None,
+                   voice: Optional[str] = None, use_cache: bool = True, language: str = DEFAULT_LANGUAGE):
+    """Queue every sentence of text on the batcher; returns per-sentence futures in order and the speed.
+
+    A session's sentences are also remembered in segment_store, for resuming after an interruption.
+    """
+    speed = get_emotion_settings(emotion)["speed"]
+    # Split like BaseSpeakerTTS.tts does, but queue each sentence so it can share a batch
+    pieces = base_speaker_tts.split_sentences_into_pieces(text, language)
+    segments = [
+        asyncio.ensure_future(synthesize_sentence(piece, speed, session_id, voice, use_cache, language))
+        for piece in pieces
+    ]
+    if session_id:
+        segment_store.begin(session_id, pieces, speed, voice, get_sample_rate(), segments, language)
+    return segments, speed
+
+async def synthesize_audio(text: str, emotion: str, session_id: Optional[str] = None,
+                           voice: Optional[str] = None, use_cache: bool = True,
+                           language: str = DEFAULT_LANGUAGE) -> np.ndarray:
+    """Synthesize text in memory through the shared batcher and return the float32 waveform"""
+    segments, speed = start_segments(text, emotion, session_id, voice, use_cache, language)
+    segments = await asyncio.gather(*segments)
+    audio = base_speaker_tts.audio_numpy_concat(list(segments), sr=get_sample_rate(), speed=speed)
+    return np.asarray(audio, dtype=np.float32)
+
+def get_sample_rate() -> int:
+    return base_speaker_tts.hps.data.sampling_rate
+
+WARMUP_TEXTS = [
+    "Hello, I am your AI teacher.",
+    "Let's get started with today's lesson. Ask me anything you like."
+]
+
+@app.on_event("startup")
+async def warmup_models():
+    """Run a few syntheses before serving so the first student doesn't pay for lazy init"""
+    global models_ready
+    if not models_loaded or not base_speaker_tts:
+        return
+    start = time.perf_counter()
+    for _ in range(Config.TTS_WARMUP_RUNS):
+        # Several sentences at once so the batched shapes are exercised too; the cache would skip the model
+        await asyncio.gather(*(synthesize_audio(text, "default", use_cache=False) for text in WARMUP_TEXTS))
+    models_ready = True
+    print(f"TTS warmup finished in {time.perf_counter() - start:.2f}s")
+
+def resolve_voice(request: TTSRequest) -> Optional[str]:
+    if not request.voice:
+        return None
+    if not voice_cache.has_voice(request.voice):
+        raise HTTPException(status_code=404, detail=f"Unknown voice: {request.voice}")
+    return request.voice
+
+def resolve_language(language: Optional[str]) -> str:
+    language = language or DEFAULT_LANGUAGE
+    if language not in tts_models or language == "converter":
+        raise HTTPException(status_code=400, detail=f"Unsupported language: {language}")
+    return language
+
+def resolve_format(request: TTSRequest, accept: Optional[str]) -> str:
+    try:
+        return negotiate_format(request.format, accept)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def ensure_models():
     if not models_loaded or not base_speaker_tts:
         # Try to initialize again
         if not initialize_models():
             raise HTTPException(status_code=503, detail="TTS models not available")
-    
+
+async def render_speech(request: TTSRequest, audio_format: str, trace_id: Optional[str] = None) -> np.ndarray:
+    """Clean the text and synthesize it; the waveform stays in memory for the caller to encode"""
+    voice = resolve_voice(request)
+    language = resolve_language(request.language)
+    clean_text_input = clean_text(request.text)
+    if not clean_text_input.strip():
+        raise HTTPException(status_code=400, detail="Empty text after cleaning")
+
+    print(f"Generating TTS for: '{clean_text_input[:50]}...' with emotion: {request.emotion}, format: {audio_format}")
+    with tracer.span("tts.synthesize", trace_id, chars=len(clean_text_input), voice=voice or "", language=language):
+        return await synthesize_audio(clean_text_input, request.emotion, request.session_id, voice, language=language)
+
+async def iter_sentences_encoded(first: np.ndarray, rest: list, speed: float, audio_format: str):
+    """Encode each sentence as soon as the batcher finishes it, in order"""
+    encoder = StreamingEncoder(audio_format, get_sample_rate())
+    # Same inter-sentence pause BaseSpeakerTTS.audio_numpy_concat inserts. Every block ends
+    # in this silence, so resampling block by block (for opus) doesn't click at the joins
+    gap = np.zeros(int(get_sample_rate() * 0.05 / speed), dtype=np.float32)
+    try:
+        audio = first
+        for segment in [None] + rest:
+            if segment is not None:
+                audio = await segment
+            chunk = encoder.encode(np.concatenate([audio, gap]))
+            if chunk:
+                yield chunk
+        tail = encoder.finish()
+        if tail:
+            yield tail
+    except SynthesisCancelled:
+        print("Speech stream stopped mid-answer")
+    finally:
+        for segment in rest:
+            segment.cancel()
+
+async def stream_speech(request: TTSRequest, accept: Optional[str] = None,
+                        trace_id: Optional[str] = None) -> StreamingResponse:
+    """Body of /synthesize_stream, also called in-process by the all-in-one orchestrator"""
+    ensure_models()
+    audio_format = resolve_format(request, accept)
+    voice = resolve_voice(request)
+    language = resolve_language(request.language)
+    clean_text_input = clean_text(request.text)
+    if not clean_text_input.strip():
+        raise HTTPException(status_code=400, detail="Empty text after cleaning")
+
+    print(f"Streaming TTS for: '{clean_text_input[:50]}...' with emotion: {request.emotion}, format: {audio_format}")
+    # Every sentence goes on the batcher now; the response starts once the first is ready
+    segments, speed = start_segments(clean_text_input, request.emotion, request.session_id, voice, language=language)
     try:
-        # Clean text
-        clean_text_input = clean_text(request.text)
-        if not clean_text_input.strip():
-            raise HTTPException(status_code=400, detail="Empty text after cleaning")
-        
-        print(f"Generating TTS for: '{clean_text_input[:50]}...' with emotion: {request.emotion}")
-        
-        # Get emotion settings
-        emotion_settings = get_emotion_settings(request.emotion)
-        
-        # Generate unique temp file names
-        import uuid
-        unique_id = str(uuid.uuid4())
-        temp_path = f"temp/temp_{unique_id}.wav"
-        
         try:
-            # Generate base TTS
-            print("Generating base TTS...")
-            base_speaker_tts.tts(
-                clean_text_input, 
-                temp_path, 
-                speaker='default', 
-                language='English',
-                speed=emotion_settings["speed"]
-            )
-            
-            if not os.path.exists(temp_path):
-                raise Exception("Base TTS failed to generate audio file")
-            
-            # For now, skip tone conversion to test basic TTS
-            # Just read the generated audio and return it
-            with open(temp_path, 'rb') as f:
-                audio_data = f.read()
-            
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            
-            print("Audio generated successfully")
-            
-            # Return audio as streaming response
-            return Response(
-                content=audio_data,
-                media_type="audio/wav",
-                headers={
-                    "Content-Disposition": f"inline; filename=tts_{request.session_id}.wav",
-                    "Cache-Control": "no-cache",
-                    "Access-Control-Allow-Origin": "*"
-                }
-            )
-            
-        except Exception as e:
-            # Clean up temp files on error
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            raise e
-            
+            with tracer.span("tts.first_sentence", trace_id, chars=len(clean_text_input),
+                             sentences=len(segments), voice=voice or ""):
+                first = await segments[0]
+        except BaseException:
+            for segment in segments:
+                segment.cancel()
+            raise
+
+        return StreamingResponse(
+            tracer.traced_aiter("tts.encode_stream", trace_id,
+                                iter_sentences_encoded(first, segments[1:], speed, audio_format),
+                                format=audio_format),
+            media_type=media_type_for(audio_format),
+            headers={
+                "Content-Disposition": f"inline; filename=tts_{request.session_id}.{extension_for(audio_format)}",
+                "Cache-Control": "no-cache",
+                "Access-Control-Allow-Origin": "*"
+            }
+        )
+
+    except HTTPException:
+        raise
+    except SynthesisCancelled as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         import traceback
         print(f"TTS synthesis error: {str(e)}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"TTS synthesis failed: {str(e)}")
 
-@app.post("/synthesize")
-async def synthesize_speech(request: TTSRequest):
-    """Synthesize speech and return JSON metadata with audio URL"""
-    if not models_loaded or not base_speaker_tts:
-        if not initialize_models():
-            raise HTTPException(status_code=503, detail="TTS models not available")
+def save_audio(session_id: str, audio: np.ndarray, audio_format: str, trace_id: Optional[str] = None) -> dict:
+    """Encode audio into AUDIO_DIR; returns the metadata /synthesize replies with"""
+    import uuid
+    unique_id = str(uuid.uuid4())
+    audio_filename = f"tts_{session_id}_{unique_id}.{extension_for(audio_format)}"
+    audio_path = os.path.join(AUDIO_DIR, audio_filename)
 
-    try:
-        clean_text_input = clean_text(request.text)
-        if not clean_text_input.strip():
-            raise HTTPException(status_code=400, detail="Empty text after cleaning")
-
-        emotion_settings = get_emotion_settings(request.emotion)
-        import uuid
-        unique_id = str(uuid.uuid4())
-        audio_filename = f"tts_{request.session_id}_{unique_id}.wav"
-        audio_path = os.path.join("processed", audio_filename)
-
-        # Generate base TTS
-        base_speaker_tts.tts(
-            clean_text_input,
-            audio_path,
-            speaker='default',
-            language='English',
-            speed=emotion_settings["speed"]
-        )
+    # Store the compressed encoding so /audio serves the small file
+    with tracer.span("tts.encode", trace_id, format=audio_format):
+        with open(audio_path, 'wb') as f:
+            f.write(encode_audio(audio, get_sample_rate(), audio_format))
 
-        if not os.path.exists(audio_path):
-            raise HTTPException(status_code=500, detail="Base TTS failed to generate audio file")
+    return {
+        "success": True,
+        "audio_url": f"/audio/{audio_filename}",
+        "audio_duration": len(audio) / get_sample_rate(),
+        "format": audio_format,
+        "media_type": media_type_for(audio_format)
+    }
 
-        # Get audio duration
-        try:
-            f = sf.SoundFile(audio_path)
-            audio_duration = len(f) / f.samplerate
-            f.close()
-        except Exception:
-            audio_duration = 0.0
-
-        audio_url = f"/audio/{audio_filename}"
-
-        return {
-            "success": True,
-            "audio_url": audio_url,
-            "audio_duration": audio_duration
-        }
+async def synthesize_to_file(request: TTSRequest, accept: Optional[str] = None,
+                             trace_id: Optional[str] = None) -> dict:
+    """Body of /synthesize, also called in-process by the all-in-one orchestrator"""
+    ensure_models()
+    audio_format = resolve_format(request, accept)
+
+    try:
+        audio = await render_speech(request, audio_format, trace_id)
+        return save_audio(request.session_id, audio, audio_format, trace_id)
+    except HTTPException:
+        raise
+    except SynthesisCancelled as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         import traceback
         print(f"TTS synthesis error: {str(e)}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"TTS synthesis failed: {str(e)}")
 
+async def resume_sentence(utterance: Utterance, index: int):
+    """A sentence of an interrupted answer from memory, else the sentence cache, else the model"""
+    audio = utterance.audio[index]
+    if audio is not None:
+        return audio, "memory"
+    text = utterance.texts[index]
+    cached = audio_cache is not None and audio_cache.contains(
+        sentence_cache_key(text, utterance.speed, utterance.voice, utterance.language)
+    )
+    audio = await synthesize_sentence(text, utterance.speed, utterance.session_id, utterance.voice,
+                                      language=utterance.language)
+    return audio, "cache" if cached else "synthesized"
+
+async def resume_to_file(session_id: str, request: ResumeRequest, accept: Optional[str] = None,
+                         trace_id: Optional[str] = None) -> dict:
+    """Body of POST /resume: the rest of the session's interrupted answer, replayed as a file"""
+    ensure_models()
+    audio_format = resolve_format(request, accept)
+    utterance = segment_store.take_interrupted(session_id)
+    if utterance is None:
+        raise HTTPException(status_code=404, detail="No interrupted speech to resume")
+    played = request.played_seconds if request.played_seconds is not None else utterance.estimated_position()
+    start = utterance.resume_index(played)
+    if start >= len(utterance.texts):
+        raise HTTPException(status_code=404, detail="The interrupted speech was already heard to the end")
+
+    texts = utterance.texts[start:]
+    try:
+        with tracer.span("tts.resume", trace_id, session_id=session_id, from_sentence=start, sentences=len(texts)):
+            results = await asyncio.gather(*(resume_sentence(utterance, i) for i in range(start, len(utterance.texts))))
+    except SynthesisCancelled as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    sources = [source for _, source in results]
+    print(f"Resuming {session_id} at sentence {start + 1}/{len(utterance.texts)} ({played:.1f}s in): "
+          f"{sources.count('memory')} from memory, {sources.count('cache')} cached, "
+          f"{sources.count('synthesized')} synthesized")
+
+    # The resumed part is the session's latest answer now, so it can be interrupted and resumed again
+    resumed = segment_store.begin(session_id, texts, utterance.speed, utterance.voice, get_sample_rate(), [],
+                                  utterance.language)
+    for index, (audio, _) in enumerate(results):
+        segment_store.add(resumed, index, audio)
+    audio = base_speaker_tts.audio_numpy_concat([audio for audio, _ in results], sr=get_sample_rate(),
+                                                speed=utterance.speed)
+    result = save_audio(session_id, np.asarray(audio, dtype=np.float32), audio_format, trace_id)
+    result.update({
+        "text": " ".join(texts),
+        "from_sentence": start,
+        "sentences": len(utterance.texts),
+        "played_seconds": round(played, 2),
+        "sources": {source: sources.count(source) for source in ("memory", "cache", "synthesized")}
+    })
+    return result
+
+async def run_tts_job(payload: dict) -> dict:
+    """Synthesis job from the Redis job bus; the audio link points back at this worker"""
+    try:
+        result = await synthesize_to_file(TTSRequest(**payload))
+    except HTTPException as e:
+        if e.status_code < 500:
+            raise JobFailed(e.detail)
+        raise
+    result["audio_url"] = f"{Config.TTS_PUBLIC_URL}{result['audio_url']}"
+    return result
+
+job_worker = None
+
+@app.on_event("startup")
+async def start_job_worker():
+    """With JOB_TRANSPORT=redis every TTS instance joins the tts consumer group"""
+    global job_worker
+    if Config.JOB_TRANSPORT == "redis" and models_loaded:
+        # Enough jobs in flight to fill a batch
+        job_worker = start_worker(JobBus(), "tts", run_tts_job, Config.TTS_MAX_BATCH, tracer)
+
+@app.post("/synthesize_stream")
+async def synthesize_speech_stream(request: TTSRequest, http_request: Request):
+    """Synthesize speech and stream it encoded in the negotiated format"""
+    return await stream_speech(request, http_request.headers.get("accept"), http_request.headers.get(TRACE_HEADER))
+
+@app.post("/synthesize")
+async def synthesize_speech(request: TTSRequest, http_request: Request):
+    """Synthesize speech and return JSON metadata with audio URL"""
+    return await synthesize_to_file(request, http_request.headers.get("accept"), http_request.headers.get(TRACE_HEADER))
+
+@app.post("/resume/{session_id}")
+async def resume_speech(session_id: str, request: ResumeRequest, http_request: Request):
+    """Replay the rest of an interrupted answer from the remembered sentences, without synthesizing it again"""
+    return await resume_to_file(session_id, request, http_request.headers.get("accept"),
+                                http_request.headers.get(TRACE_HEADER))
+
+@app.post("/cache/warm")
+async def warm_audio_cache(request: TTSRequest):
+    """Synthesize text into the sentence cache without encoding it; used by warm_cache.py"""
+    ensure_models()
+    if audio_cache is None:
+        raise HTTPException(status_code=404, detail="Audio cache is disabled")
+    voice = resolve_voice(request)
+    language = resolve_language(request.language)
+    text = clean_text(request.text)
+    if not text:
+        raise HTTPException(status_code=400, detail="Empty text after cleaning")
+    speed = get_emotion_settings(request.emotion)["speed"]
+    pieces = base_speaker_tts.split_sentences_into_pieces(text, language)
+    cached = sum(audio_cache.contains(sentence_cache_key(piece, speed, voice, language)) for piece in pieces)
+    started = time.perf_counter()
+    # No session: nothing to stop or resume, and no student is listening
+    audio = await synthesize_audio(text, request.emotion, voice=voice, language=language)
+    return {
+        "sentences": len(pieces),
+        "already_cached": cached,
+        "audio_duration": len(audio) / get_sample_rate(),
+        "synthesis_time": time.perf_counter() - started
+    }
+
+@app.put("/voices/{voice_id}")
+async def register_voice(voice_id: str, http_request: Request):
+    """Register a teacher voice from a reference clip sent as the raw request body"""
+    if not tone_color_converter or not se_extractor:
+        raise HTTPException(status_code=503, detail="Tone color converter not available")
+
+    audio_bytes = await http_request.body()
+    if not audio_bytes:
+        raise HTTPException(status_code=400, detail="Empty reference clip")
+
+    content_type = http_request.headers.get("content-type", "")
+    extension = "mp3" if "mpeg" in content_type else "wav"
+    try:
+        # Extraction runs VAD and the converter's encoder, keep it off the event loop
+        digest = await asyncio.to_thread(
+            voice_cache.register_voice, voice_id, audio_bytes, extract_speaker_embedding, extension
+        )
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Speaker embedding extraction failed: {str(e)}")
+
+    return {"success": True, "voice_id": voice_id, "audio_hash": digest}
+
+@app.get("/models")
+async def model_stats():
+    """Base speakers by language and the tone converter: residency, sizes and load times"""
+    return {"default_language": DEFAULT_LANGUAGE, **tts_models.snapshot()}
+
+@app.get("/voices")
+async def list_voices():
+    """List registered teacher voices"""
+    return {"voices": voice_cache.list_voices()}
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -268,28 +640,105 @@ async def health_check():
         "status": "healthy",
         "device": device,
         "models_loaded": models_loaded,
+        "ready": models_ready,
+        "cpu_profile": cpu_profile,
         "base_speaker_loaded": base_speaker_tts is not None,
-        "tone_converter_loaded": tone_color_converter is not None
+        "tone_converter_loaded": tone_color_converter is not None,
+        "batching": {
+            "max_batch": tts_batcher.max_batch,
+            "max_wait_ms": tts_batcher.max_wait * 1000,
+            "pending": tts_batcher.pending_count(),
+            **tts_batcher.stats
+        },
+        "audio_cache": audio_cache.snapshot() if audio_cache else None,
+        "resume": segment_store.snapshot(),
+        "languages": [key for key in tts_models.keys() if key != "converter"],
+        "jobs": job_worker.stats if job_worker else None
     }
 
+# Open /ws/tts sockets by session, so /stop and /status can reach them
+active_streams: Dict[str, TTSStreamSession] = {}
+
+@app.websocket("/ws/tts/{session_id}")
+async def tts_websocket(websocket: WebSocket, session_id: str):
+    """Low-latency TTS channel: text messages in, sequenced audio frames out"""
+    await websocket.accept()
+    if not models_loaded or not base_speaker_tts:
+        await websocket.send_json({"type": "error", "message": "TTS models not available"})
+        await websocket.close()
+        return
+
+    def start_stream_segments(text: str, emotion: str, voice: Optional[str], language: Optional[str]):
+        text = clean_text(text)
+        if not text:
+            raise ValueError("Empty text after cleaning")
+        if voice and not voice_cache.has_voice(voice):
+            raise ValueError(f"Unknown voice: {voice}")
+        language = language or DEFAULT_LANGUAGE
+        if language not in tts_models or language == "converter":
+            raise ValueError(f"Unsupported language: {language}")
+        return start_segments(text, emotion, session_id, voice, language=language)
+
+    stream = TTSStreamSession(
+        websocket, session_id, get_sample_rate(), start_stream_segments,
+        frame_ms=Config.TTS_WS_FRAME_MS, tracer=tracer
+    )
+    previous = active_streams.get(session_id)
+    if previous:
+        await previous.close()
+    active_streams[session_id] = stream
+    print(f"TTS WebSocket connected for session: {session_id}")
+
+    try:
+        while True:
+            message = await websocket.receive_json()
+            message_type = message.get("type")
+
+            if message_type in ("synthesize", "text", "sentence"):
+                utterance_id = stream.submit(message)
+                await websocket.send_json({"type": "queued", "utterance_id": utterance_id})
+            elif message_type == "cancel":
+                cancelled = stream.cancel(message.get("utterance_id"))
+                await websocket.send_json({"type": "cancel_ack", "cancelled": cancelled})
+            else:
+                await websocket.send_json({"type": "error", "message": f"Unknown message type: {message_type}"})
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"TTS WebSocket error: {e}")
+    finally:
+        await stream.close()
+        if active_streams.get(session_id) is stream:
+            del active_streams[session_id]
+        print(f"TTS WebSocket closed for session: {session_id}")
+
 @app.post("/stop/{session_id}")
 async def stop_speech(session_id: str):
     """Stop current speech synthesis/playback"""
-    return {"success": True, "message": "Speech stopped"}
+    stream = active_streams.get(session_id)
+    cancelled = stream.cancel() if stream else []
+    # Sentences still waiting for a batch, from /synthesize and /synthesize_stream too
+    dropped = tts_batcher.cancel_session(session_id)
+    # What was cut off stays in memory for POST /resume
+    interrupted = segment_store.interrupt(session_id)
+    return {"success": True, "message": "Speech stopped", "cancelled": cancelled, "dropped_segments": dropped,
+            "interrupted": interrupted}
 
 @app.get("/status/{session_id}")
 async def get_tts_status(session_id: str):
     """Get current TTS status"""
+    stream = active_streams.get(session_id)
+    current = stream.current if stream else None
+    interrupted = segment_store.interrupted(session_id)
     return {
         "session_id": session_id,
-        "is_speaking": False,
-        "current_text": "",
-        "tts_active": False
+        "is_speaking": current is not None,
+        "current_text": current["text"] if current else "",
+        "tts_active": stream is not None,
+        "interrupted": interrupted.describe() if interrupted else None
     }
 
 # Mount static files if needed
-AUDIO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "processed"))
-os.makedirs(AUDIO_DIR, exist_ok=True)
 if os.path.exists(AUDIO_DIR):
     app.mount("/audio", StaticFiles(directory=AUDIO_DIR), name="audio")
 
@@ -0,0 +1,167 @@
+import asyncio
+import struct
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import WebSocket
+
+from audio_codec import StreamingEncoder
+
+# Binary frames carry this header followed by the audio payload:
+# uint32 utterance index, uint32 sequence number within the utterance (little endian)
+FRAME_HEADER = struct.Struct("<II")
+
+STREAM_ENCODINGS = {"pcm": "pcm_s16le", "opus": "ogg_opus"}
+
+class TTSStreamSession:
+    """One /ws/tts socket: queues utterances, pushes audio frames as sentences finish, handles cancel"""
+
+    def __init__(self, websocket: WebSocket, session_id: str, sample_rate: int,
+                 start_segments: Callable[[str, str, Optional[str], Optional[str]], Tuple[List[asyncio.Future], float]],
+                 frame_ms: int = 100, tracer=None):
+        self.websocket = websocket
+        self.tracer = tracer
+        self.session_id = session_id
+        self.sample_rate = sample_rate
+        self.start_segments = start_segments
+        self.frame_samples = max(1, int(sample_rate * frame_ms / 1000))
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.current: Optional[Dict[str, Any]] = None
+        self._current_task: Optional[asyncio.Task] = None
+        self._next_index = 0
+        self._worker = asyncio.create_task(self._run())
+
+    @property
+    def is_speaking(self) -> bool:
+        return self.current is not None
+
+    def submit(self, message: Dict[str, Any]) -> str:
+        utterance_id = message.get("utterance_id") or str(uuid.uuid4())
+        self.queue.put_nowait({
+            "utterance_id": utterance_id,
+            "index": self._next_index,
+            "text": message.get("text", ""),
+            "emotion": message.get("emotion", "default"),
+            "voice": message.get("voice"),
+            "language": message.get("language"),
+            "format": message.get("format", "pcm"),
+            "trace_id": message.get("trace_id"),
+        })
+        self._next_index += 1
+        return utterance_id
+
+    def cancel(self, utterance_id: Optional[str] = None) -> List[str]:
+        """Drop queued utterances and stop the one being streamed; returns what was cancelled"""
+        cancelled = []
+        kept = []
+        while not self.queue.empty():
+            item = self.queue.get_nowait()
+            if utterance_id is None or item["utterance_id"] == utterance_id:
+                cancelled.append(item["utterance_id"])
+            else:
+                kept.append(item)
+        for item in kept:
+            self.queue.put_nowait(item)
+
+        if self.current and (utterance_id is None or self.current["utterance_id"] == utterance_id):
+            cancelled.append(self.current["utterance_id"])
+            if self._current_task:
+                self._current_task.cancel()
+        return cancelled
+
+    async def close(self):
+        self.cancel()
+        self._worker.cancel()
+
+    async def _run(self):
+        while True:
+            utterance = await self.queue.get()
+            self.current = utterance
+            self._current_task = asyncio.create_task(self._traced_stream(utterance))
+            # wait() keeps the worker alive when only the utterance task is cancelled
+            await asyncio.wait([self._current_task])
+            if self._current_task.cancelled():
+                await self._send_json({"type": "cancelled", "utterance_id": utterance["utterance_id"]})
+            elif self._current_task.exception():
+                await self._send_json({
+                    "type": "error",
+                    "utterance_id": utterance["utterance_id"],
+                    "message": f"TTS synthesis failed: {self._current_task.exception()}"
+                })
+            self.current = None
+            self._current_task = None
+
+    async def _send_json(self, payload: Dict[str, Any]):
+        try:
+            await self.websocket.send_json(payload)
+        except Exception:
+            pass
+
+    def _frames(self, audio: np.ndarray, encoder: Optional[StreamingEncoder]):
+        if encoder is not None:
+            chunk = encoder.encode(audio)
+            if chunk:
+                yield chunk
+            return
+        pcm = (np.clip(audio, -1.0, 1.0) * 32767.0).astype("<i2")
+        for start in range(0, len(pcm), self.frame_samples):
+            yield pcm[start:start + self.frame_samples].tobytes()
+
+    async def _traced_stream(self, utterance: Dict[str, Any]):
+        if self.tracer is None or not utterance["trace_id"]:
+            await self._stream(utterance)
+            return
+        with self.tracer.span("tts.ws_stream", utterance["trace_id"], session_id=self.session_id,
+                              utterance_id=utterance["utterance_id"]) as span:
+            utterance["span"] = span
+            await self._stream(utterance)
+
+    async def _stream(self, utterance: Dict[str, Any]):
+        fmt = utterance["format"] if utterance["format"] in STREAM_ENCODINGS else "pcm"
+        segments, speed = self.start_segments(
+            utterance["text"], utterance["emotion"], utterance["voice"], utterance["language"]
+        )
+        index = utterance["index"]
+        encoder = StreamingEncoder("opus", self.sample_rate) if fmt == "opus" else None
+        # Same inter-sentence pause BaseSpeakerTTS.audio_numpy_concat inserts
+        gap = np.zeros(int(self.sample_rate * 0.05 / speed), dtype=np.float32)
+        sequence = 0
+        samples = 0
+        started = time.perf_counter()
+
+        try:
+            await self.websocket.send_json({
+                "type": "utterance_start",
+                "utterance_id": utterance["utterance_id"],
+                "index": index,
+                "encoding": STREAM_ENCODINGS[fmt],
+                "sample_rate": encoder.sample_rate if encoder else self.sample_rate,
+                "sentences": len(segments)
+            })
+            # All sentences are already queued on the batcher; send each one as soon as it is ready
+            for segment in segments:
+                audio = np.concatenate([await segment, gap])
+                if samples == 0 and "span" in utterance:
+                    utterance["span"]["attributes"]["first_audio_ms"] = (time.perf_counter() - started) * 1000
+                samples += len(audio)
+                for frame in self._frames(audio, encoder):
+                    await self.websocket.send_bytes(FRAME_HEADER.pack(index, sequence) + frame)
+                    sequence += 1
+            if encoder is not None:
+                tail = encoder.finish()
+                if tail:
+                    await self.websocket.send_bytes(FRAME_HEADER.pack(index, sequence) + tail)
+                    sequence += 1
+
+            await self.websocket.send_json({
+                "type": "utterance_end",
+                "utterance_id": utterance["utterance_id"],
+                "index": index,
+                "frames": sequence,
+                "duration": samples / self.sample_rate
+            })
+        finally:
+            for segment in segments:
+                segment.cancel()
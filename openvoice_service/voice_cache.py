@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+
+import torch
+
+class SpeakerEmbeddingCache:
+    """Target speaker embeddings extracted once per reference clip, cached in memory and on disk"""
+
+    def __init__(self, cache_dir: str, device: str = "cpu"):
+        self.cache_dir = cache_dir
+        self.device = device
+        self._embeddings: Dict[str, torch.Tensor] = {}  # audio hash -> embedding
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index_path = os.path.join(cache_dir, "index.json")
+        self._voices: Dict[str, str] = {}  # voice id -> audio hash
+        if os.path.exists(self._index_path):
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                self._voices = json.load(f)
+
+    def _save_index(self):
+        tmp_path = f"{self._index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._voices, f, indent=2)
+        os.replace(tmp_path, self._index_path)
+
+    def register_voice(self, voice_id: str, audio_bytes: bytes, extract_fn: Callable[[str], torch.Tensor],
+                       extension: str = "wav") -> str:
+        """Map a voice id to a reference clip, extracting its embedding only if the clip is new"""
+        digest = hashlib.sha256(audio_bytes).hexdigest()
+        embedding_path = os.path.join(self.cache_dir, f"{digest}.pth")
+
+        if digest not in self._embeddings and not os.path.exists(embedding_path):
+            clip_path = os.path.join(self.cache_dir, f"{digest}.{extension}")
+            with open(clip_path, 'wb') as f:
+                f.write(audio_bytes)
+            print(f"Extracting speaker embedding for voice '{voice_id}' ({digest[:12]})")
+            embedding = extract_fn(clip_path)
+            torch.save(embedding.detach().cpu(), embedding_path)
+            with self._lock:
+                self._embeddings[digest] = embedding.detach().to(self.device)
+
+        with self._lock:
+            self._voices[voice_id] = digest
+            self._save_index()
+        return digest
+
+    def has_voice(self, voice_id: str) -> bool:
+        return voice_id in self._voices
+
+    def digest(self, voice_id: str) -> Optional[str]:
+        """Hash of the voice's reference clip"""
+        return self._voices.get(voice_id)
+
+    def list_voices(self) -> Dict[str, str]:
+        return dict(self._voices)
+
+    def get(self, voice_id: str) -> Optional[torch.Tensor]:
+        """Embedding for a voice id, loading it from disk on first use"""
+        digest = self._voices.get(voice_id)
+        if digest is None:
+            return None
+        with self._lock:
+            embedding = self._embeddings.get(digest)
+            if embedding is None:
+                embedding_path = os.path.join(self.cache_dir, f"{digest}.pth")
+                if not os.path.exists(embedding_path):
+                    return None
+                embedding = torch.load(embedding_path, map_location=self.device)
+                self._embeddings[digest] = embedding
+            return embedding
+
+    def get_many(self, voice_ids: List[str]) -> List[torch.Tensor]:
+        return [self.get(voice_id) for voice_id in voice_ids]
@@ -6,15 +6,147 @@ load_dotenv()
 class Config:
     REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     GEMMA_MODEL = os.getenv("GEMMA_MODEL", "google/gemma-3n-e2b")
-    FUNASR_SERVICE_URL = os.getenv("FUNASR_SERVICE_URL", "http://localhost:8001")
+    FUNASR_SERVICE_URL = os.getenv("FUNASR_SERVICE_URL", "http://localhost:8000")
     OPENVOICE_SERVICE_URL = os.getenv("OPENVOICE_SERVICE_URL", "http://localhost:8002")
-    CHATBOT_SERVICE_URL = os.getenv("CHATBOT_SERVICE_URL", "http://localhost:8000")
+    CHATBOT_SERVICE_URL = os.getenv("CHATBOT_SERVICE_URL", "http://localhost:8001")
+    OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434")
+    OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "gemma3n:e2b")
+    # Pool of Ollama backends, comma-separated "url" or "model@url" (default: OLLAMA_API_URL alone).
+    # Requests go to the least busy backend, sessions stick to theirs, and failing backends are ejected.
+    # LLM_MAX_CONCURRENT is per orchestrator worker, so raise it along with the number of backends
+    OLLAMA_BACKENDS = os.getenv("OLLAMA_BACKENDS", "")
+    OLLAMA_EJECT_FAILURES = int(os.getenv("OLLAMA_EJECT_FAILURES", "2"))
+    OLLAMA_EJECT_SECONDS = float(os.getenv("OLLAMA_EJECT_SECONDS", "30"))
+    OLLAMA_AFFINITY_SLACK = int(os.getenv("OLLAMA_AFFINITY_SLACK", "2"))
     LOG_DIR = os.getenv("LOG_DIR", "./logs")
     
+    # Transcript store: turns are appended to a SQLite/FTS5 database as they happen, and
+    # `python -m shared.transcript_store ingest` compacts the per-session JSON logs into it
+    TRANSCRIPT_STORE = os.getenv("TRANSCRIPT_STORE", "true").lower() == "true"
+    TRANSCRIPT_DB = os.getenv("TRANSCRIPT_DB", os.path.join(LOG_DIR, "transcripts.db"))
+    CONVERSATION_JSON_LOGS = os.getenv("CONVERSATION_JSON_LOGS", "true").lower() == "true"
+    
+    # Per-turn tracing: "file" writes spans under TRACE_DIR, "http" ships them to the collector
+    TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "file")
+    TRACE_DIR = os.getenv("TRACE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "traces"))
+    TRACE_COLLECTOR_URL = os.getenv("TRACE_COLLECTOR_URL", f"{CHATBOT_SERVICE_URL}/traces")
+    TRACE_MAX_TRACES = int(os.getenv("TRACE_MAX_TRACES", "1000"))  # kept by the collector, in Redis
+    
+    # Service-to-service transport: "http" calls services directly, "redis" queues
+    # asr/llm/tts jobs on Redis Streams for any number of workers (see shared/job_bus.py)
+    JOB_TRANSPORT = os.getenv("JOB_TRANSPORT", "http")
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_CLAIM_IDLE_MS = int(os.getenv("JOB_CLAIM_IDLE_MS", "30000"))
+    JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "120"))
+    JOB_STREAM_MAXLEN = int(os.getenv("JOB_STREAM_MAXLEN", "10000"))
+    JOB_LLM_CONCURRENCY = int(os.getenv("JOB_LLM_CONCURRENCY", "4"))
+    # Base URL a TTS worker puts in front of its /audio links, since any worker may render a turn
+    TTS_PUBLIC_URL = os.getenv("TTS_PUBLIC_URL", OPENVOICE_SERVICE_URL)
+    
+    # Model registry: ASR models per language and TTS base speakers per language load on first
+    # use and are shared by every session of the process. Once a service's resident models pass
+    # MODEL_RAM_BUDGET_MB (0 = no limit) the least recently used idle ones are unloaded.
+    # *_PRELOAD languages load at startup and are never unloaded. The first ASR_MODELS and
+    # TTS_BASE_SPEAKERS entries are the default languages
+    MODEL_RAM_BUDGET_MB = float(os.getenv("MODEL_RAM_BUDGET_MB", "0"))
+    ASR_MODELS = os.getenv(
+        "ASR_MODELS", "en=damo/speech_UniASR_asr_2pass-en-16k-common-vocab1080-tensorflow1-online@v2.0.4"
+    )  # language=modelscope id[@revision], comma-separated
+    ASR_PRELOAD = os.getenv("ASR_PRELOAD", "en")
+    TTS_BASE_SPEAKERS = os.getenv("TTS_BASE_SPEAKERS", "EN=checkpoints/base_speakers/EN")  # EN and ZH exist
+    TTS_PRELOAD = os.getenv("TTS_PRELOAD", "EN")
+    
     # Audio settings
     SAMPLE_RATE = 16000
     AUDIO_DURATION = 5
+    # Encoding requested from the TTS service (wav, flac, ogg or opus) for clients that haven't
+    # said what they can play; browsers send theirs as audio_format
+    TTS_AUDIO_FORMAT = os.getenv("TTS_AUDIO_FORMAT", "wav")
+    
+    # TTS batching: sentences from different sessions share one forward pass
+    TTS_MAX_BATCH = int(os.getenv("TTS_MAX_BATCH", "8"))
+    TTS_MAX_WAIT_MS = float(os.getenv("TTS_MAX_WAIT_MS", "10"))
+    
+    # Voice cloning: cached target speaker embeddings and the default teacher voice
+    TTS_VOICE_CACHE_DIR = os.getenv("TTS_VOICE_CACHE_DIR", "voices")
+    TTS_TONE_TAU = float(os.getenv("TTS_TONE_TAU", "0.3"))
+    TEACHER_VOICE = os.getenv("TEACHER_VOICE", "")
+    
+    # CPU inference: "quality" keeps float32 weights, "speed" folds weight norm and int8-quantizes
+    TTS_CPU_PROFILE = os.getenv("TTS_CPU_PROFILE", "quality")
+    TTS_NUM_THREADS = int(os.getenv("TTS_NUM_THREADS", "0"))  # 0 = all cores available to the worker
+    TTS_WARMUP_RUNS = int(os.getenv("TTS_WARMUP_RUNS", "2"))
+    
+    # Synthesized sentences cached on disk by text, speed and voice (filled ahead of class by warm_cache.py)
+    TTS_AUDIO_CACHE = os.getenv("TTS_AUDIO_CACHE", "true").lower() == "true"
+    TTS_AUDIO_CACHE_DIR = os.getenv("TTS_AUDIO_CACHE_DIR", "audio_cache")
+    TTS_AUDIO_CACHE_MAX_MB = float(os.getenv("TTS_AUDIO_CACHE_MAX_MB", "1024"))
+    
+    # Sentence audio of each session's latest answer kept in memory, so an interrupted answer
+    # resumes from where playback stopped without running the model again
+    TTS_RESUME_MAX_MB = float(os.getenv("TTS_RESUME_MAX_MB", "256"))
+    
+    # Audio per binary frame pushed over /ws/tts
+    TTS_WS_FRAME_MS = int(os.getenv("TTS_WS_FRAME_MS", "100"))
+    
+    # LLM admission control, per orchestrator worker: concurrent generations sent to the
+    # backend, turns allowed to wait, and how long a turn may wait before it is shed
+    LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", "4"))
+    LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+    LLM_MAX_QUEUED_PER_SESSION = int(os.getenv("LLM_MAX_QUEUED_PER_SESSION", "2"))
+    LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+    
+    # Replies to prompts that don't depend on the session (lesson openings, FAQ answers) are
+    # cached in Redis; warm_cache.py fills the cache from a curriculum file before class
+    RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "true").lower() == "true"
+    RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", str(7 * 86400)))
+    
+    # Speculative generation: the ASR service posts partial transcripts while the student
+    # speaks and the orchestrator starts the reply once one is unchanged for SPECULATION_STABLE_MS.
+    # Partials are skipped while a final transcript waits for the ASR thread. Speculations live in
+    # the orchestrator process that got the partial, so with ORCHESTRATOR_WORKERS > 1 a /chat that
+    # lands on another worker misses; route by session or keep one worker when this is on
+    SPECULATIVE_GENERATION = os.getenv("SPECULATIVE_GENERATION", "false").lower() == "true"
+    SPECULATION_STABLE_MS = float(os.getenv("SPECULATION_STABLE_MS", "300"))
+    ASR_PARTIAL_INTERVAL = float(os.getenv("ASR_PARTIAL_INTERVAL", "0.5"))  # seconds of audio between partials
+    
+    # Full-duplex barge-in: the ASR service keeps listening while the teacher replies and
+    # sustained student speech cancels the reply. During playback speech must clear the
+    # stricter threshold for BARGE_IN_MIN_SPEECH_MS, otherwise it is treated as echo
+    FULL_DUPLEX = os.getenv("FULL_DUPLEX", "true").lower() == "true"
+    BARGE_IN_VAD_THRESHOLD = float(os.getenv("BARGE_IN_VAD_THRESHOLD", "0.8"))
+    BARGE_IN_MIN_SPEECH_MS = float(os.getenv("BARGE_IN_MIN_SPEECH_MS", "300"))
+    
+    # Session and interruption state shared by orchestrator workers (seconds kept in Redis)
+    SESSION_STATE_TTL = int(os.getenv("SESSION_STATE_TTL", "86400"))
+    ORCHESTRATOR_WORKERS = int(os.getenv("ORCHESTRATOR_WORKERS", "1"))
+    
+    # Background health checks of the orchestrator's dependencies, and the circuit breaker:
+    # after CIRCUIT_FAILURE_THRESHOLD failures in a row calls fail fast for CIRCUIT_RESET_TIMEOUT s
+    HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "5"))
+    HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "2"))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+    CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "15"))
+    
+    # Rolling summary: once SUMMARY_MIN_NEW messages older than the last PROMPT_RECENT_MESSAGES
+    # pile up they are folded into a per-session summary. The prompt carries every message the
+    # summary doesn't cover verbatim, up to PROMPT_RECENT_MESSAGES + SUMMARY_MIN_NEW of them; past
+    # that the summarizer stops waiting for spare capacity and queues like a turn (just the last
+    # PROMPT_RECENT_MESSAGES with SUMMARY_ENABLED=false)
+    PROMPT_RECENT_MESSAGES = int(os.getenv("PROMPT_RECENT_MESSAGES", "6"))
+    SUMMARY_ENABLED = os.getenv("SUMMARY_ENABLED", "true").lower() == "true"
+    SUMMARY_MIN_NEW = int(os.getenv("SUMMARY_MIN_NEW", "4"))
+    SUMMARY_MAX_CHARS = int(os.getenv("SUMMARY_MAX_CHARS", "1200"))
     
     # Model settings
     MAX_CONVERSATION_HISTORY = 10
     SENTIMENT_WINDOW_SIZE = 3
+    
+    # Cold start: the VADER lexicon is read from NLTK_DATA_DIR (fetched there once if missing and
+    # NLTK_AUTO_DOWNLOAD is on), and every Ollama backend loads the model at startup and keeps it
+    # loaded for OLLAMA_KEEP_ALIVE (-1 = until Ollama stops, or a duration like "24h")
+    NLTK_DATA_DIR = os.getenv("NLTK_DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nltk_data"))
+    NLTK_AUTO_DOWNLOAD = os.getenv("NLTK_AUTO_DOWNLOAD", "true").lower() == "true"
+    OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "-1")
+    OLLAMA_LOAD_TIMEOUT = float(os.getenv("OLLAMA_LOAD_TIMEOUT", "300"))
+    OLLAMA_KEEP_WARM_INTERVAL = float(os.getenv("OLLAMA_KEEP_WARM_INTERVAL", "60"))  # checks the model is still loaded
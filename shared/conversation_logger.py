@@ -3,19 +3,29 @@ import os
 from datetime import datetime
 from typing import List
 from .config import Config
+from .transcript_store import TranscriptStore, split_message
 
 class ConversationLogger:
     def __init__(self):
         os.makedirs(Config.LOG_DIR, exist_ok=True)
-    
+        self.store = TranscriptStore(Config.TRANSCRIPT_DB) if Config.TRANSCRIPT_STORE else None
+
     def log_conversation(self, session_id: str, messages: List[str]):
-        """Save conversation to JSON file"""
+        """Append new turns to the transcript store and save the conversation to JSON file"""
+        if self.store is not None:
+            try:
+                self.store.ingest_session(session_id, [m for m in map(split_message, messages) if m])
+            except Exception as e:
+                print(f"Transcript store write failed for {session_id}: {e}")
+        if not Config.CONVERSATION_JSON_LOGS:
+            return
+
         log_data = {
             "session_id": session_id,
             "timestamp": datetime.now().isoformat(),
             "messages": []
         }
-        
+
         for msg in messages:
             if "::" in msg:
                 role, content = msg.split("::", 1)
@@ -24,7 +34,7 @@ class ConversationLogger:
                     "content": content,
                     "timestamp": datetime.now().isoformat()
                 })
-        
+
         log_file = os.path.join(Config.LOG_DIR, f"{session_id}.json")
         with open(log_file, 'w', encoding='utf-8') as f:
             json.dump(log_data, f, indent=2, ensure_ascii=False)
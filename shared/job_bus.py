@@ -0,0 +1,256 @@
+"""Queue-based transport between services over Redis Streams.
+
+With JOB_TRANSPORT=redis, utterance (asr), generation (llm) and synthesis (tts)
+jobs go onto one stream per kind instead of point-to-point HTTP. Every worker
+process joins that kind's consumer group, so capacity grows by starting more
+workers. Callers wait on a per-job result list.
+
+    jobs:<kind>         pending jobs, consumer group "<kind>-workers"
+    jobs:<kind>:dead    jobs that failed JOB_MAX_ATTEMPTS times
+    job_result:<id>     one JSON result, expires after a few minutes
+
+A failed job is re-queued with its attempt count bumped. Workers re-claim the
+jobs they are still running so long LLM calls don't look idle. A job whose
+worker died (pending and idle for longer than JOB_CLAIM_IDLE_MS) is taken back
+with XAUTOCLAIM and counted as a failed attempt. After JOB_MAX_ATTEMPTS the job is
+moved to the dead-letter stream and the caller gets the error.
+"""
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import redis.asyncio as aioredis
+from redis.exceptions import ResponseError
+
+from .config import Config
+
+RESULT_TTL_SECONDS = 300
+
+class JobFailed(Exception):
+    """The job ended in the dead-letter stream. Handlers raise it for errors a retry won't fix"""
+
+class JobTimeout(JobFailed):
+    """No worker produced a result in time"""
+
+class JobBus:
+    def __init__(self, redis_url: Optional[str] = None, max_attempts: Optional[int] = None,
+                 claim_idle_ms: Optional[int] = None):
+        self.redis = aioredis.Redis.from_url(redis_url or Config.REDIS_URL, decode_responses=True)
+        self.max_attempts = max_attempts or Config.JOB_MAX_ATTEMPTS
+        self.claim_idle_ms = claim_idle_ms or Config.JOB_CLAIM_IDLE_MS
+        self._groups = set()
+
+    @staticmethod
+    def stream(kind: str) -> str:
+        return f"jobs:{kind}"
+
+    @staticmethod
+    def dead_letter_stream(kind: str) -> str:
+        return f"jobs:{kind}:dead"
+
+    @staticmethod
+    def group(kind: str) -> str:
+        return f"{kind}-workers"
+
+    async def ensure_group(self, kind: str):
+        if kind in self._groups:
+            return
+        try:
+            await self.redis.xgroup_create(self.stream(kind), self.group(kind), id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._groups.add(kind)
+
+    async def enqueue(self, kind: str, job: Dict[str, Any]):
+        await self.redis.xadd(self.stream(kind), {"job": json.dumps(job)},
+                              maxlen=Config.JOB_STREAM_MAXLEN, approximate=True)
+
+    async def submit(self, kind: str, payload: Dict[str, Any], trace_id: Optional[str] = None) -> str:
+        await self.ensure_group(kind)
+        job_id = uuid.uuid4().hex
+        await self.enqueue(kind, {
+            "id": job_id,
+            "kind": kind,
+            "payload": payload,
+            "attempts": 0,
+            "submitted": time.time(),
+            "trace_id": trace_id,
+        })
+        return job_id
+
+    async def publish_result(self, job_id: str, result: Dict[str, Any]):
+        key = f"job_result:{job_id}"
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.rpush(key, json.dumps(result))
+            pipe.expire(key, RESULT_TTL_SECONDS)
+            await pipe.execute()
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        item = await self.redis.blpop(f"job_result:{job_id}", timeout=timeout or Config.JOB_TIMEOUT)
+        if item is None:
+            raise JobTimeout(f"Job {job_id} timed out")
+        result = json.loads(item[1])
+        if not result.get("ok"):
+            raise JobFailed(result.get("error", "job failed"))
+        return result["result"]
+
+    async def call(self, kind: str, payload: Dict[str, Any], trace_id: Optional[str] = None,
+                   timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Submit a job and wait for whichever worker picks it up"""
+        job_id = await self.submit(kind, payload, trace_id)
+        return await self.wait(job_id, timeout)
+
+    async def stats(self, kind: str) -> Dict[str, Any]:
+        await self.ensure_group(kind)
+        pending = await self.redis.xpending(self.stream(kind), self.group(kind))
+        consumers = await self.redis.xinfo_consumers(self.stream(kind), self.group(kind))
+        # Finished jobs are deleted, so whatever is left is either waiting or running
+        return {
+            "queued": await self.redis.xlen(self.stream(kind)) - pending["pending"],
+            "in_flight": pending["pending"],
+            "consumers": len(consumers),
+            "dead_letters": await self.redis.xlen(self.dead_letter_stream(kind)),
+        }
+
+class JobWorker:
+    """Consumes one job kind; run() until stop() is called"""
+
+    def __init__(self, bus: JobBus, kind: str, handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                 concurrency: int = 1, consumer: Optional[str] = None, block_ms: int = 1000, tracer=None):
+        self.bus = bus
+        self.kind = kind
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.block_ms = block_ms
+        self.tracer = tracer
+        self.stats = {"completed": 0, "retried": 0, "dead_lettered": 0, "reclaimed": 0}
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._running = False
+        self._tasks = set()
+        self._in_flight = set()
+
+    async def run(self):
+        await self.bus.ensure_group(self.kind)
+        self._running = True
+        stream = self.bus.stream(self.kind)
+        group = self.bus.group(self.kind)
+        maintenance = asyncio.create_task(self._maintain())
+        try:
+            while self._running:
+                await self._read_one(stream, group)
+        finally:
+            maintenance.cancel()
+
+    async def _read_one(self, stream: str, group: str):
+        await self._slots.acquire()
+        try:
+            response = await self.bus.redis.xreadgroup(
+                group, self.consumer, {stream: ">"}, count=1, block=self.block_ms
+            )
+        except Exception as e:
+            self._slots.release()
+            print(f"Job worker {self.kind} read error: {e}")
+            await asyncio.sleep(1)
+            return
+        if not response:
+            self._slots.release()
+            return
+        for message_id, fields in response[0][1]:
+            task = asyncio.create_task(self._process(message_id, fields))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def stop(self):
+        self._running = False
+
+    async def _maintain(self):
+        # Separate task: the read loop sits on the semaphore while every slot is busy
+        while True:
+            try:
+                await self._heartbeat()
+                await self._reclaim_stale()
+            except Exception as e:
+                print(f"Job worker {self.kind} maintenance error: {e}")
+            await asyncio.sleep(self.bus.claim_idle_ms / 3000)
+
+    async def _heartbeat(self):
+        """Reset the idle time of jobs still running here so no other worker reclaims them"""
+        if not self._in_flight:
+            return
+        try:
+            await self.bus.redis.xclaim(
+                self.bus.stream(self.kind), self.bus.group(self.kind), self.consumer,
+                min_idle_time=0, message_ids=list(self._in_flight), justid=True
+            )
+        except ResponseError as e:
+            print(f"Job worker {self.kind} heartbeat failed: {e}")
+
+    async def _done(self, message_id: str):
+        await self.bus.redis.xack(self.bus.stream(self.kind), self.bus.group(self.kind), message_id)
+        await self.bus.redis.xdel(self.bus.stream(self.kind), message_id)
+
+    async def _reclaim_stale(self):
+        """Take back jobs whose worker stopped acking them and count that as a failed attempt"""
+        try:
+            result = await self.bus.redis.xautoclaim(
+                self.bus.stream(self.kind), self.bus.group(self.kind), self.consumer,
+                min_idle_time=self.bus.claim_idle_ms, start_id="0-0", count=50
+            )
+        except ResponseError as e:
+            print(f"Job worker {self.kind} could not reclaim jobs: {e}")
+            return
+        for message_id, fields in result[1]:
+            if not fields:
+                continue  # Trimmed from the stream while pending
+            self.stats["reclaimed"] += 1
+            await self._fail(message_id, json.loads(fields["job"]), "worker stopped responding")
+
+    async def _process(self, message_id: str, fields: Dict[str, str]):
+        self._in_flight.add(message_id)
+        try:
+            job = json.loads(fields["job"])
+            try:
+                if self.tracer is not None:
+                    with self.tracer.span(f"job.{self.kind}", job.get("trace_id"), attempt=job["attempts"],
+                                          queue_ms=(time.time() - job["submitted"]) * 1000):
+                        result = await self.handler(job["payload"])
+                else:
+                    result = await self.handler(job["payload"])
+            except JobFailed as e:
+                await self._fail(message_id, job, str(e), retry=False)
+                return
+            except Exception as e:
+                await self._fail(message_id, job, f"{type(e).__name__}: {e}")
+                return
+            await self.bus.publish_result(job["id"], {"ok": True, "result": result})
+            await self._done(message_id)
+            self.stats["completed"] += 1
+        finally:
+            self._in_flight.discard(message_id)
+            self._slots.release()
+
+    async def _fail(self, message_id: str, job: Dict[str, Any], error: str, retry: bool = True):
+        job["attempts"] += 1
+        job["last_error"] = error
+        if not retry or job["attempts"] >= self.bus.max_attempts:
+            await self.bus.redis.xadd(self.bus.dead_letter_stream(self.kind), {"job": json.dumps(job)},
+                                      maxlen=Config.JOB_STREAM_MAXLEN, approximate=True)
+            await self.bus.publish_result(job["id"], {"ok": False, "error": error})
+            self.stats["dead_lettered"] += 1
+            print(f"Job {job['id']} ({self.kind}) dead-lettered after {job['attempts']} attempts: {error}")
+        else:
+            await self.bus.enqueue(self.kind, job)
+            self.stats["retried"] += 1
+        await self._done(message_id)
+
+def start_worker(bus: JobBus, kind: str, handler, concurrency: int = 1, tracer=None) -> JobWorker:
+    """Start a consumer on the running event loop, for services that also serve HTTP"""
+    worker = JobWorker(bus, kind, handler, concurrency=concurrency, tracer=tracer)
+    asyncio.create_task(worker.run())
+    return worker
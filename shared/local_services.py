@@ -0,0 +1,25 @@
+"""In-process service calls for the all-in-one deployment.
+
+When the ASR, orchestrator and TTS apps run in one process (all_in_one.py),
+the launcher registers each service's entry points here and callers use them
+directly instead of making an HTTP round trip to localhost. In the normal
+three-process deployment nothing is registered and every call goes over HTTP.
+
+A blocking localhost request from inside a shared event loop would wait on a
+server that can't run, so every cross-service call must check here first.
+"""
+from typing import Any, Callable, Dict, Optional
+
+_handlers: Dict[str, Callable[..., Any]] = {}
+
+def register(name: str, handler: Callable[..., Any]):
+    _handlers[name] = handler
+
+def get(name: str) -> Optional[Callable[..., Any]]:
+    return _handlers.get(name)
+
+def enabled() -> bool:
+    return bool(_handlers)
+
+def clear():
+    _handlers.clear()
@@ -0,0 +1,244 @@
+"""Models loaded on first use by key and kept under a RAM budget.
+
+A service registers a loader per key (an ASR language, a TTS base speaker) and
+asks for the model where it needs it. The first request loads it. Every later
+request from any session, thread or job worker in the process gets the same
+instance, so the weights are in memory once however many sessions use them.
+When the resident models pass the budget, the least recently used ones that
+are neither pinned nor in use are unloaded. Load times, sizes and residency are
+reported by snapshot() for the services' /models endpoints.
+
+Sizes are measured from the torch tensors reachable from the loaded object
+(parameters and buffers counted once), or taken from the size_mb hint when
+nothing can be measured.
+"""
+import gc
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+MB = 1024 * 1024
+
+def parse_model_spec(spec: str) -> Dict[str, str]:
+    """Comma-separated "key=value" pairs, e.g. "EN=checkpoints/base_speakers/EN,ZH=checkpoints/base_speakers/ZH" """
+    models = {}
+    for entry in spec.split(","):
+        key, sep, value = entry.strip().partition("=")
+        if not sep or not key.strip() or not value.strip():
+            if entry.strip():
+                raise ValueError(f"Model spec entries must look like key=value, got {entry.strip()!r}")
+            continue
+        models[key.strip()] = value.strip()
+    return models
+
+def model_bytes(model: Any, depth: int = 2) -> int:
+    """Bytes of the torch tensors reachable from model, shared storage counted once"""
+    seen = set()
+
+    def tensors(obj: Any, depth: int) -> Iterator[Any]:
+        if callable(getattr(obj, "data_ptr", None)) and callable(getattr(obj, "element_size", None)):
+            yield obj
+        elif callable(getattr(obj, "parameters", None)) and callable(getattr(obj, "buffers", None)):
+            yield from obj.parameters()
+            yield from obj.buffers()
+        elif isinstance(obj, (list, tuple, set)):
+            for item in obj:
+                yield from tensors(item, depth)
+        elif isinstance(obj, dict):
+            for item in obj.values():
+                yield from tensors(item, depth)
+        elif depth > 0 and hasattr(obj, "__dict__"):
+            # Wrappers like FunASR's AutoModel or OpenVoice's BaseSpeakerTTS hold the module in an attribute
+            for item in vars(obj).values():
+                yield from tensors(item, depth - 1)
+
+    total = 0
+    for tensor in tensors(model, depth):
+        pointer = tensor.data_ptr()
+        if pointer in seen:
+            continue
+        seen.add(pointer)
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+class _Entry:
+    def __init__(self, key: str, loader: Callable[[], Any], size_mb: Optional[float], pinned: bool,
+                 unload: Optional[Callable[[Any], None]]):
+        self.key = key
+        self.loader = loader
+        self.size_hint = int((size_mb or 0) * MB)
+        self.pinned = pinned
+        self.unload_hook = unload
+        self.model: Any = None
+        self.bytes = 0
+        self.users = 0
+        self.last_used = 0.0
+        self.requests = 0
+        self.loads = 0
+        self.unloads = 0
+        self.load_seconds = 0.0
+        self.last_load_seconds: Optional[float] = None
+        self.loaded_at: Optional[float] = None
+        self.error = ""
+        self.load_lock = threading.Lock()
+
+class ModelRegistry:
+    """Lazily loaded models by key, shared process-wide, evicted least recently used past budget_mb"""
+
+    def __init__(self, name: str, budget_mb: float = 0.0):
+        self.name = name
+        self.budget = int(budget_mb * MB)  # 0 = no limit
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "loads": 0, "evictions": 0, "over_budget": 0}
+
+    def register(self, key: str, loader: Callable[[], Any], size_mb: Optional[float] = None,
+                 pinned: bool = False, unload: Optional[Callable[[Any], None]] = None):
+        """Pinned models are never evicted; unload(model) runs when one is"""
+        with self._lock:
+            if key in self._entries:
+                raise ValueError(f"{self.name} model {key} is already registered")
+            self._entries[key] = _Entry(key, loader, size_mb, pinned, unload)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def keys(self):
+        return list(self._entries)
+
+    def _entry(self, key: str) -> _Entry:
+        entry = self._entries.get(key)
+        if entry is None:
+            raise KeyError(f"Unknown {self.name} model: {key} (available: {', '.join(self._entries)})")
+        return entry
+
+    def is_loaded(self, key: str) -> bool:
+        return self._entry(key).model is not None
+
+    def get(self, key: str) -> Any:
+        """The model for key, loading it first if needed (blocking; call from a worker thread)"""
+        entry = self._entry(key)
+        with self._lock:
+            entry.requests += 1
+            self.stats["requests"] += 1
+            entry.last_used = time.monotonic()
+            if entry.model is not None:
+                return entry.model
+
+        # One load per key; other callers wait for it instead of loading a second copy
+        with entry.load_lock:
+            if entry.model is not None:
+                return entry.model
+            with self._lock:
+                self._make_room(entry.size_hint, keep=entry)
+            started = time.perf_counter()
+            try:
+                model = entry.loader()
+            except Exception as e:
+                entry.error = str(e) or type(e).__name__
+                raise
+            seconds = time.perf_counter() - started
+            size = model_bytes(model) or entry.size_hint
+            with self._lock:
+                entry.model = model
+                entry.bytes = size
+                entry.loads += 1
+                entry.load_seconds += seconds
+                entry.last_load_seconds = seconds
+                entry.loaded_at = time.time()
+                entry.last_used = time.monotonic()
+                entry.error = ""
+                self.stats["loads"] += 1
+                self._make_room(0, keep=entry)
+                resident = self.resident_bytes()
+            budget = f"/{self.budget / MB:.0f}" if self.budget else ""
+            print(f"Loaded {self.name} model {key} in {seconds:.1f}s "
+                  f"({size / MB:.0f} MB, {resident / MB:.0f}{budget} MB resident)")
+            return model
+
+    @contextmanager
+    def use(self, key: str):
+        """The model for key, kept from eviction until the block exits"""
+        entry = self._entry(key)
+        with self._lock:
+            entry.users += 1
+        try:
+            yield self.get(key)
+        finally:
+            with self._lock:
+                entry.users -= 1
+                entry.last_used = time.monotonic()
+
+    def resident_bytes(self) -> int:
+        return sum(entry.bytes for entry in self._entries.values() if entry.model is not None)
+
+    def _make_room(self, needed: int, keep: Optional[_Entry] = None):
+        """Unload idle models, least recently used first, until needed more bytes fit the budget"""
+        if not self.budget:
+            return
+        resident = self.resident_bytes()
+        if resident + needed <= self.budget:
+            return
+        idle = sorted(
+            (entry for entry in self._entries.values()
+             if entry.model is not None and entry is not keep and not entry.pinned and entry.users == 0),
+            key=lambda entry: entry.last_used
+        )
+        for entry in idle:
+            if resident + needed <= self.budget:
+                break
+            resident -= entry.bytes
+            self._unload(entry)
+            self.stats["evictions"] += 1
+        if resident + needed > self.budget:
+            self.stats["over_budget"] += 1
+            print(f"{self.name} models need {(resident + needed) / MB:.0f} MB, over the "
+                  f"{self.budget / MB:.0f} MB budget: the rest are pinned or in use")
+
+    def _unload(self, entry: _Entry):
+        model = entry.model
+        entry.model = None
+        entry.bytes = 0
+        entry.unloads += 1
+        print(f"Unloaded {self.name} model {entry.key}")
+        if entry.unload_hook is not None:
+            try:
+                entry.unload_hook(model)
+            except Exception as e:
+                print(f"Unload hook for {self.name} model {entry.key} failed: {e}")
+        del model
+        gc.collect()
+
+    def unload(self, key: str) -> bool:
+        """Drop a model now unless it is in use; the next request loads it again"""
+        entry = self._entry(key)
+        with self._lock:
+            if entry.model is None or entry.users > 0:
+                return False
+            self._unload(entry)
+            return True
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "budget_mb": round(self.budget / MB, 1) if self.budget else None,
+                "resident_mb": round(self.resident_bytes() / MB, 1),
+                "models": {
+                    key: {
+                        "loaded": entry.model is not None,
+                        "pinned": entry.pinned,
+                        "in_use": entry.users,
+                        "size_mb": round(entry.bytes / MB, 1) if entry.model is not None else None,
+                        "requests": entry.requests,
+                        "loads": entry.loads,
+                        "unloads": entry.unloads,
+                        "last_load_s": round(entry.last_load_seconds, 2) if entry.last_load_seconds is not None else None,
+                        "total_load_s": round(entry.load_seconds, 2),
+                        "idle_s": round(now - entry.last_used, 1) if entry.last_used else None,
+                        "error": entry.error,
+                    } for key, entry in self._entries.items()
+                },
+                **self.stats,
+            }
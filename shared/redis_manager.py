@@ -25,7 +25,26 @@ class RedisManager:
     def clear_conversation(self, session_id: str):
         """Clear conversation history"""
         key = f"chat:{session_id}"
-        self.redis_client.delete(key)
+        self.redis_client.delete(key, f"summary:{session_id}")
+    
+    def set_conversation_summary(self, session_id: str, summary: str, covered: int):
+        """Store the rolling summary of the first `covered` messages"""
+        key = f"summary:{session_id}"
+        self.redis_client.setex(key, Config.SESSION_STATE_TTL, json.dumps({"text": summary, "covered": covered}))
+    
+    def get_conversation_summary(self, session_id: str) -> Optional[dict]:
+        """Get the rolling summary as {"text", "covered"}"""
+        key = f"summary:{session_id}"
+        summary_json = self.redis_client.get(key)
+        return json.loads(summary_json) if summary_json else None
+    
+    def cache_response(self, cache_key: str, response: str):
+        """Store a reply for a session-independent prompt (see GemmaHandler.cache_key)"""
+        self.redis_client.setex(f"llm_cache:{cache_key}", Config.RESPONSE_CACHE_TTL, response)
+    
+    def get_cached_response(self, cache_key: str) -> Optional[str]:
+        """Get a cached reply"""
+        return self.redis_client.get(f"llm_cache:{cache_key}")
     
     def set_current_tts_state(self, session_id: str, text: str, is_speaking: bool):
         """Track current TTS state for interruption handling"""
@@ -38,3 +57,58 @@ class RedisManager:
         key = f"tts_state:{session_id}"
         state_json = self.redis_client.get(key)
         return json.loads(state_json) if state_json else None
+    
+    def set_interruption_context(self, session_id: str, context: dict):
+        """Store what was interrupted so any orchestrator worker can offer a continuation"""
+        key = f"interruption:{session_id}"
+        self.redis_client.setex(key, Config.SESSION_STATE_TTL, json.dumps(context))
+    
+    def get_interruption_context(self, session_id: str) -> Optional[dict]:
+        """Get the stored interruption context"""
+        key = f"interruption:{session_id}"
+        context_json = self.redis_client.get(key)
+        return json.loads(context_json) if context_json else None
+    
+    def clear_interruption_context(self, session_id: str):
+        """Clear the stored interruption context and playback position"""
+        key = f"interruption:{session_id}"
+        self.redis_client.delete(key, f"playback:{session_id}")
+    
+    def set_playback_position(self, session_id: str, played_seconds: float, timestamp: float):
+        """Where the client's playback of the teacher's answer stopped, for resuming it"""
+        key = f"playback:{session_id}"
+        state = {"played_seconds": played_seconds, "timestamp": timestamp}
+        self.redis_client.setex(key, Config.SESSION_STATE_TTL, json.dumps(state))
+    
+    def get_playback_position(self, session_id: str) -> Optional[dict]:
+        """Get the reported playback position as {"played_seconds", "timestamp"}"""
+        key = f"playback:{session_id}"
+        state_json = self.redis_client.get(key)
+        return json.loads(state_json) if state_json else None
+    
+    def set_audio_format(self, session_id: str, audio_format: str):
+        """The audio encoding the session's client can play"""
+        self.redis_client.setex(f"audio_format:{session_id}", Config.SESSION_STATE_TTL, audio_format)
+    
+    def get_audio_format(self, session_id: str) -> Optional[str]:
+        return self.redis_client.get(f"audio_format:{session_id}")
+    
+    def add_trace_spans(self, spans: List[dict]):
+        """Trace collector storage shared by all orchestrator workers"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        for span in spans:
+            key = f"trace:{span['trace_id']}"
+            pipe.rpush(key, json.dumps(span))
+            pipe.expire(key, Config.SESSION_STATE_TTL)
+            pipe.zadd("traces", {span["trace_id"]: span["start"]}, nx=True)
+        # Forget the oldest traces once the collector holds too many
+        pipe.zremrangebyrank("traces", 0, -Config.TRACE_MAX_TRACES - 1)
+        pipe.execute()
+    
+    def get_trace_spans(self, trace_id: str) -> List[dict]:
+        """Get collected spans of one trace"""
+        return [json.loads(span) for span in self.redis_client.lrange(f"trace:{trace_id}", 0, -1)]
+    
+    def get_recent_trace_ids(self, limit: int = 20) -> List[str]:
+        """Get the most recently started trace ids"""
+        return self.redis_client.zrevrange("traces", 0, limit - 1)
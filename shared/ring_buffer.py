@@ -0,0 +1,97 @@
+import threading
+from typing import Tuple
+
+import numpy as np
+
+class AudioRingBuffer:
+    """Preallocated float32 ring buffer shared between a sounddevice callback and a worker thread.
+
+    Read/write positions are absolute sample counters, so callers can refer to
+    a sample by its position for as long as it hasn't been overwritten.
+    """
+
+    def __init__(self, capacity: int, channels: int = 1):
+        self.capacity = int(capacity)
+        self.channels = channels
+        self._data = np.zeros((self.capacity, channels), dtype=np.float32)
+        self._read = 0
+        self._write = 0
+        self._lock = threading.Lock()
+
+    @property
+    def read_position(self) -> int:
+        return self._read
+
+    @property
+    def write_position(self) -> int:
+        return self._write
+
+    @property
+    def available(self) -> int:
+        return self._write - self._read
+
+    @property
+    def free(self) -> int:
+        return self.capacity - self.available
+
+    def clear(self):
+        with self._lock:
+            self._read = self._write
+
+    def write(self, samples: np.ndarray, overwrite: bool = False) -> int:
+        """Copy samples in; without overwrite only what fits is written. Returns samples written"""
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1, self.channels)
+        with self._lock:
+            count = len(samples)
+            if overwrite:
+                if count > self.capacity:
+                    samples = samples[-self.capacity:]
+                    self._write += count - self.capacity
+                    count = self.capacity
+                # Drop the oldest unread samples to make room
+                overflow = count - (self.capacity - (self._write - self._read))
+                if overflow > 0:
+                    self._read += overflow
+            else:
+                count = min(count, self.capacity - (self._write - self._read))
+
+            start = self._write % self.capacity
+            first = min(count, self.capacity - start)
+            self._data[start:start + first] = samples[:first]
+            if count > first:
+                self._data[:count - first] = samples[first:count]
+            self._write += count
+            return count
+
+    def read_into(self, out: np.ndarray) -> int:
+        """Fill out (frames x channels) from the buffer; returns frames copied, the rest is untouched"""
+        with self._lock:
+            count = min(len(out), self._write - self._read)
+            start = self._read % self.capacity
+            first = min(count, self.capacity - start)
+            out[:first] = self._data[start:start + first]
+            if count > first:
+                out[first:count] = self._data[:count - first]
+            self._read += count
+            return count
+
+    def discard(self, count: int) -> int:
+        with self._lock:
+            count = min(count, self._write - self._read)
+            self._read += count
+            return count
+
+    def views(self, start: int, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Zero-copy views of samples [start, start + count); two pieces when the range wraps"""
+        with self._lock:
+            if start < self._write - self.capacity or start + count > self._write:
+                raise IndexError("Requested range is not in the buffer")
+        begin = start % self.capacity
+        first = min(count, self.capacity - begin)
+        return self._data[begin:begin + first], self._data[:count - first]
+
+    def copy_range(self, start: int, count: int) -> np.ndarray:
+        first, second = self.views(start, count)
+        if len(second) == 0:
+            return first.copy()
+        return np.concatenate([first, second])
@@ -0,0 +1,185 @@
+"""Per-turn request tracing across the ASR, orchestrator and TTS services.
+
+A trace id is created when an utterance ends (or when a text turn starts)
+and travels in the X-Trace-Id header and in WebSocket frames as "trace_id".
+Each service records spans and exports them either to a JSONL file per
+service (TRACE_EXPORTER=file) or to the orchestrator's /traces collector
+(TRACE_EXPORTER=http).
+
+    python -m shared.tracing waterfall <trace_id>   # render from the span files
+"""
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+import requests
+
+from .config import Config
+
+TRACE_HEADER = "X-Trace-Id"
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+class FileSpanExporter:
+    """Appends spans as JSON lines to one file per service"""
+
+    def __init__(self, directory: str, service: str):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{service}.jsonl")
+        self._lock = threading.Lock()
+
+    def export(self, span: Dict[str, Any]):
+        line = json.dumps(span, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+
+class HttpSpanExporter:
+    """Ships spans to the trace collector in batches from a background thread"""
+
+    def __init__(self, url: str, batch_size: int = 50, flush_interval: float = 1.0):
+        self.url = url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=10000)
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def export(self, span: Dict[str, Any]):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            pass  # Tracing must never slow down a turn
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.time() + self.flush_interval
+            while len(batch) < self.batch_size and time.time() < deadline:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.time())))
+                except queue.Empty:
+                    break
+            try:
+                requests.post(self.url, json=batch, timeout=2)
+            except requests.RequestException:
+                pass
+
+class Tracer:
+    def __init__(self, service: str):
+        self.service = service
+        if Config.TRACE_EXPORTER == "http":
+            self.exporter = HttpSpanExporter(Config.TRACE_COLLECTOR_URL)
+        elif Config.TRACE_EXPORTER == "file":
+            self.exporter = FileSpanExporter(Config.TRACE_DIR, service)
+        else:
+            self.exporter = None
+
+    @contextmanager
+    def span(self, name: str, trace_id: Optional[str], **attributes) -> Iterator[Dict[str, Any]]:
+        """Time a block of work; yields the span dict so callers can add attributes"""
+        span = {
+            "trace_id": trace_id,
+            "span_id": uuid.uuid4().hex[:16],
+            "service": self.service,
+            "name": name,
+            "start": time.time(),
+            "attributes": attributes,
+        }
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span["duration_ms"] = (time.perf_counter() - started) * 1000
+            self.record(span)
+
+    def record(self, span: Dict[str, Any]):
+        if self.exporter is not None and span.get("trace_id"):
+            self.exporter.export(span)
+
+    def traced_iter(self, name: str, trace_id: Optional[str], iterable: Iterable[bytes], **attributes) -> Iterator[bytes]:
+        """Wrap a streamed response body so the span covers the whole transfer"""
+        with self.span(name, trace_id, **attributes) as span:
+            sent = 0
+            for chunk in iterable:
+                sent += len(chunk)
+                yield chunk
+            span["attributes"]["bytes"] = sent
+
+    async def traced_aiter(self, name: str, trace_id: Optional[str], iterable: AsyncIterable[bytes],
+                           **attributes) -> AsyncIterator[bytes]:
+        """Async variant of traced_iter"""
+        with self.span(name, trace_id, **attributes) as span:
+            sent = 0
+            async for chunk in iterable:
+                sent += len(chunk)
+                yield chunk
+            span["attributes"]["bytes"] = sent
+
+    def install_middleware(self, app):
+        """Record a span for every HTTP request that carries a trace id"""
+        @app.middleware("http")
+        async def trace_requests(request, call_next):
+            trace_id = request.headers.get(TRACE_HEADER)
+            if not trace_id:
+                return await call_next(request)
+            with self.span(f"http {request.method} {request.url.path}", trace_id) as span:
+                response = await call_next(request)
+                span["attributes"]["status"] = response.status_code
+            response.headers[TRACE_HEADER] = trace_id
+            return response
+
+def load_spans(trace_id: Optional[str] = None, directory: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Read exported spans from the per-service files"""
+    directory = directory or Config.TRACE_DIR
+    spans = []
+    if not os.path.isdir(directory):
+        return spans
+    for filename in os.listdir(directory):
+        if not filename.endswith(".jsonl"):
+            continue
+        with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    span = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if trace_id is None or span.get("trace_id") == trace_id:
+                    spans.append(span)
+    return spans
+
+def render_waterfall(spans: List[Dict[str, Any]], width: int = 60) -> str:
+    """Text waterfall of one trace: one bar per span on a shared time axis"""
+    if not spans:
+        return "No spans recorded for this trace"
+    spans = sorted(spans, key=lambda s: s["start"])
+    origin = spans[0]["start"]
+    end = max(s["start"] + s["duration_ms"] / 1000 for s in spans)
+    total = max(end - origin, 1e-6)
+
+    label_width = max(len(f"{s['service']}:{s['name']}") for s in spans)
+    lines = [f"trace {spans[0]['trace_id']}  total {total * 1000:.0f} ms"]
+    for span in spans:
+        offset = int((span["start"] - origin) / total * width)
+        length = max(1, int(span["duration_ms"] / 1000 / total * width))
+        bar = " " * offset + "█" * min(length, width - offset)
+        label = f"{span['service']}:{span['name']}"
+        flag = "  !" if span.get("error") else ""
+        lines.append(f"{label:<{label_width}} |{bar:<{width}}| "
+                     f"+{(span['start'] - origin) * 1000:7.0f} ms {span['duration_ms']:8.1f} ms{flag}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "waterfall":
+        print(render_waterfall(load_spans(sys.argv[2])))
+    else:
+        print("usage: python -m shared.tracing waterfall <trace_id>")
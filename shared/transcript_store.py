@@ -0,0 +1,320 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from .config import Config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    ts REAL NOT NULL,
+    PRIMARY KEY (session_id, seq)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_ts ON messages(ts);
+CREATE INDEX IF NOT EXISTS idx_messages_role_ts ON messages(role, ts);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    first_ts REAL NOT NULL,
+    last_ts REAL NOT NULL,
+    message_count INTEGER NOT NULL,
+    ingested INTEGER NOT NULL,     -- length of the source history already stored
+    fingerprint TEXT NOT NULL,     -- hash of the last stored source message
+    source_mtime REAL              -- mtime of the JSON log it was last ingested from
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_last_ts ON sessions(last_ts);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='messages', content_rowid='rowid', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, content) VALUES (new.rowid, new.content);
+END;
+"""
+
+Message = Tuple[str, str]
+
+def split_message(message: str) -> Optional[Message]:
+    """Redis history entry "role::content" as (role, content)"""
+    if "::" not in message:
+        return None
+    role, content = message.split("::", 1)
+    return role, content
+
+def _fingerprint(message: Message) -> str:
+    return hashlib.sha1(f"{message[0]}::{message[1]}".encode("utf-8")).hexdigest()
+
+def to_fts_query(text: str) -> str:
+    """Plain search words as an FTS5 query: every word must match, a trailing * matches a prefix"""
+    terms = []
+    for word in re.findall(r"[\w']+\*?", text):
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', "")
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    """"7d", "12h", "30m" back from now, an ISO date/time, or epoch seconds"""
+    if value is None or value == "":
+        return None
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([dhm])", value.strip())
+    if match:
+        seconds = {"d": 86400, "h": 3600, "m": 60}[match.group(2)]
+        return time.time() - float(match.group(1)) * seconds
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+class TranscriptStore:
+    """Conversation transcripts in SQLite, indexed by session, time and role, with FTS5 over the text.
+
+    Turns come in two ways: ConversationLogger appends them as they happen, and
+    ingest_dir() compacts the per-session JSON logs. Both hand over the whole
+    history and only messages past what is already stored are inserted, so
+    ingesting the same history twice is a no-op. If a session's history no
+    longer starts with what was stored (it was cleared and the id reused), the
+    new history is appended after the old one.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Shared by the event loop and ingest threads; every statement runs under the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            try:
+                self._conn.executescript(SCHEMA)
+            except sqlite3.OperationalError as e:
+                raise RuntimeError(f"Transcript store needs SQLite with FTS5: {e}") from e
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- Ingestion ---
+
+    def ingest_session(self, session_id: str, messages: Sequence[Message],
+                       timestamps: Optional[Sequence[float]] = None, source_mtime: Optional[float] = None) -> int:
+        """Store the messages of a session's history not stored yet; returns how many were added"""
+        with self._lock, self._conn:
+            return self._ingest(session_id, messages, timestamps, source_mtime)
+
+    def _ingest(self, session_id, messages, timestamps, source_mtime) -> int:
+        row = self._conn.execute(
+            "SELECT message_count, ingested, fingerprint, first_ts FROM sessions WHERE session_id = ?",
+            (session_id,)
+        ).fetchone()
+        start = 0
+        if row is not None:
+            ingested = row["ingested"]
+            if 0 < ingested <= len(messages) and _fingerprint(messages[ingested - 1]) == row["fingerprint"]:
+                start = ingested
+        new = list(range(start, len(messages)))
+        now = time.time()
+        base = row["message_count"] if row is not None else 0
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO messages (session_id, seq, role, content, ts) VALUES (?, ?, ?, ?, ?)",
+            [(session_id, base + offset, messages[i][0], messages[i][1],
+              timestamps[i] if timestamps is not None else now)
+             for offset, i in enumerate(new)]
+        )
+        if not messages:
+            return 0
+        last_ts = timestamps[-1] if timestamps is not None else now
+        if row is None:
+            first_ts = timestamps[0] if timestamps is not None else now
+        else:
+            first_ts = row["first_ts"]
+        self._conn.execute(
+            """INSERT INTO sessions (session_id, first_ts, last_ts, message_count, ingested, fingerprint, source_mtime)
+               VALUES (?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(session_id) DO UPDATE SET
+                   last_ts = CASE WHEN excluded.message_count > sessions.message_count
+                                  THEN excluded.last_ts ELSE sessions.last_ts END,
+                   message_count = excluded.message_count, ingested = excluded.ingested,
+                   fingerprint = excluded.fingerprint,
+                   source_mtime = COALESCE(excluded.source_mtime, sessions.source_mtime)""",
+            (session_id, first_ts, last_ts, base + len(new), len(messages),
+             _fingerprint(messages[-1]), source_mtime)
+        )
+        return len(new)
+
+    def ingest_dir(self, log_dir: str, prune_after: Optional[float] = None) -> dict:
+        """Compact the JSON logs in log_dir; files unchanged since the last run are skipped.
+
+        With prune_after (seconds), logs not written to for that long are deleted
+        once they are in the store.
+        """
+        with self._lock:
+            known = {row["session_id"]: row["source_mtime"]
+                     for row in self._conn.execute("SELECT session_id, source_mtime FROM sessions")}
+        stats = {"files": 0, "ingested_files": 0, "skipped_files": 0, "messages": 0, "pruned": 0, "errors": 0}
+        now = time.time()
+        for path in sorted(glob.glob(os.path.join(log_dir, "*.json"))):
+            stats["files"] += 1
+            mtime = os.path.getmtime(path)
+            session_id = os.path.splitext(os.path.basename(path))[0]
+            if known.get(session_id) == mtime:
+                stats["skipped_files"] += 1
+            else:
+                try:
+                    session_id, messages, timestamps = read_log(path)
+                    stats["messages"] += self.ingest_session(session_id, messages, timestamps, source_mtime=mtime)
+                    stats["ingested_files"] += 1
+                except (OSError, ValueError, KeyError) as e:
+                    stats["errors"] += 1
+                    print(f"Skipping {path}: {e}")
+                    continue
+            if prune_after is not None and now - mtime >= prune_after:
+                os.remove(path)
+                stats["pruned"] += 1
+        return stats
+
+    # --- Queries ---
+
+    def _filters(self, since, until, role, session_id) -> Tuple[str, list]:
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("m.ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("m.ts < ?")
+            params.append(until)
+        if role:
+            clauses.append("m.role = ?")
+            params.append(role)
+        if session_id:
+            clauses.append("m.session_id = ?")
+            params.append(session_id)
+        return "".join(f" AND {clause}" for clause in clauses), params
+
+    def search(self, text: str, since: Optional[float] = None, until: Optional[float] = None,
+               role: Optional[str] = None, session_id: Optional[str] = None, limit: int = 20) -> List[dict]:
+        """Matching messages, newest first, with the matched words marked in a snippet"""
+        query = to_fts_query(text)
+        if not query:
+            return []
+        where, params = self._filters(since, until, role, session_id)
+        sql = f"""SELECT m.session_id, m.seq, m.role, m.content, m.ts,
+                         snippet(messages_fts, 0, '[', ']', '...', 12) AS snippet
+                  FROM messages_fts JOIN messages m ON m.rowid = messages_fts.rowid
+                  WHERE messages_fts MATCH ?{where}
+                  ORDER BY m.ts DESC LIMIT ?"""
+        with self._lock:
+            rows = self._conn.execute(sql, [query, *params, limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def sessions_matching(self, text: str, since: Optional[float] = None, until: Optional[float] = None,
+                          role: Optional[str] = None, limit: int = 50) -> List[dict]:
+        """Sessions with matching messages in the time range, most recent first"""
+        query = to_fts_query(text)
+        if not query:
+            return []
+        where, params = self._filters(since, until, role, None)
+        sql = f"""SELECT m.session_id, COUNT(*) AS hits, MIN(m.ts) AS first_match, MAX(m.ts) AS last_match
+                  FROM messages_fts JOIN messages m ON m.rowid = messages_fts.rowid
+                  WHERE messages_fts MATCH ?{where}
+                  GROUP BY m.session_id ORDER BY last_match DESC LIMIT ?"""
+        with self._lock:
+            rows = self._conn.execute(sql, [query, *params, limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def transcript(self, session_id: str) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, role, content, ts FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self) -> dict:
+        with self._lock:
+            sessions, first_ts, last_ts = self._conn.execute(
+                "SELECT COUNT(*), MIN(first_ts), MAX(last_ts) FROM sessions").fetchone()
+            messages = self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        size = sum(os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p))
+        return {"path": self.path, "sessions": sessions, "messages": messages,
+                "first_ts": first_ts, "last_ts": last_ts, "bytes": size}
+
+def read_log(path: str) -> Tuple[str, List[Message], List[float]]:
+    """A ConversationLogger JSON file as (session_id, messages, timestamps)"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    messages, timestamps = [], []
+    for message in data["messages"]:
+        messages.append((message["role"], message["content"]))
+        timestamps.append(datetime.fromisoformat(message["timestamp"]).timestamp())
+    return data["session_id"], messages, timestamps
+
+def format_ts(ts: Optional[float]) -> str:
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M") if ts is not None else "-"
+
+def main(argv: Optional[Iterable[str]] = None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m shared.transcript_store",
+                                     description="Compact and search conversation transcripts")
+    parser.add_argument("--db", default=Config.TRANSCRIPT_DB)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="ingest new turns from the JSON logs")
+    ingest.add_argument("--log-dir", default=Config.LOG_DIR)
+    ingest.add_argument("--prune-days", type=float, default=None,
+                        help="delete logs not written to for this many days once ingested")
+
+    for name, help_text in (("search", "matching messages"), ("sessions", "sessions with matching messages")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("query")
+        command.add_argument("--since", help='e.g. 7d, 12h or 2024-05-01')
+        command.add_argument("--until")
+        command.add_argument("--role", help="user or ai")
+        command.add_argument("--limit", type=int, default=20)
+        if name == "search":
+            command.add_argument("--session")
+
+    show = commands.add_parser("show", help="print a session's transcript")
+    show.add_argument("session_id")
+    commands.add_parser("stats", help="store size and time range")
+
+    args = parser.parse_args(argv)
+    store = TranscriptStore(args.db)
+    if args.command == "ingest":
+        started = time.perf_counter()
+        prune_after = args.prune_days * 86400 if args.prune_days is not None else None
+        stats = store.ingest_dir(args.log_dir, prune_after)
+        print(f"{stats['files']} logs, {stats['ingested_files']} ingested, {stats['skipped_files']} unchanged, "
+              f"{stats['messages']} new messages, {stats['pruned']} pruned, {stats['errors']} errors "
+              f"in {time.perf_counter() - started:.2f}s")
+    elif args.command == "search":
+        for hit in store.search(args.query, parse_time(args.since), parse_time(args.until),
+                                args.role, args.session, args.limit):
+            print(f"{format_ts(hit['ts'])}  {hit['session_id']}#{hit['seq']}  {hit['role']}: {hit['snippet']}")
+    elif args.command == "sessions":
+        for hit in store.sessions_matching(args.query, parse_time(args.since), parse_time(args.until),
+                                           args.role, args.limit):
+            print(f"{hit['session_id']}  {hit['hits']} hits  "
+                  f"{format_ts(hit['first_match'])} .. {format_ts(hit['last_match'])}")
+    elif args.command == "show":
+        for message in store.transcript(args.session_id):
+            print(f"{format_ts(message['ts'])}  {message['role']}: {message['content']}")
+    else:
+        print(json.dumps(store.stats(), indent=2))
+    store.close()
+
+if __name__ == "__main__":
+    main()